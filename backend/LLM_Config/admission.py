@@ -0,0 +1,153 @@
+"""
+Admission control for /api/query/stream.
+
+Before a query starts, estimate how long it would queue:
+
+- LLM: waiters already queued at interactive weight, plus admitted queries
+  that have not reached the LLM yet (they will need a slot shortly), drained
+  `capacity` at a time for the scheduler's average slot hold time
+- embedding: the executor's queued micro-batches x average encode time
+
+Past ADMISSION_REJECT_WAIT_S the request is rejected with 429 + Retry-After,
+so requests already admitted keep their latency. With ADMISSION_DEGRADE on,
+requests are shed progressively first (fractions of the reject threshold):
+
+    >= 25%  skip_chart      no LLM fallback for chart specs (table charts stay)
+    >= 50%  skip_formatter  no LLM formatter pass (local formatting stays)
+    >= 75%  skip_rerank     keep retrieval order, no rerank stage
+"""
+from __future__ import annotations
+import logging
+import math
+import os
+from dataclasses import dataclass, fields
+from typing import List
+
+from LLM_Config.llm_scheduler import LLM_SCHEDULER, LLMScheduler, PRIORITY_INTERACTIVE
+from LLM_Config.llm_streams import STREAM_TRACKER, StreamTracker
+from Vector_setup.base.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("true", "1", "yes", "y")
+ADMISSION_DEGRADE = os.getenv("ADMISSION_DEGRADE", "true").lower() in ("true", "1", "yes", "y")
+ADMISSION_REJECT_WAIT_S = float(os.getenv("ADMISSION_REJECT_WAIT_S", "8"))
+ADMISSION_MAX_RETRY_AFTER_S = 60
+
+_DEGRADE_STEPS = (
+    (0.25, "skip_chart"),
+    (0.50, "skip_formatter"),
+    (0.75, "skip_rerank"),
+)
+
+ADMISSION_TOTAL = REGISTRY.counter(
+    "rag_admission_total", "Query admission decisions.", ("decision",))
+ADMISSION_EST_WAIT_SECONDS = REGISTRY.histogram(
+    "rag_admission_estimated_wait_seconds", "Estimated queue wait at admission time.", ("decision",))
+
+
+@dataclass(frozen=True)
+class Degradation:
+    skip_chart: bool = False
+    skip_formatter: bool = False
+    skip_rerank: bool = False
+
+    @property
+    def active(self) -> List[str]:
+        return [f.name for f in fields(self) if getattr(self, f.name)]
+
+
+NO_DEGRADATION = Degradation()
+
+
+@dataclass(frozen=True)
+class AdmissionDecision:
+    admitted: bool
+    est_wait_s: float
+    degrade: Degradation = NO_DEGRADATION
+    retry_after_s: int = 0
+
+    @property
+    def label(self) -> str:
+        if not self.admitted:
+            return "rejected"
+        return "degraded" if self.degrade.active else "admitted"
+
+
+class AdmissionTicket:
+    """Counts an admitted query until its stream ends; release() is idempotent."""
+
+    def __init__(self, controller: "AdmissionController", decision: AdmissionDecision):
+        self.decision = decision
+        self._controller = controller
+        self._released = not decision.admitted  # rejected tickets hold nothing
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller.active -= 1
+
+    def __del__(self) -> None:
+        # A response whose stream never started never runs its finally block
+        self.release()
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        scheduler: LLMScheduler = LLM_SCHEDULER,
+        tracker: StreamTracker = STREAM_TRACKER,
+        reject_wait_s: float = ADMISSION_REJECT_WAIT_S,
+        degrade: bool = ADMISSION_DEGRADE,
+        enabled: bool = ADMISSION_ENABLED,
+    ):
+        self.scheduler = scheduler
+        self.tracker = tracker
+        self.reject_wait_s = reject_wait_s
+        self.degrade = degrade
+        self.enabled = enabled
+        self.active = 0
+
+    def estimate_wait_s(self, embed_wait_s: float = 0.0) -> float:
+        load = self.scheduler.saturation(PRIORITY_INTERACTIVE)
+        # Admitted queries still in retrieval/rerank will need a slot soon
+        upcoming = max(0, self.active - self.tracker.in_flight())
+        demand = load["queued_ahead"] + upcoming
+        free = load["capacity"] - load["in_flight"]
+        hold = load["avg_hold_s"] or 0.0
+        llm_wait = 0.0 if demand < free else ((demand - free) // load["capacity"] + 1) * hold
+        return llm_wait + max(0.0, embed_wait_s)
+
+    def decide(self, embed_wait_s: float = 0.0) -> AdmissionDecision:
+        if not self.enabled:
+            return AdmissionDecision(True, 0.0)
+        est = self.estimate_wait_s(embed_wait_s)
+        if est >= self.reject_wait_s:
+            retry_after = min(ADMISSION_MAX_RETRY_AFTER_S, max(1, math.ceil(est)))
+            return AdmissionDecision(False, est, retry_after_s=retry_after)
+        if not self.degrade:
+            return AdmissionDecision(True, est)
+        steps = {name for fraction, name in _DEGRADE_STEPS if est >= fraction * self.reject_wait_s}
+        return AdmissionDecision(True, est, Degradation(**{name: True for name in steps}))
+
+    def admit(self, embed_wait_s: float = 0.0) -> AdmissionTicket:
+        """Decide and, if admitted, count the query until ticket.release()."""
+        decision = self.decide(embed_wait_s)
+        ADMISSION_TOTAL.inc(decision=decision.label)
+        ADMISSION_EST_WAIT_SECONDS.observe(decision.est_wait_s, decision=decision.label)
+        if decision.admitted:
+            self.active += 1
+        else:
+            logger.warning(
+                "Query rejected: estimated wait %.1fs >= %.1fs (active=%d)",
+                decision.est_wait_s, self.reject_wait_s, self.active,
+            )
+        return AdmissionTicket(self, decision)
+
+
+ADMISSION = AdmissionController()
+
+REGISTRY.gauge(
+    "rag_admitted_queries", "Queries admitted and still streaming.",
+    collect=lambda: {(): ADMISSION.active},
+)
@@ -0,0 +1,184 @@
+"""
+Local chart-spec builder.
+
+Turns Markdown tables in the formatted answer into chart specs with the same
+contract the chart LLM call returns (see CHART_SPEC_SYSTEM_PROMPT):
+
+    {chart_type, title, x_field, x_label, y_fields, y_label, data}
+
+- x axis: the first time-like column (header or values look like dates,
+  months, quarters, years), else the first text column
+- y axis: numeric columns, at most 3 per chart and never mixing percentages
+  with absolute values; the rest become extra charts
+- "line" for time on x, "bar" for categories
+- "Total" rows are skipped so they do not dwarf the other points
+
+The LLM path is only needed when the answer has no usable table.
+"""
+from __future__ import annotations
+import re
+from typing import Dict, List, Optional
+
+from LLM_Config.markdown_formatter import iter_tables
+
+MAX_CHARTS = 3
+MAX_Y_FIELDS = 3
+MIN_ROWS = 2
+
+_MONTHS = (
+    "jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec|january|february|march|april|"
+    "june|july|august|september|october|november|december"
+)
+_TIME_HEADER_RE = re.compile(r"\b(date|day|week|month|quarter|year|period|fy|time)\b", re.IGNORECASE)
+_TIME_VALUE_RE = re.compile(
+    rf"^(?:\d{{4}}-\d{{1,2}}(?:-\d{{1,2}})?|\d{{1,2}}/\d{{1,2}}/\d{{2,4}}|(?:19|20)\d{{2}}|fy\s?\d{{2,4}}"
+    rf"|q[1-4](?:\s?[-/']?\s?\d{{2,4}})?|(?:{_MONTHS})\.?(?:\s+\d{{2,4}})?|h[12](?:\s?\d{{2,4}})?)$",
+    re.IGNORECASE,
+)
+_NUMBER_RE = re.compile(
+    r"^(?P<neg>[-−(])?\s*(?P<cur>[$€£₦¥])?\s*(?P<sign>[-−])?(?P<num>\d[\d,]*(?:\.\d+)?|\.\d+)"
+    r"\s*(?P<suffix>%|k|m|mn|bn|b)?\s*\)?$",
+    re.IGNORECASE,
+)
+_SUFFIX_SCALE = {"k": 1e3, "m": 1e6, "mn": 1e6, "b": 1e9, "bn": 1e9}
+
+
+def parse_number(cell: str) -> Optional[float]:
+    text = (cell or "").strip().replace("**", "").replace("\u00a0", " ")
+    match = _NUMBER_RE.match(text)
+    if not match:
+        return None
+    value = float(match.group("num").replace(",", ""))
+    suffix = (match.group("suffix") or "").lower()
+    value *= _SUFFIX_SCALE.get(suffix, 1.0)
+    if match.group("neg") or match.group("sign"):
+        value = -value
+    if value.is_integer() and "." not in match.group("num") and suffix in ("", "%"):
+        return int(value)
+    return value
+
+
+def snake_case(label: str) -> str:
+    out = re.sub(r"[^0-9a-zA-Z]+", "_", (label or "").strip().lower()).strip("_")
+    return out or "value"
+
+
+def _unique_fields(header: List[str], order: List[int]) -> Dict[int, str]:
+    """snake_case field per column, suffixed _2, _3, ... where names collide."""
+    fields: Dict[int, str] = {}
+    used: set = set()
+    for i in order:
+        base = name = snake_case(header[i])
+        n = 2
+        while name in used:
+            name = f"{base}_{n}"
+            n += 1
+        used.add(name)
+        fields[i] = name
+    return fields
+
+
+def _is_time_column(header: str, values: List[str]) -> bool:
+    if _TIME_HEADER_RE.search(header or ""):
+        return True
+    filled = [v for v in values if v]
+    return bool(filled) and all(_TIME_VALUE_RE.match(v.strip()) for v in filled)
+
+
+def _is_numeric_column(values: List[str]) -> bool:
+    filled = [v for v in values if v]
+    if not filled:
+        return False
+    parsed = sum(parse_number(v) is not None for v in filled)
+    return parsed / len(filled) >= 0.8
+
+
+def _y_label(headers: List[str], columns: List[List[str]]) -> str:
+    if len(headers) == 1:
+        return headers[0]
+    cells = [c for col in columns for c in col if c]
+    if cells and all(c.strip().endswith("%") for c in cells):
+        return "Percent (%)"
+    for symbol in "$€£₦¥":
+        if cells and all(symbol in c for c in cells):
+            return f"Amount ({symbol})"
+    return "Value"
+
+
+def _table_specs(
+    heading: Optional[str],
+    header: List[str],
+    rows: List[List[str]],
+) -> List[dict]:
+    width = len(header)
+    rows = [r + [""] * (width - len(r)) for r in rows]
+    columns = [[r[i].strip() for r in rows] for i in range(width)]
+
+    x_idx = next(
+        (i for i in range(width) if _is_time_column(header[i], columns[i])),
+        None,
+    )
+    time_axis = x_idx is not None
+    if x_idx is None:
+        x_idx = next((i for i in range(width) if not _is_numeric_column(columns[i])), 0)
+
+    y_idx = [i for i in range(width) if i != x_idx and _is_numeric_column(columns[i])]
+    if not y_idx:
+        return []
+
+    keep = [
+        r for r in rows
+        if r[x_idx].strip() and not r[x_idx].strip().lower().strip("*").startswith("total")
+    ]
+    if len(keep) < MIN_ROWS:
+        return []
+
+    # "Revenue ($)" and "Revenue (₦)" would both be "revenue"; the x field claims its name first
+    fields = _unique_fields(header, [x_idx] + y_idx)
+    x_field = fields[x_idx]
+    x_label = header[x_idx].strip() or "Category"
+
+    # Percentages and absolute values do not share an axis
+    def is_percent(i: int) -> bool:
+        filled = [c for c in columns[i] if c]
+        return all(c.endswith("%") for c in filled)
+
+    groups: List[List[int]] = []
+    for kind in (False, True):
+        same_unit = [i for i in y_idx if is_percent(i) == kind]
+        groups += [same_unit[s: s + MAX_Y_FIELDS] for s in range(0, len(same_unit), MAX_Y_FIELDS)]
+
+    specs: List[dict] = []
+    for group in groups:
+        y_fields = [fields[i] for i in group]
+        data = []
+        for r in keep:
+            point = {x_field: r[x_idx].strip().strip("*")}
+            for i, field in zip(group, y_fields):
+                value = parse_number(r[i])
+                if value is not None:
+                    point[field] = value
+            data.append(point)
+
+        y_headers = [header[i].strip() for i in group]
+        title = heading or f"{', '.join(y_headers)} by {x_label}"
+        specs.append({
+            "chart_type": "line" if time_axis else "bar",
+            "title": title,
+            "x_field": x_field,
+            "x_label": x_label,
+            "y_fields": y_fields,
+            "y_label": _y_label(y_headers, [columns[i] for i in group]),
+            "data": data,
+        })
+    return specs
+
+
+def build_chart_specs(markdown: str, max_charts: int = MAX_CHARTS) -> List[dict]:
+    """Chart specs for every chartable Markdown table in the answer (may be empty)."""
+    specs: List[dict] = []
+    for heading, header, rows in iter_tables(markdown):
+        specs.extend(_table_specs(heading, header, rows))
+        if len(specs) >= max_charts:
+            break
+    return specs[:max_charts]
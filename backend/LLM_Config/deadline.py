@@ -0,0 +1,119 @@
+"""
+End-to-end deadline for one /api/query/stream request.
+
+The clock starts when the route accepts the request (ACL and history load
+count against it). The total depends on the rule-based intent: a CHITCHAT
+reply should never take as long as an EXPORT_TABLE. Stages spend it in order
+and give up optional work rather than stretch the request:
+
+    rerank    capped at RERANK_SHARE of the total, and skipped (retrieval
+              order kept) when less than that is left once generation's
+              reserve is set aside, i.e. when retrieval ran long
+    generate  max_tokens capped so the expected decode (recent TTFT and
+              tokens/s from STREAM_TRACKER) fits in the time left; a cut
+              only if the answer actually ran into the lowered cap
+    format    LLM formatter pass only if FORMAT_MIN_S is left; local
+              formatting always runs
+    chart     no LLM chart fallback once the deadline has passed
+
+Each cut is recorded as {"stage", "reason": "deadline"} (admission control
+records its own as reason "load", see LLM_Config.admission) and reported to
+the client in `event: degraded`. The chart runs after the stream ends, so a
+chart lost to the skipped fallback is reported in the enrichment job instead.
+"""
+from __future__ import annotations
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from LLM_Config.llm_streams import STREAM_TRACKER, StreamTracker
+
+logger = logging.getLogger(__name__)
+
+QUERY_DEADLINE_S = float(os.getenv("QUERY_DEADLINE_S", "20"))
+
+# Built-in per-intent totals; QUERY_DEADLINE_BY_INTENT ("LOOKUP:12,EXPORT_TABLE:45") overrides
+DEFAULT_INTENT_DEADLINES: Dict[str, float] = {
+    "CHITCHAT": 5.0,
+    "CAPABILITIES": 8.0,
+    "LOOKUP": 15.0,
+    "PROCEDURE": 20.0,
+    "NUMERIC_ANALYSIS": 25.0,
+    "ANALYSIS": 30.0,
+    "EXPORT_TABLE": 40.0,
+}
+
+# Generation keeps this share of the total for itself until it starts
+GENERATE_RESERVE_SHARE = 0.4
+RERANK_SHARE = 0.15
+# Below this a rerank is not worth starting
+RERANK_MIN_S = 0.25
+FORMAT_MIN_S = float(os.getenv("QUERY_DEADLINE_FORMAT_MIN_S", "2"))
+# Never cap an answer below this many tokens; a short answer beats a cut-off one
+MIN_ANSWER_TOKENS = 256
+
+
+def _parse_intent_deadlines(raw: str) -> Dict[str, float]:
+    """"LOOKUP:12,EXPORT_TABLE:45" -> {"LOOKUP": 12.0, "EXPORT_TABLE": 45.0}"""
+    deadlines: Dict[str, float] = {}
+    for part in (raw or "").split(","):
+        intent, _, seconds = part.strip().partition(":")
+        if intent and seconds:
+            try:
+                deadlines[intent.strip().upper()] = max(float(seconds), 1.0)
+            except ValueError:
+                logger.warning("Ignoring bad QUERY_DEADLINE_BY_INTENT entry %r", part)
+    return deadlines
+
+
+INTENT_DEADLINES: Dict[str, float] = {
+    **DEFAULT_INTENT_DEADLINES,
+    **_parse_intent_deadlines(os.getenv("QUERY_DEADLINE_BY_INTENT", "")),
+}
+
+
+class Deadline:
+    def __init__(self, total_s: float, started_at: Optional[float] = None):
+        self.total_s = total_s
+        self.started_at = time.perf_counter() if started_at is None else started_at
+
+    @classmethod
+    def for_intent(cls, intent: Optional[str], started_at: Optional[float] = None) -> "Deadline":
+        return cls(INTENT_DEADLINES.get(intent or "", QUERY_DEADLINE_S), started_at)
+
+    def elapsed_s(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def remaining_s(self) -> float:
+        return self.total_s - self.elapsed_s()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining_s() <= 0
+
+    def rerank_budget_s(self) -> Optional[float]:
+        """Timeout for the rerank stage, or None to skip it."""
+        budget = min(
+            self.total_s * RERANK_SHARE,
+            self.remaining_s() - self.total_s * GENERATE_RESERVE_SHARE,
+        )
+        return budget if budget >= RERANK_MIN_S else None
+
+    def max_tokens(self, limit: int, reserve_s: float = 0.0, tracker: StreamTracker = STREAM_TRACKER) -> int:
+        """
+        `limit`, or fewer if recent streams say `limit` tokens would not fit in
+        the time left (minus `reserve_s` kept for later stages). Without recent
+        stream stats the limit stands.
+        """
+        tps = tracker.ewma_tokens_per_s
+        if not tps:
+            return limit
+        decode_s = self.remaining_s() - reserve_s - (tracker.ewma_ttft_s or 0.0)
+        return min(limit, max(MIN_ANSWER_TOKENS, int(decode_s * tps)))
+
+    def as_dict(self) -> dict:
+        return {
+            "total_ms": round(self.total_s * 1000.0),
+            "elapsed_ms": round(self.elapsed_s() * 1000.0),
+        }
@@ -0,0 +1,346 @@
+"""
+Post-answer enrichments: chart specs and follow-up suggestions.
+
+These used to run inside the SSE request before `event: done`, so the
+connection (and, for the LLM fallbacks, a semaphore slot) stayed held while
+the user was already reading the answer. They now run as background tasks
+keyed by conversation turn (the saved assistant message id):
+
+    stream route  -> save turn -> schedule_enrichments(...) -> event: enrichment -> done
+    frontend      -> GET /api/query/enrichments/{turn_id}?wait=20  (long-poll)
+
+The registry is in-process. With several workers the poll has to reach the
+worker that ran the query (sticky sessions); otherwise it gets a 404 and the
+answer simply shows without chart/suggestions. Finished turns are kept for
+ENRICHMENT_TTL_S seconds. A client that stops the turn sends
+DELETE /api/query/enrichments/{turn_id}, which cancels whatever is still
+running (and frees its LLM slot).
+"""
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from LLM_Config.llm_scheduler import PRIORITY_BACKGROUND
+from LLM_Config.chart_spec import build_chart_specs
+from LLM_Config.pipeline_events import StageTimer
+from LLM_Config.system_user_prompt import create_chart_spec_prompt, create_suggestion_prompt
+from Vector_setup.base.metrics import QUERY_CANCELLED_TOTAL, observe_degraded, observe_stage
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+ENRICHMENT_TTL_S = float(os.getenv("ENRICHMENT_TTL_S", "600"))
+ENRICHMENT_MAX_ENTRIES = int(os.getenv("ENRICHMENT_MAX_ENTRIES", "2000"))
+# Suggestions stay off until the prompt is re-tuned; flip on per deployment
+SUGGESTIONS_ENABLED = os.getenv("SUGGESTIONS_ENABLED", "false").lower() in ("true", "1", "yes", "y")
+
+# Producer name -> stage name reported in the job's `stages`
+ENRICHMENT_STAGES = {"charts": "chart", "suggestions": "suggest"}
+
+CHART_INTENTS = {"NUMERIC_ANALYSIS", "LOOKUP", "CHART"}
+CHART_KEYWORDS = ["chart", "graph", "plot", "visual", "visualise", "visualize"]
+CHART_REQUIRED_KEYS = {
+    "chart_type",
+    "title",
+    "x_field",
+    "x_label",
+    "y_fields",
+    "y_label",
+    "data",
+}
+
+
+# ---------- generators ----------
+
+def wants_chart(question: str, intent: Optional[str], domain: Optional[str]) -> bool:
+    lower_q = (question or "").lower()
+    chart_intent_trigger = any(kw in lower_q for kw in CHART_KEYWORDS)
+    logger.info(
+        f"CHART_DEBUG domain={domain} intent={intent} "
+        f"chart_intent_trigger={chart_intent_trigger}"
+    )
+    return (domain == "FINANCE" and chart_intent_trigger) or intent in CHART_INTENTS
+
+
+def normalize_chart_specs(chart_obj: Any) -> List[dict]:
+    def normalize_one(spec: dict) -> dict | None:
+        if "x-label" in spec and "x_field" in spec:
+            spec["x_label"] = spec.pop("x-label")
+
+        if not CHART_REQUIRED_KEYS.issubset(spec.keys()):
+            logger.warning(
+                "CHART_DEBUG chart_spec missing required keys: %s",
+                spec.keys(),
+            )
+            return None
+
+        return spec
+
+    chart_specs: list[dict] = []
+
+    if isinstance(chart_obj, dict):
+        normalized = normalize_one(chart_obj)
+        if normalized:
+            chart_specs.append(normalized)
+    elif isinstance(chart_obj, list):
+        for idx, item in enumerate(chart_obj):
+            if not isinstance(item, dict):
+                logger.warning(
+                    "CHART_DEBUG chart_specs[%s] is not a dict, skipping",
+                    idx,
+                )
+                continue
+            normalized = normalize_one(item)
+            if normalized:
+                chart_specs.append(normalized)
+    elif chart_obj is not None:
+        logger.warning(
+            "CHART_DEBUG chart_spec is neither dict nor list. skipping: %r",
+            type(chart_obj),
+        )
+    return chart_specs
+
+
+async def generate_chart_specs(
+    question: str,
+    answer: str,
+    tenant_id: Optional[str] = None,
+    llm_skip_reason: Optional[str] = None,
+    degraded: Optional[List[dict]] = None,
+) -> List[dict]:
+    """
+    Local specs from the answer's Markdown tables; LLM (Call 3) only when there are none.
+    With `llm_skip_reason` ("load", "deadline") the LLM fallback is off; only when that
+    actually costs the answer its chart is it recorded in `degraded`.
+    """
+    chart_obj: Any = build_chart_specs(answer)
+    if chart_obj:
+        logger.info("CHART_DEBUG built %d chart spec(s) from tables", len(chart_obj))
+    elif llm_skip_reason:
+        logger.info("CHART_DEBUG no tables and LLM chart fallback disabled (%s)", llm_skip_reason)
+        if degraded is not None:
+            observe_degraded(tenant_id or "", degraded, "chart", llm_skip_reason)
+        return []
+    else:
+        # Imported here so the registry loads without the LLM client
+        from LLM_Config.llm_pipeline import parse_raw_chart
+        from LLM_Config.llm_setup import call_llm
+
+        chart_messages = create_chart_spec_prompt(question, answer)
+        chart_resp = await call_llm(
+            tenant_id=tenant_id,
+            priority=PRIORITY_BACKGROUND,
+            messages=chart_messages,
+            model="gpt-4o-mini",
+            temperature=0.0,
+            max_tokens=1500,
+        )
+
+        raw_chart = (chart_resp.choices[0].message.content or "").strip()
+        logger.info(f"RAW_CHART_SPEC {raw_chart}")
+
+        chart_obj = parse_raw_chart(raw_chart, logger)
+
+    return normalize_chart_specs(chart_obj)
+
+
+async def generate_suggestions(question: str, answer: str, tenant_id: Optional[str] = None) -> List[str]:
+    from LLM_Config.llm_setup import call_llm
+
+    suggestion_messages = create_suggestion_prompt(question, answer)
+    resp = await call_llm(
+        tenant_id=tenant_id,
+        priority=PRIORITY_BACKGROUND,
+        messages=suggestion_messages,
+        model="gpt-4o-mini",
+        temperature=0.3,
+        max_tokens=300,
+    )
+    raw_content = (resp.choices[0].message.content or "").strip()
+    try:
+        suggestions_list = json.loads(raw_content)
+    except Exception:
+        logger.warning("Suggestions were not valid JSON: %r", raw_content[:200])
+        return []
+    if not isinstance(suggestions_list, list):
+        return []
+    return [s.strip() for s in suggestions_list if isinstance(s, str) and s.strip()]
+
+
+# ---------- per-turn registry ----------
+
+@dataclass
+class EnrichmentJob:
+    turn_id: str
+    tenant_id: str
+    user_id: str
+    conversation_id: Optional[str]
+    intent: Optional[str] = None
+    pending: set = field(default_factory=set)
+    results: Dict[str, Any] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    stages: List[dict] = field(default_factory=list)
+    created_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+    tasks: List[asyncio.Task] = field(default_factory=list)
+    # Enrichments cut short by load or the deadline; they finish after `event: degraded`
+    degraded: List[dict] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "turn_id": self.turn_id,
+            "conversation_id": self.conversation_id,
+            "status": "done" if self.done.is_set() else "pending",
+            "pending": sorted(self.pending),
+            "charts": self.results.get("charts") or [],
+            "suggestions": self.results.get("suggestions") or [],
+            "errors": dict(self.errors),
+            "stages": list(self.stages),
+            "degraded": list(self.degraded),
+        }
+
+
+class EnrichmentRegistry:
+    def __init__(self, ttl_s: float = ENRICHMENT_TTL_S, max_entries: int = ENRICHMENT_MAX_ENTRIES):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._jobs: "OrderedDict[str, EnrichmentJob]" = OrderedDict()
+
+    def schedule(
+        self,
+        turn_id: str,
+        tenant_id: str,
+        user_id: str,
+        conversation_id: Optional[str],
+        producers: Dict[str, Callable[[], Awaitable[Any]]],
+        intent: Optional[str] = None,
+        degraded: Optional[List[dict]] = None,
+    ) -> EnrichmentJob:
+        """
+        Start one background task per producer. The caller returns right away;
+        results land on the job as each task finishes.
+        """
+        self._evict()
+        job = EnrichmentJob(
+            turn_id=turn_id,
+            tenant_id=tenant_id,
+            user_id=user_id,
+            conversation_id=conversation_id,
+            intent=intent,
+            pending=set(producers),
+            degraded=degraded if degraded is not None else [],
+        )
+        self._jobs[turn_id] = job
+        if not producers:
+            self._finish(job)
+        for name, producer in producers.items():
+            job.tasks.append(asyncio.create_task(self._run(job, name, producer)))
+        return job
+
+    def get(self, turn_id: str, tenant_id: str, user_id: str) -> Optional[EnrichmentJob]:
+        """The job, if it exists and belongs to this user; None otherwise."""
+        self._evict()
+        job = self._jobs.get(turn_id)
+        if job is None or job.tenant_id != tenant_id or job.user_id != user_id:
+            return None
+        return job
+
+    def cancel(self, job: EnrichmentJob) -> List[str]:
+        """Cancel the job's unfinished producers; returns their names."""
+        cancelled = sorted(job.pending)
+        for task in job.tasks:
+            task.cancel()
+        for name in cancelled:
+            QUERY_CANCELLED_TOTAL.inc(tenant=job.tenant_id, stage=ENRICHMENT_STAGES.get(name, name))
+        return cancelled
+
+    async def wait(self, job: EnrichmentJob, timeout: float) -> EnrichmentJob:
+        if timeout > 0 and not job.done.is_set():
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    async def _run(self, job: EnrichmentJob, name: str, producer: Callable[[], Awaitable[Any]]) -> None:
+        timer = StageTimer(ENRICHMENT_STAGES.get(name, name))
+        try:
+            job.results[name] = await producer()
+        except asyncio.CancelledError:
+            job.errors[name] = "cancelled"
+            raise
+        except Exception as e:
+            logger.warning("Enrichment %s failed for turn %s: %s", name, job.turn_id, e)
+            job.errors[name] = "failed"
+        finally:
+            result = job.results.get(name)
+            stage = timer.end(
+                candidates_out=len(result) if isinstance(result, list) else None,
+                **({"error": job.errors[name]} if name in job.errors else {}),
+            )
+            job.stages.append(stage.as_dict())
+            observe_stage(job.tenant_id, job.intent, job.stages[-1])
+            logger.info("ENRICHMENT turn=%s %s", job.turn_id, stage.as_dict())
+            job.pending.discard(name)
+            if not job.pending:
+                self._finish(job)
+
+    def _finish(self, job: EnrichmentJob) -> None:
+        job.finished_at = time.monotonic()
+        job.tasks = []
+        job.done.set()
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        expired = [
+            turn_id for turn_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.ttl_s
+        ]
+        for turn_id in expired:
+            del self._jobs[turn_id]
+        # Over capacity: drop the oldest, cancelling anything still running
+        while len(self._jobs) > self.max_entries:
+            _, job = self._jobs.popitem(last=False)
+            for task in job.tasks:
+                task.cancel()
+
+
+enrichment_registry = EnrichmentRegistry()
+
+
+def schedule_enrichments(
+    turn_id: str,
+    tenant_id: str,
+    user_id: str,
+    conversation_id: Optional[str],
+    question: str,
+    answer: str,
+    intent: Optional[str] = None,
+    domain: Optional[str] = None,
+    chart_skip_reason: Optional[str] = None,
+) -> EnrichmentJob:
+    """
+    Pick the enrichments this turn needs and start them in the background.
+    `chart_skip_reason` turns off the LLM chart fallback; see generate_chart_specs.
+    """
+    degraded: List[dict] = []
+    producers: Dict[str, Callable[[], Awaitable[Any]]] = {}
+    if wants_chart(question, intent, domain):
+        producers["charts"] = lambda: generate_chart_specs(
+            question, answer, tenant_id, chart_skip_reason, degraded
+        )
+    if SUGGESTIONS_ENABLED and intent not in {"CHITCHAT", "CAPABILITIES"}:
+        producers["suggestions"] = lambda: generate_suggestions(question, answer, tenant_id)
+    return enrichment_registry.schedule(
+        turn_id, tenant_id, user_id, conversation_id, producers, intent=intent, degraded=degraded,
+    )
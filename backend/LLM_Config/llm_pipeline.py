@@ -3,25 +3,40 @@
 """
 
 
-from typing import List, Dict, Any, Tuple, Literal, Optional, AsyncGenerator
+from dataclasses import dataclass
+from typing import List, Dict, Any, Tuple, Literal, Optional, AsyncGenerator, Union
+import asyncio
 import json
-import textwrap
 import logging
+import os
 import re
 
 from LLM_Config.llm_setup import call_llm, stream_llm
+from LLM_Config.llm_scheduler import PRIORITY_INTERACTIVE, PRIORITY_RERANK
+from LLM_Config.admission import Degradation, NO_DEGRADATION
+from LLM_Config.deadline import Deadline, FORMAT_MIN_S
+from LLM_Config.markdown_formatter import format_markdown
+from LLM_Config.pipeline_events import StageEvent, StageTimer
+from LLM_Config.rerank_cascade import cascade_config_for, rerank_cascade
 from LLM_Config.system_user_prompt import (
     create_context,
     FORMATTER_SYSTEM_PROMPT,
-    RERANK_SYSTEM_PROMPT,
-    create_chart_spec_prompt,
 )
 from Vector_setup.base.db_setup_management import MultiTenantChromaStoreManager
+from Vector_setup.base.metrics import observe_degraded, observe_stage
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 # --- typing ---
+@dataclass(frozen=True)
+class ReplaceAnswer:
+    """Yielded after the streamed tokens: the full answer, post-processed."""
+    text: str
+
+
+PipelineOutput = Union[str, ReplaceAnswer, StageEvent]
+
 IntentType = Literal[
     "FOLLOWUP_ELABORATE",
     "NEW_QUESTION",
@@ -41,6 +56,18 @@ IntentType = Literal[
 
 YEAR_REGEX = re.compile(r"\b(20[0-4][0-9])\b")  # 2000–2049
 
+# With hybrid (BM25 + vector) retrieval the fused list is precise enough that
+# the rerank only needs a small candidate set instead of the route's top_k=100:
+# this floor, or twice the cascade's stage 1 slice so cosine + MMR has
+# something to filter.
+HYBRID_RERANK_CANDIDATES = 10
+
+ANSWER_MAX_TOKENS = 4096
+
+# Answers are formatted locally (markdown_formatter). Opt in to the LLM formatter
+# call for edge cases; it falls back to the local pass on error or truncation.
+LLM_FORMATTER_ENABLED = os.getenv("LLM_FORMATTER_ENABLED", "false").lower() in ("true", "1", "yes", "y")
+
 FINANCE_KEYWORDS = [
     "budget",
     "expense",
@@ -218,29 +245,6 @@ def is_year_level_question(question: str) -> bool:
     return False
 
 
-def build_rerank_messages(question: str, snippets: list[str]) -> list[dict]:
-    numbered = "\n\n".join(
-        [
-            f"[{i}] {textwrap.shorten(s, width=800, placeholder='...')}"
-            for i, s in enumerate(snippets)
-        ]
-    )
-    user_content = f"""
-User question:
-{question}
-
-Snippets to rank (0-based indices in brackets):
-{numbered}
-
-Return a JSON array of indices from most relevant to least relevant.
-""".strip()
-
-    return [
-        {"role": "system", "content": RERANK_SYSTEM_PROMPT},
-        {"role": "user", "content": user_content},
-    ]
-
-
 def normalize_query(q: str) -> str:
     q = (q or "").strip()
     lower = q.lower()
@@ -461,9 +465,40 @@ async def llm_pipeline_stream(
     result_holder: Optional[dict] = None,
     last_doc_id: Optional[str] = None,
     collection_names: Optional[List[str]] = None,
-) -> AsyncGenerator[str, None]:
+    collection_ids: Optional[List[str]] = None,
+    organization_ids: Optional[List[Optional[str]]] = None,
+    degrade: Degradation = NO_DEGRADATION,
+    deadline: Optional[Deadline] = None,
+) -> AsyncGenerator[PipelineOutput, None]:
+    """
+    Yields answer tokens (str) as the model produces them. If post-processing
+    changes the answer, one ReplaceAnswer with the final text follows.
+    StageEvents (start/end per stage) are interleaved; finished stages are also
+    collected in result_holder["stages"]. `degrade` (from admission control)
+    drops the rerank stage and/or the LLM formatter under load; `deadline`
+    (default: the intent's budget, starting now) trims them when time runs
+    short. Both are reported in result_holder["degraded"].
+    """
     # Intent & domain are rule-based (no LLM call)
     intent, domain, chart_only = infer_intent_rule_based(question)
+    if result_holder is not None:
+        # Read by the route when it schedules post-answer enrichments (LLM_Config.enrichment)
+        result_holder["intent"] = intent
+        result_holder["domain"] = domain
+
+    if deadline is None:
+        deadline = Deadline.for_intent(intent)
+
+    stage_log: list[dict] = []
+    degraded: list[dict] = []
+    if result_holder is not None:
+        result_holder["stages"] = stage_log
+        result_holder["degraded"] = degraded
+
+    def _ended(event: StageEvent) -> StageEvent:
+        stage_log.append(event.as_dict())
+        observe_stage(tenant_id, intent, stage_log[-1])
+        return event
 
     text_lower = (question or "").lower()
     unique_sources: list[str] = []
@@ -521,6 +556,8 @@ async def llm_pipeline_stream(
         retrieval_question = raw_question
 
     effective_question = build_retrieval_query(retrieval_question, history)
+    # Query-embedding LRU key (the year-filter fallback below reuses it)
+    query_cache_key = normalize_query(effective_question)
 
     query_filter: Optional[dict] = None
     if intent in {"FOLLOWUP_ELABORATE", "IMPLICATIONS", "STRATEGY"} and last_doc_id:
@@ -539,11 +576,35 @@ async def llm_pipeline_stream(
     else:
         effective_top_k = top_k
 
+    if year_level and domain == "FINANCE":
+        max_chunks = 10
+    elif intent == "EXPORT_TABLE":
+        max_chunks = 10
+    else:
+        max_chunks = 5
+
+    if store.hybrid_enabled:
+        effective_top_k = min(
+            effective_top_k,
+            max(HYBRID_RERANK_CANDIDATES, 2 * max_chunks, 2 * cascade_config_for(intent).slice_k),
+        )
+
+    # Query embedding as its own stage; retrieval below reuses it from the LRU
+    embed_timer = StageTimer("embed")
+    yield embed_timer.start()
+    await store.embed_query(effective_question, cache_key=query_cache_key, tenant_id=tenant_id)
+    yield _ended(embed_timer.end())
+
+    retrieve_timer = StageTimer("retrieve")
+    yield retrieve_timer.start()
     retrieval = await store.query_policies(
         tenant_id=tenant_id,
         collection_name=None,
         collection_names=collection_names or None,
+        collection_ids=collection_ids or None,
+        organization_ids=organization_ids or None,
         query=effective_question,
+        query_cache_key=query_cache_key,
         top_k=effective_top_k,
         where=query_filter,
     )
@@ -554,12 +615,20 @@ async def llm_pipeline_stream(
             tenant_id=tenant_id,
             collection_name=None,
             collection_names=collection_names or None,
+            collection_ids=collection_ids or None,
+            organization_ids=organization_ids or None,
             query=effective_question,
+            query_cache_key=query_cache_key,
             top_k=effective_top_k,
             where=None,
         )
         hits = retrieval.get("results", [])
 
+    yield _ended(retrieve_timer.end(
+        candidates_out=len(hits),
+        mode=(retrieval.get("retrieval") or {}).get("mode", "vector"),
+    ))
+
     if not hits:
         if intent == "EXPORT_TABLE":
             msg = (
@@ -577,60 +646,61 @@ async def llm_pipeline_stream(
         yield msg
         return
 
-    # 4) BUILD CONTEXT
+    # 4) RERANK CASCADE: cosine/MMR slice on stored embeddings, then reranker on the slice.
+    #    Optional: skipped under load or when retrieval left too little time,
+    #    and cut off (retrieval order kept) when it overruns its budget
+    rerank_timer = StageTimer("rerank")
+    yield rerank_timer.start()
+    rerank_budget_s = None if degrade.skip_rerank else deadline.rerank_budget_s()
+    rerank_skipped: Optional[str] = None
+    if degrade.skip_rerank:
+        rerank_skipped = "load"
+    elif rerank_budget_s is None:
+        rerank_skipped = "deadline"
+    if rerank_skipped:
+        ranked_hits, rerank_stages = hits, [{"stage": f"rerank:skipped:{rerank_skipped}"}]
+    else:
+        try:
+            ranked_hits, rerank_stages = await asyncio.wait_for(
+                rerank_cascade(
+                    store,
+                    tenant_id,
+                    effective_question,
+                    hits,
+                    intent,
+                    min_keep=max_chunks,
+                    query_cache_key=query_cache_key,
+                ),
+                timeout=rerank_budget_s,
+            )
+        except asyncio.TimeoutError:
+            rerank_skipped = "deadline"
+            ranked_hits = hits
+            rerank_stages = [{"stage": "rerank:timeout", "budget_ms": round(rerank_budget_s * 1000.0)}]
+    if rerank_skipped:
+        observe_degraded(tenant_id, degraded, "rerank", rerank_skipped)
+    logger.info("Rerank cascade (%s): %s", intent, rerank_stages)
+    if result_holder is not None:
+        result_holder["rerank_stages"] = rerank_stages
+    if not ranked_hits:
+        ranked_hits = hits
+    yield _ended(rerank_timer.end(
+        candidates_in=len(hits),
+        candidates_out=min(len(ranked_hits), max_chunks),
+        **({"skipped": rerank_skipped} if rerank_skipped else {}),
+    ))
+
+    # 5) BUILD CONTEXT
     context_chunks: list[str] = []
     sources: list[str] = []
 
-    for hit in hits:
+    for hit in ranked_hits[:max_chunks]:
         doc_text = (hit.get("document") or "").strip()
         meta = hit.get("metadata", {}) or {}
         title = meta.get("display_name") or meta.get("title") or meta.get("filename") or "Unknown document"
         context_chunks.append(doc_text)
         sources.append(title)
 
-    # 5) RERANK (Call 2)
-    try:
-        rerank_messages = build_rerank_messages(effective_question, context_chunks)
-        rerank_resp = await call_llm(
-            messages=rerank_messages,
-            model="gpt-4o-mini",
-            temperature=0.0,
-            max_tokens=300,
-        )
-        raw = (rerank_resp.choices[0].message.content or "[]").strip()
-        try:
-            indices = json.loads(raw)
-        except Exception:
-            start = raw.find("[")
-            end = raw.rfind("]")
-            if start != -1 and end != -1 and end > start:
-                indices = json.loads(raw[start: end + 1])
-            else:
-                raise
-        if not isinstance(indices, list):
-            raise ValueError
-        indices = [
-            i for i in indices if isinstance(i, int) and 0 <= i < len(context_chunks)
-        ]
-    except Exception as e:
-        logger.warning(f"Rerank failed, falling back to original order: {e}")
-        indices = list(range(len(context_chunks)))
-
-    if year_level and domain == "FINANCE":
-        max_chunks = 10
-    elif intent == "EXPORT_TABLE":
-        max_chunks = 10
-    else:
-        max_chunks = 5
-
-    if indices:
-        indices = indices[:max_chunks]
-        context_chunks = [context_chunks[i] for i in indices]
-        sources = [sources[i] for i in indices]
-    else:
-        context_chunks = context_chunks[:max_chunks]
-        sources = sources[:max_chunks]
-
     unique_sources = sorted(set(sources))
 
     # 6) PROMPT BUILDING
@@ -669,137 +739,95 @@ async def llm_pipeline_stream(
 
     messages.append({"role": "user", "content": user_prompt})
 
-    # 7) MAIN ANSWER (Call 1 – streaming, formatting, self-check inside prompt)
+    # 7) MAIN ANSWER (Call 1 – tokens go to the client as they arrive);
+    #    a shorter answer when the expected decode would overrun the deadline
+    full_answer_parts: list[str] = []
+    max_tokens = deadline.max_tokens(ANSWER_MAX_TOKENS)
+    generate_timer = StageTimer("generate")
+    yield generate_timer.start()
     try:
-        full_answer_parts: list[str] = []
-
-        stream = await stream_llm(
+        ttft_ms: Optional[float] = None
+        finish_reason: Optional[str] = None
+        # Holds the LLM slot until the stream ends, or until this generator is
+        # closed early (client disconnect), which also stops the upstream stream
+        async with stream_llm(
+            tenant_id=tenant_id,
+            priority=PRIORITY_INTERACTIVE,
             model="gpt-4.1-mini",
             messages=messages,
             temperature=0.3,
-            max_tokens=4096,
-        )
-
-        async for chunk in stream:
-            delta = chunk.choices[0].delta or {}
-            text = getattr(delta, "content", "") or ""
-            if text:
-                full_answer_parts.append(text)
-
-        formatted_answer = "".join(full_answer_parts).strip()
+            max_tokens=max_tokens,
+        ) as stream:
+            async for chunk in stream:
+                finish_reason = getattr(chunk.choices[0], "finish_reason", None) or finish_reason
+                delta = chunk.choices[0].delta or {}
+                text = getattr(delta, "content", "") or ""
+                if text:
+                    if ttft_ms is None:
+                        ttft_ms = generate_timer.elapsed_ms()
+                    full_answer_parts.append(text)
+                    yield text
+
+        # A lowered cap only cost the answer something if it was actually hit
+        if max_tokens < ANSWER_MAX_TOKENS and finish_reason == "length":
+            observe_degraded(tenant_id, degraded, "generate", "deadline", max_tokens=max_tokens)
+        raw_answer = "".join(full_answer_parts).strip()
+        yield _ended(generate_timer.end(
+            candidates_in=len(context_chunks),
+            ttft_ms=ttft_ms,
+            chars=len(raw_answer),
+            max_tokens=max_tokens,
+        ))
+
+        # Post-processing pass once the stream is done; the client swaps in the result
+        format_timer = StageTimer("format")
+        yield format_timer.start()
+        formatted_answer = format_markdown(raw_answer) or raw_answer
+        if LLM_FORMATTER_ENABLED and degrade.skip_formatter:
+            observe_degraded(tenant_id, degraded, "format", "load")
+        elif LLM_FORMATTER_ENABLED and deadline.remaining_s() < FORMAT_MIN_S:
+            observe_degraded(tenant_id, degraded, "format", "deadline")
+        elif LLM_FORMATTER_ENABLED:
+            try:
+                formatter_messages = create_formatter_prompt(raw_answer)
+                formatted_resp = await asyncio.wait_for(
+                    call_llm(
+                        tenant_id=tenant_id,
+                        priority=PRIORITY_RERANK,
+                        messages=formatter_messages,
+                        model="gpt-4o-mini",
+                        temperature=0.0,
+                        max_tokens=1000,
+                    ),
+                    timeout=deadline.remaining_s(),
+                )
+                choice = formatted_resp.choices[0]
+                if choice.finish_reason == "length":
+                    logger.warning("LLM formatter hit max_tokens, keeping local formatting")
+                elif choice.message.content:
+                    formatted_answer = choice.message.content
 
-        # _store(formatted_answer, unique_sources)
-        # yield formatted_answer
-        
-        try:
-            formatter_messages = create_formatter_prompt(formatted_answer)
-            formatted_resp = await call_llm(
-                messages=formatter_messages,
-                model="gpt-4o-mini",
-                temperature=0.0,
-                max_tokens=1000,
-            )
-            formatted_answer = formatted_resp.choices[0].message.content or formatted_answer
+            except asyncio.TimeoutError:
+                logger.warning("LLM formatter ran past the deadline, keeping local formatting")
+                observe_degraded(tenant_id, degraded, "format", "deadline")
+            except Exception as e:
+                logger.warning(f"LLM formatter failed, keeping local formatting: {e}")
 
-        except Exception as e:
-            logger.warning(f"Formatter failed, returning raw answer: {e}")
-            formatted_answer = formatted_answer
+        yield _ended(format_timer.end(llm=LLM_FORMATTER_ENABLED))
 
         _store(formatted_answer, unique_sources)
-        yield formatted_answer
-
-        # 8) Optional chart spec (Call 3, only when needed)
-        try:
-            lower_q = (question or "").lower()
-            chart_intent_trigger = any(
-                kw in lower_q
-                for kw in ["chart", "graph", "plot", "visual", "visualise", "visualize"]
-            )
-
-            logger.info(
-                f"CHART_DEBUG domain={domain} intent={intent} "
-                f"chart_intent_trigger={chart_intent_trigger}"
-            )
-
-            if ((domain == "FINANCE" and chart_intent_trigger) or intent in {
-                "NUMERIC_ANALYSIS",
-                "LOOKUP",
-                "CHART",
-            }):
-                logger.info("CHART_DEBUG entering chart_spec generation block")
-
-                chart_messages = create_chart_spec_prompt(question, formatted_answer)
-                chart_resp = await call_llm(
-                    messages=chart_messages,
-                    model="gpt-4o-mini",
-                    temperature=0.0,
-                    max_tokens=1500,
-                )
-
-                raw_chart = (chart_resp.choices[0].message.content or "").strip()
-                logger.info(f"RAW_CHART_SPEC {raw_chart}")
-
-                chart_obj = parse_raw_chart(raw_chart, logger)
-
-                required_keys = {
-                    "chart_type",
-                    "title",
-                    "x_field",
-                    "x_label",
-                    "y_fields",
-                    "y_label",
-                    "data",
-                }
-
-                def normalize_one(spec: dict) -> dict | None:
-                    if "x-label" in spec and "x_field" in spec:
-                        spec["x_label"] = spec.pop("x-label")
-
-                    if not required_keys.issubset(spec.keys()):
-                        logger.warning(
-                            "CHART_DEBUG chart_spec missing required keys: %s",
-                            spec.keys(),
-                        )
-                        return None
-
-                    return spec
-
-                chart_specs: list[dict] = []
-
-                if isinstance(chart_obj, dict):
-                    normalized = normalize_one(chart_obj)
-                    if normalized:
-                        chart_specs.append(normalized)
-                elif isinstance(chart_obj, list):
-                    for idx, item in enumerate(chart_obj):
-                        if not isinstance(item, dict):
-                            logger.warning(
-                                "CHART_DEBUG chart_specs[%s] is not a dict, skipping",
-                                idx,
-                            )
-                            continue
-                        normalized = normalize_one(item)
-                        if normalized:
-                            chart_specs.append(normalized)
-                elif chart_obj is not None:
-                    logger.warning(
-                        "CHART_DEBUG chart_spec is neither dict nor list. skipping: %r",
-                        type(chart_obj),
-                    )
-
-                if chart_specs and result_holder is not None:
-                    result_holder["chart_specs"] = chart_specs
-                    logger.info(
-                        "CHART_DEBUG set chart_specs on result_holder: %s",
-                        chart_specs,
-                    )
-
-        except Exception as e:
-            logger.warning(f"Chart spec generation failed: {e}")
+        if formatted_answer != "".join(full_answer_parts):
+            yield ReplaceAnswer(formatted_answer)
 
     except Exception as e:
         error_msg = f"There was a temporary problem generating the answer: {str(e)}"
-        _store(error_msg, unique_sources)
-        yield error_msg
+        if full_answer_parts:
+            # Keep what was already streamed, but make the failure visible
+            partial = "".join(full_answer_parts).rstrip()
+            _store(f"{partial}\n\n{error_msg}", unique_sources)
+            yield ReplaceAnswer(f"{partial}\n\n{error_msg}")
+        else:
+            _store(error_msg, unique_sources)
+            yield error_msg
     return
 
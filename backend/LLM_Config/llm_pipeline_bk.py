@@ -871,18 +871,17 @@ async def llm_pipeline_stream(
     try:
         full_answer_parts: list[str] = []
         
-        stream = await stream_llm(
+        async with stream_llm(
             model="gpt-4o-mini",
             messages=messages,
             temperature=0.3,
             max_tokens=4096,
-        )
-            
-        async for chunk in stream:
-            delta = chunk.choices[0].delta or {}
-            text = getattr(delta, "content", "") or ""
-            if text:
-                full_answer_parts.append(text)
+        ) as stream:
+            async for chunk in stream:
+                delta = chunk.choices[0].delta or {}
+                text = getattr(delta, "content", "") or ""
+                if text:
+                    full_answer_parts.append(text)
 
         raw_answer = "".join(full_answer_parts).strip()
 
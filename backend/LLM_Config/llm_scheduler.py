@@ -0,0 +1,233 @@
+"""
+Tenant-fair scheduler for upstream LLM calls (replaces the global semaphore).
+
+Every call_llm / stream_llm takes a slot from LLM_SCHEDULER. Waiters are
+ordered by start-time fair queuing: each (tenant, priority) flow gets virtual
+start tags spaced by 1 / weight, and the smallest tag whose tenant is under
+its concurrency cap is dispatched next. So
+
+- a tenant flooding EXPORT_TABLE queries only delays its own queue;
+- priority classes are weighted, not strict: interactive generation goes
+  ahead of rerank calls, which go ahead of background work (chart specs,
+  suggestions), yet background still progresses under sustained load;
+- no tenant holds more than LLM_TENANT_MAX_CONCURRENCY slots at once.
+
+Queue wait is recorded per tenant/priority in rag_llm_queue_wait_seconds;
+in-flight and queued counts are exported as gauges. saturation() turns the
+live counts and the average slot hold time into an expected queue wait.
+Streaming calls hold their slot for the whole stream (LLM_Config.llm_streams).
+"""
+from __future__ import annotations
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from Vector_setup.base.metrics import LLM_QUEUE_WAIT_SECONDS, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# EWMA smoothing for the average slot hold time
+_HOLD_EWMA_ALPHA = 0.1
+
+PRIORITY_INTERACTIVE = "interactive"   # main answer generation
+PRIORITY_RERANK = "rerank"             # rerank / formatter calls on the answer path
+PRIORITY_BACKGROUND = "background"     # chart specs, suggestions after `done`
+
+PRIORITY_WEIGHTS: Dict[str, float] = {
+    PRIORITY_INTERACTIVE: 8.0,
+    PRIORITY_RERANK: 3.0,
+    PRIORITY_BACKGROUND: 1.0,
+}
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "30"))
+LLM_TENANT_MAX_CONCURRENCY = int(os.getenv("LLM_TENANT_MAX_CONCURRENCY", "10"))
+
+
+def _parse_tenant_weights(raw: str) -> Dict[str, float]:
+    """"tenant_a:2,tenant_b:0.5" -> {"tenant_a": 2.0, "tenant_b": 0.5}"""
+    weights: Dict[str, float] = {}
+    for part in (raw or "").split(","):
+        tenant, _, weight = part.strip().partition(":")
+        if tenant and weight:
+            try:
+                weights[tenant.strip()] = max(float(weight), 0.01)
+            except ValueError:
+                logger.warning("Ignoring bad LLM_TENANT_WEIGHTS entry %r", part)
+    return weights
+
+
+@dataclass(order=True)
+class _Waiter:
+    start_tag: float
+    seq: int
+    tenant: str = field(compare=False)
+    priority: str = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        capacity: int = LLM_MAX_CONCURRENCY,
+        tenant_cap: int = LLM_TENANT_MAX_CONCURRENCY,
+        priority_weights: Optional[Dict[str, float]] = None,
+        tenant_weights: Optional[Dict[str, float]] = None,
+    ):
+        self.capacity = max(1, capacity)
+        self.tenant_cap = max(1, min(tenant_cap, self.capacity))
+        self.priority_weights = dict(priority_weights or PRIORITY_WEIGHTS)
+        self.tenant_weights = dict(tenant_weights or {})
+        self._heap: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._vtime = 0.0
+        self._last_finish: Dict[Tuple[str, str], float] = {}
+        self._in_flight = 0
+        self._tenant_in_flight: Dict[str, int] = defaultdict(int)
+        self._priority_in_flight: Dict[str, int] = defaultdict(int)
+        self.avg_hold_s: Optional[float] = None
+
+    # ----- public API -----
+
+    @asynccontextmanager
+    async def slot(self, tenant_id: Optional[str], priority: str = PRIORITY_INTERACTIVE) -> AsyncIterator[None]:
+        """Hold one upstream slot for the body of the `async with`."""
+        tenant, priority = await self.acquire(tenant_id, priority)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(tenant, priority, held_s=time.perf_counter() - start)
+
+    async def acquire(self, tenant_id: Optional[str], priority: str = PRIORITY_INTERACTIVE) -> Tuple[str, str]:
+        tenant = tenant_id or "unknown"
+        if priority not in self.priority_weights:
+            priority = PRIORITY_INTERACTIVE
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(
+            start_tag=self._start_tag(tenant, priority),
+            seq=next(self._seq),
+            tenant=tenant,
+            priority=priority,
+            enqueued_at=time.perf_counter(),
+            future=loop.create_future(),
+        )
+        heapq.heappush(self._heap, waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as we were cancelled: hand the slot back
+                self.release(tenant, priority)
+            else:
+                waiter.future.cancel()
+                self._dispatch()
+            raise
+        LLM_QUEUE_WAIT_SECONDS.observe(
+            time.perf_counter() - waiter.enqueued_at, tenant=tenant, priority=priority
+        )
+        return tenant, priority
+
+    def release(self, tenant: str, priority: str, held_s: Optional[float] = None) -> None:
+        if held_s is not None:
+            self.avg_hold_s = held_s if self.avg_hold_s is None else (
+                (1 - _HOLD_EWMA_ALPHA) * self.avg_hold_s + _HOLD_EWMA_ALPHA * held_s
+            )
+        self._in_flight -= 1
+        self._tenant_in_flight[tenant] -= 1
+        self._priority_in_flight[priority] -= 1
+        if self._tenant_in_flight[tenant] <= 0:
+            del self._tenant_in_flight[tenant]
+        self._dispatch()
+
+    def snapshot(self) -> dict:
+        queued: Dict[str, int] = defaultdict(int)
+        for w in self._heap:
+            if not w.future.done():
+                queued[w.priority] += 1
+        return {
+            "capacity": self.capacity,
+            "tenant_cap": self.tenant_cap,
+            "in_flight": self._in_flight,
+            "in_flight_by_priority": dict(self._priority_in_flight),
+            "queued_by_priority": dict(queued),
+            "queued": sum(queued.values()),
+        }
+
+    def saturation(self, priority: str = PRIORITY_INTERACTIVE) -> dict:
+        """
+        Live load: slot utilization plus an estimate of how long a new call at
+        `priority` would queue (waiters at the same or a heavier class, drained
+        `capacity` at a time, each holding a slot for avg_hold_s).
+        """
+        weight = self.priority_weights.get(priority, self.priority_weights[PRIORITY_INTERACTIVE])
+        ahead = sum(
+            1 for w in self._heap
+            if not w.future.done() and self.priority_weights[w.priority] >= weight
+        )
+        free = self.capacity - self._in_flight
+        hold = self.avg_hold_s or 0.0
+        est_wait_s = 0.0 if ahead < free else ((ahead - free) // self.capacity + 1) * hold
+        return {
+            "utilization": round(self._in_flight / self.capacity, 3),
+            "in_flight": self._in_flight,
+            "capacity": self.capacity,
+            "queued_ahead": ahead,
+            "avg_hold_s": None if self.avg_hold_s is None else round(self.avg_hold_s, 3),
+            "est_wait_s": round(est_wait_s, 3),
+        }
+
+    # ----- internals -----
+
+    def _start_tag(self, tenant: str, priority: str) -> float:
+        weight = self.priority_weights[priority] * self.tenant_weights.get(tenant, 1.0)
+        start = max(self._vtime, self._last_finish.get((tenant, priority), 0.0))
+        self._last_finish[(tenant, priority)] = start + 1.0 / weight
+        return start
+
+    def _dispatch(self) -> None:
+        skipped: list[_Waiter] = []
+        while self._heap and self._in_flight < self.capacity:
+            waiter = heapq.heappop(self._heap)
+            if waiter.future.done():
+                continue  # cancelled while queued
+            if self._tenant_in_flight[waiter.tenant] >= self.tenant_cap:
+                skipped.append(waiter)
+                continue
+            self._vtime = max(self._vtime, waiter.start_tag)
+            self._in_flight += 1
+            self._tenant_in_flight[waiter.tenant] += 1
+            self._priority_in_flight[waiter.priority] += 1
+            waiter.future.set_result(None)
+        for waiter in skipped:
+            heapq.heappush(self._heap, waiter)
+        if not self._heap and not self._in_flight:
+            # Idle: reset virtual time so tags stay small
+            self._vtime = 0.0
+            self._last_finish.clear()
+
+
+LLM_SCHEDULER = LLMScheduler(
+    tenant_weights=_parse_tenant_weights(os.getenv("LLM_TENANT_WEIGHTS", "")),
+)
+
+REGISTRY.gauge(
+    "rag_llm_in_flight", "LLM calls holding a scheduler slot.", ("priority",),
+    collect=lambda: {(p,): n for p, n in LLM_SCHEDULER.snapshot()["in_flight_by_priority"].items()},
+)
+REGISTRY.gauge(
+    "rag_llm_utilization", "Fraction of LLM scheduler slots in use.",
+    collect=lambda: {(): LLM_SCHEDULER.saturation()["utilization"]},
+)
+REGISTRY.gauge(
+    "rag_llm_queued", "LLM calls waiting for a scheduler slot.", ("priority",),
+    collect=lambda: {(p,): n for p, n in LLM_SCHEDULER.snapshot()["queued_by_priority"].items()},
+)
@@ -1,36 +1,40 @@
 #!/usr/bin/env python3
 """LLM module Setup"""
-import os
-import asyncio
-from openai import AsyncOpenAI
+from typing import AsyncContextManager, Optional
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# After load_dotenv: the scheduler and transport read their settings from the environment
+from LLM_Config.llm_scheduler import LLM_SCHEDULER, PRIORITY_INTERACTIVE
+from LLM_Config.llm_streams import TrackedStream, open_tracked_stream
+from LLM_Config.llm_transport import LLM_TRANSPORT
 
-# Get the environment variables
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_API_BASE = os.getenv("OPENAI_API_BASE")
 
-# Single shared async client instances
-llm_client = AsyncOpenAI(
-    api_key=OPENAI_API_KEY,
-    base_url=OPENAI_API_BASE,
-)
+# Upstream endpoints (failover, hedging, per-endpoint clients): see llm_transport
+# Upstream concurrency: tenant-fair, priority-weighted slots (see llm_scheduler)
 
-LLM_SEMAPHORE = asyncio.Semaphore(30)
-
-async def call_llm( **kwargs):
-    async with LLM_SEMAPHORE:
-        response = await llm_client.chat.completions.create(**kwargs,
-        )
+async def call_llm(
+    tenant_id: Optional[str] = None,
+    priority: str = PRIORITY_INTERACTIVE,
+    hedge: bool = True,
+    **kwargs,
+):
+    async with LLM_SCHEDULER.slot(tenant_id, priority):
+        # Calls of one priority are similar in size: one latency percentile for hedging
+        response = await LLM_TRANSPORT.create(kind=priority, hedge=hedge, **kwargs)
         return response
 
-async def stream_llm(**kwargs):
-    # optional: reuse same semaphore or a separate one
-    async with LLM_SEMAPHORE:
-        return await llm_client.chat.completions.create(stream=True, **kwargs)
-
-
-
+def stream_llm(
+    tenant_id: Optional[str] = None,
+    priority: str = PRIORITY_INTERACTIVE,
+    **kwargs,
+) -> AsyncContextManager[TrackedStream]:
+    # `async with stream_llm(...) as stream`: the slot is held until the block
+    # exits, not just while the stream opens, and the upstream is closed there
+    return open_tracked_stream(
+        lambda: LLM_TRANSPORT.stream(**kwargs),
+        tenant_id=tenant_id,
+        priority=priority,
+    )
@@ -0,0 +1,271 @@
+"""
+Stream-lifetime accounting for streaming LLM calls.
+
+stream_llm used to hold its concurrency slot only while the stream was being
+created, so streaming generations were effectively unlimited. A TrackedStream
+keeps the scheduler slot until the stream is exhausted, fails, or is closed
+(including a client that goes away mid-answer), and closes the upstream
+response so the provider stops generating. Streams are only handed out inside
+`async with`, so the slot and the upstream connection are released by the
+consumer's own task, never by the garbage collector. Finished streams are
+counted by outcome (completed / cancelled / error) along with the tokens each
+outcome consumed.
+
+Per stream it measures time to first token and tokens/sec (one content
+chunk ~ one token). STREAM_TRACKER keeps in-flight streams and recent
+averages; together with LLMScheduler.saturation() this is the live upstream
+load admission control works from.
+"""
+from __future__ import annotations
+import asyncio
+import inspect
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from LLM_Config.llm_scheduler import LLM_SCHEDULER, LLMScheduler, PRIORITY_INTERACTIVE
+from Vector_setup.base.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# EWMA smoothing for the "recent" stream averages
+_EWMA_ALPHA = 0.2
+
+STREAM_TTFT_SECONDS = REGISTRY.histogram(
+    "rag_llm_stream_ttft_seconds", "Streaming LLM time to first token.", ("tenant", "priority"))
+STREAM_TOKENS_PER_SECOND = REGISTRY.histogram(
+    "rag_llm_stream_tokens_per_second", "Streaming LLM decode rate (content chunks/s).",
+    ("tenant", "priority"), buckets=(1, 5, 10, 20, 40, 60, 80, 120, 160, 240))
+STREAM_DURATION_SECONDS = REGISTRY.histogram(
+    "rag_llm_stream_duration_seconds", "Time a stream held its LLM slot.", ("tenant", "priority"))
+STREAMS_TOTAL = REGISTRY.counter(
+    "rag_llm_streams_total", "Finished LLM streams by outcome.", ("priority", "outcome"))
+# Tokens paid for per outcome; "cancelled" is generation nobody read
+STREAM_TOKENS_TOTAL = REGISTRY.counter(
+    "rag_llm_stream_tokens_total", "Content chunks received per stream outcome.", ("priority", "outcome"))
+
+
+@dataclass
+class StreamRecord:
+    stream_id: int
+    tenant: str
+    priority: str
+    requested_at: float
+    first_token_at: Optional[float] = None
+    tokens: int = 0
+    outcome: Optional[str] = None
+
+    def as_dict(self, now: Optional[float] = None) -> Dict[str, Any]:
+        now = now or time.perf_counter()
+        ttft = None if self.first_token_at is None else self.first_token_at - self.requested_at
+        return {
+            "stream_id": self.stream_id,
+            "tenant": self.tenant,
+            "priority": self.priority,
+            "age_s": round(now - self.requested_at, 3),
+            "ttft_s": None if ttft is None else round(ttft, 3),
+            "tokens": self.tokens,
+        }
+
+
+class StreamTracker:
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._active: Dict[int, StreamRecord] = {}
+        self.ewma_ttft_s: Optional[float] = None
+        self.ewma_tokens_per_s: Optional[float] = None
+        self.ewma_duration_s: Optional[float] = None
+        self.completed = 0
+
+    def start(self, tenant: str, priority: str) -> StreamRecord:
+        record = StreamRecord(next(self._ids), tenant, priority, time.perf_counter())
+        self._active[record.stream_id] = record
+        return record
+
+    def token(self, record: StreamRecord) -> None:
+        if record.first_token_at is None:
+            record.first_token_at = time.perf_counter()
+            ttft = record.first_token_at - record.requested_at
+            STREAM_TTFT_SECONDS.observe(ttft, tenant=record.tenant, priority=record.priority)
+            self.ewma_ttft_s = _ewma(self.ewma_ttft_s, ttft)
+        record.tokens += 1
+
+    def finish(self, record: StreamRecord, outcome: str) -> None:
+        if self._active.pop(record.stream_id, None) is None:
+            return
+        record.outcome = outcome
+        now = time.perf_counter()
+        duration = now - record.requested_at
+        STREAM_DURATION_SECONDS.observe(duration, tenant=record.tenant, priority=record.priority)
+        self.ewma_duration_s = _ewma(self.ewma_duration_s, duration)
+        if record.first_token_at is not None and record.tokens > 1:
+            decode_s = now - record.first_token_at
+            if decode_s > 0:
+                tps = (record.tokens - 1) / decode_s
+                STREAM_TOKENS_PER_SECOND.observe(tps, tenant=record.tenant, priority=record.priority)
+                self.ewma_tokens_per_s = _ewma(self.ewma_tokens_per_s, tps)
+        STREAMS_TOTAL.inc(priority=record.priority, outcome=outcome)
+        STREAM_TOKENS_TOTAL.inc(record.tokens, priority=record.priority, outcome=outcome)
+        self.completed += 1
+
+    def in_flight(self) -> int:
+        return len(self._active)
+
+    def snapshot(self) -> dict:
+        now = time.perf_counter()
+        return {
+            "in_flight": len(self._active),
+            "completed": self.completed,
+            "ewma_ttft_s": _round(self.ewma_ttft_s),
+            "ewma_tokens_per_s": _round(self.ewma_tokens_per_s),
+            "ewma_duration_s": _round(self.ewma_duration_s),
+            "streams": [r.as_dict(now) for r in self._active.values()],
+        }
+
+
+def _ewma(current: Optional[float], value: float) -> float:
+    return value if current is None else (1 - _EWMA_ALPHA) * current + _EWMA_ALPHA * value
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 3)
+
+
+STREAM_TRACKER = StreamTracker()
+
+
+class TrackedStream:
+    """
+    Async-iterable wrapper around an upstream chat-completions stream that owns
+    one scheduler slot for its whole life. Obtained from stream_llm /
+    open_tracked_stream, which only hand it out inside `async with`:
+
+        async with stream_llm(...) as stream:
+            async for chunk in stream:
+                ...
+    """
+
+    def __init__(
+        self,
+        upstream: Any,
+        record: StreamRecord,
+        scheduler: LLMScheduler,
+        tracker: StreamTracker,
+    ):
+        self._upstream = upstream
+        self._iter = upstream.__aiter__()
+        self.record = record
+        self._scheduler = scheduler
+        self._tracker = tracker
+        self._closed = False
+
+    def __aiter__(self) -> "TrackedStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        if self._closed:
+            raise StopAsyncIteration
+        try:
+            chunk = await self._iter.__anext__()
+        except StopAsyncIteration:
+            await self.aclose("completed")
+            raise
+        except asyncio.CancelledError:
+            # Consumer cancelled while waiting on the provider (client went away)
+            await self.aclose("cancelled")
+            raise
+        except BaseException:
+            await self.aclose("error")
+            raise
+        if _has_content(chunk):
+            self._tracker.token(self.record)
+        return chunk
+
+    async def __aenter__(self) -> "TrackedStream":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        # Exhausted streams are already closed; anything left was abandoned early
+        if exc_type is None or issubclass(exc_type, (asyncio.CancelledError, GeneratorExit)):
+            await self.aclose("cancelled")
+        else:
+            await self.aclose("error")
+
+    async def aclose(self, outcome: str = "cancelled") -> None:
+        if self._closed:
+            return
+        self._release(outcome)
+        close = getattr(self._upstream, "close", None) or getattr(self._upstream, "aclose", None)
+        if close is not None:
+            try:
+                result = close()
+                if inspect.isawaitable(result):
+                    # Shielded: a cancelled request must still drop the upstream
+                    # connection, or the provider keeps generating (and billing)
+                    await asyncio.shield(result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.debug("Closing upstream stream failed: %s", e)
+
+    def _release(self, outcome: str) -> None:
+        # Slot first: it must come back even if closing the upstream fails
+        self._closed = True
+        held_s = time.perf_counter() - self.record.requested_at
+        self._scheduler.release(self.record.tenant, self.record.priority, held_s=held_s)
+        self._tracker.finish(self.record, outcome)
+
+    def __del__(self) -> None:
+        # Only a report: releasing from a finalizer would run outside the
+        # consumer's task and loop, and still leave the upstream open
+        if not self._closed:
+            logger.error("LLM stream %s was garbage-collected without being closed", self.record.stream_id)
+
+
+def _has_content(chunk: Any) -> bool:
+    try:
+        delta = chunk.choices[0].delta
+    except (AttributeError, IndexError, TypeError):
+        return False
+    return bool(getattr(delta, "content", None))
+
+
+@asynccontextmanager
+async def open_tracked_stream(
+    create: Callable[[], Awaitable[Any]],
+    tenant_id: Optional[str] = None,
+    priority: str = PRIORITY_INTERACTIVE,
+    scheduler: LLMScheduler = LLM_SCHEDULER,
+    tracker: StreamTracker = STREAM_TRACKER,
+) -> AsyncIterator[TrackedStream]:
+    """
+    Take a slot, open the upstream stream, and yield both as a TrackedStream;
+    leaving the block closes the stream and returns the slot.
+    """
+    tenant, priority = await scheduler.acquire(tenant_id, priority)
+    record = tracker.start(tenant, priority)
+    try:
+        upstream = await create()
+    except BaseException:
+        scheduler.release(tenant, priority, held_s=time.perf_counter() - record.requested_at)
+        tracker.finish(record, "error")
+        raise
+    stream = TrackedStream(upstream, record, scheduler, tracker)
+    async with stream:
+        yield stream
+
+
+def llm_load(priority: str = PRIORITY_INTERACTIVE) -> dict:
+    """Aggregate upstream load (no per-tenant detail): scheduler saturation + stream averages."""
+    streams = STREAM_TRACKER.snapshot()
+    streams.pop("streams")
+    return {**LLM_SCHEDULER.saturation(priority), "streams": streams}
+
+
+REGISTRY.gauge(
+    "rag_llm_streams_in_flight", "Streaming LLM calls currently holding a slot.",
+    collect=lambda: {(): STREAM_TRACKER.in_flight()},
+)
@@ -0,0 +1,140 @@
+"""
+Local OpenAI-compatible chat-completions stub, for tests and load runs
+without a provider.
+
+    python -m LLM_Config.llm_stub --port 8099 --latency 0.2 --fail-rate 0.1
+    LLM_ENDPOINTS="stub=http://127.0.0.1:8099/v1,primary=https://api.openai.com/v1"
+
+In tests, mount the app on an httpx ASGI transport instead of a port:
+
+    stub = StubConfig(latency_s=0.5)
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=create_stub_app(stub)))
+    client = AsyncOpenAI(base_url="http://stub/v1", api_key="test", http_client=http)
+
+Serves POST /v1/chat/completions (plain and `stream: true` SSE) and
+GET /v1/models. The reply echoes the last user message unless `reply` is set.
+StubConfig can be changed while the app runs (e.g. start failing mid-test),
+and counts the requests it has seen.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class StubConfig:
+    latency_s: float = 0.0          # before the response (streams: before the first chunk)
+    token_delay_s: float = 0.0      # between streamed chunks
+    fail_rate: float = 0.0          # share of requests answered with `fail_status`
+    fail_status: int = 503
+    reply: Optional[str] = None
+    requests: int = 0
+
+
+def _reply_text(config: StubConfig, body: Dict[str, Any]) -> str:
+    if config.reply is not None:
+        return config.reply
+    user_messages = [m.get("content") or "" for m in body.get("messages", []) if m.get("role") == "user"]
+    return f"stub: {user_messages[-1]}" if user_messages else "stub"
+
+
+def _completion(model: str, text: str) -> Dict[str, Any]:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": text},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(text.split()), "total_tokens": len(text.split())},
+    }
+
+
+def _chunk(completion_id: str, model: str, delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+async def _stream(config: StubConfig, model: str, text: str) -> AsyncIterator[str]:
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+    for i, word in enumerate(text.split(" ")):
+        if config.token_delay_s:
+            await asyncio.sleep(config.token_delay_s)
+        yield _chunk(completion_id, model, {"content": word if i == 0 else f" {word}"})
+    yield _chunk(completion_id, model, {}, finish_reason="stop")
+    yield "data: [DONE]\n\n"
+
+
+def create_stub_app(config: Optional[StubConfig] = None) -> FastAPI:
+    config = config or StubConfig()
+    app = FastAPI(title="LLM stub")
+    app.state.config = config
+
+    @app.get("/v1/models")
+    async def models() -> Dict[str, Any]:
+        return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        config.requests += 1
+        body = await request.json()
+        if config.latency_s:
+            await asyncio.sleep(config.latency_s)
+        if config.fail_rate and random.random() < config.fail_rate:
+            return JSONResponse(
+                status_code=config.fail_status,
+                content={"error": {"message": "stub failure", "type": "server_error"}},
+            )
+        model = body.get("model") or "stub"
+        text = _reply_text(config, body)
+        if body.get("stream"):
+            return StreamingResponse(_stream(config, model, text), media_type="text/event-stream")
+        return _completion(model, text)
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="OpenAI-compatible chat-completions stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each response")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--fail-status", type=int, default=503)
+    parser.add_argument("--reply", default=None)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency_s=args.latency,
+        token_delay_s=args.token_delay,
+        fail_rate=args.fail_rate,
+        fail_status=args.fail_status,
+        reply=args.reply,
+    )
+    uvicorn.run(create_stub_app(config), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Multi-endpoint transport for chat-completions calls.
+
+llm_setup used to bind one AsyncOpenAI client to OPENAI_API_BASE, so any
+slowness at that provider went straight into our p99. The transport holds
+several endpoints, each with its own client (and so its own connection pool),
+and keeps health and latency stats per endpoint:
+
+    LLM_ENDPOINTS="primary=https://api.openai.com/v1,backup=https://proxy.internal/v1"
+    LLM_ENDPOINT_BACKUP_API_KEY=...        # per endpoint; falls back to OPENAI_API_KEY
+
+Without LLM_ENDPOINTS there is one endpoint, "default", built from
+OPENAI_API_BASE / OPENAI_API_KEY as before.
+
+- Failover: connection errors, timeouts, 429 and 5xx move on to the next
+  endpoint (configured order, endpoints with an open circuit last). Other 4xx
+  are the request's fault and are raised as is. After
+  LLM_ENDPOINT_FAILURE_THRESHOLD consecutive failures an endpoint sits out
+  LLM_ENDPOINT_COOLDOWN_S seconds.
+- Hedging (non-streaming calls only: rerank, chart, formatter): if the first
+  attempt has not answered by the endpoint's LLM_HEDGE_PERCENTILE latency for
+  that call class, a duplicate goes to the next endpoint (the same one when
+  there is only one) and the first answer wins; the loser is cancelled. The
+  duplicate rides on the caller's scheduler slot, and by construction fires
+  for roughly (1 - percentile) of calls.
+- Streams fail over when opening; once tokens flow they stay on their endpoint.
+
+For tests and local runs LLM_Config.llm_stub serves an OpenAI-compatible API
+with configurable latency and failures.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from Vector_setup.base.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() in ("true", "1", "yes", "y")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+# Latency samples an endpoint needs (per call class) before hedging kicks in
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_ENDPOINT_FAILURE_THRESHOLD = int(os.getenv("LLM_ENDPOINT_FAILURE_THRESHOLD", "3"))
+LLM_ENDPOINT_COOLDOWN_S = float(os.getenv("LLM_ENDPOINT_COOLDOWN_S", "30"))
+LLM_REQUEST_TIMEOUT_S = float(os.getenv("LLM_REQUEST_TIMEOUT_S", "60"))
+
+_LATENCY_WINDOW = 200
+_EWMA_ALPHA = 0.1
+
+ENDPOINT_LATENCY_SECONDS = REGISTRY.histogram(
+    "rag_llm_endpoint_latency_seconds", "Upstream call latency per endpoint (streams: until open).",
+    ("endpoint", "kind"))
+ENDPOINT_REQUESTS_TOTAL = REGISTRY.counter(
+    "rag_llm_endpoint_requests_total", "Upstream attempts per endpoint by outcome.", ("endpoint", "outcome"))
+HEDGES_TOTAL = REGISTRY.counter(
+    "rag_llm_hedges_total", "Hedged duplicates fired, and how many of them answered first.", ("outcome",))
+
+
+class EndpointStats:
+    def __init__(self):
+        self._latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=_LATENCY_WINDOW))
+        self.ewma_latency_s: Optional[float] = None
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.in_flight = 0
+
+    def record_success(self, kind: str, latency_s: float) -> None:
+        self._latencies[kind].append(latency_s)
+        self.ewma_latency_s = latency_s if self.ewma_latency_s is None else (
+            (1 - _EWMA_ALPHA) * self.ewma_latency_s + _EWMA_ALPHA * latency_s
+        )
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def record_failure(self, threshold: int, cooldown_s: float) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= threshold:
+            self.open_until = time.monotonic() + cooldown_s
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.open_until
+
+    def percentile(self, kind: str, q: float, min_samples: int) -> Optional[float]:
+        samples = self._latencies.get(kind)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def as_dict(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "successes": self.successes,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "ewma_latency_s": None if self.ewma_latency_s is None else round(self.ewma_latency_s, 3),
+            "p95_latency_s": {
+                kind: round(p, 3) for kind in self._latencies
+                if (p := self.percentile(kind, 0.95, 1)) is not None
+            },
+        }
+
+
+def _default_client(base_url: Optional[str], api_key: Optional[str]) -> Any:
+    from openai import AsyncOpenAI
+
+    # Failover and hedging happen here, so the SDK's own retries are off
+    return AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=LLM_REQUEST_TIMEOUT_S)
+
+
+class LLMEndpoint:
+    """One upstream base URL + key, with its own client (created on first use)."""
+
+    def __init__(
+        self,
+        name: str,
+        base_url: Optional[str],
+        api_key: Optional[str],
+        client: Any = None,
+        client_factory: Callable[[Optional[str], Optional[str]], Any] = _default_client,
+    ):
+        self.name = name
+        self.base_url = base_url
+        self._api_key = api_key
+        self._client = client
+        self._client_factory = client_factory
+        self.stats = EndpointStats()
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            self._client = self._client_factory(self.base_url, self._api_key)
+        return self._client
+
+
+def should_fail_over(exc: BaseException) -> bool:
+    """Whether another endpoint might succeed where this one failed."""
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    # openai.APIConnectionError / APITimeoutError carry no status code
+    return any(cls.__name__ == "APIConnectionError" for cls in type(exc).__mro__)
+
+
+class LLMTransport:
+    def __init__(
+        self,
+        endpoints: List[LLMEndpoint],
+        hedge_enabled: bool = LLM_HEDGE_ENABLED,
+        hedge_percentile: float = LLM_HEDGE_PERCENTILE,
+        hedge_min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+        failure_threshold: int = LLM_ENDPOINT_FAILURE_THRESHOLD,
+        cooldown_s: float = LLM_ENDPOINT_COOLDOWN_S,
+    ):
+        if not endpoints:
+            raise ValueError("LLMTransport needs at least one endpoint")
+        self.endpoints = endpoints
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+
+    # ----- public API -----
+
+    async def create(self, kind: str = "default", hedge: bool = True, **kwargs) -> Any:
+        """
+        Non-streaming chat completion with failover and (optionally) a hedged
+        duplicate. `kind` groups calls of similar size for the latency percentile.
+        """
+        candidates = self._candidates()
+        pending: Dict[asyncio.Task, LLMEndpoint] = {}
+        next_idx = 0
+        hedge_task: Optional[asyncio.Task] = None
+        last_error: Optional[BaseException] = None
+
+        def launch() -> asyncio.Task:
+            nonlocal next_idx
+            endpoint = candidates[next_idx % len(candidates)]
+            next_idx += 1
+            task = asyncio.create_task(self._attempt(endpoint, kind, kwargs))
+            pending[task] = endpoint
+            return task
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if hedge and self.hedge_enabled and hedge_task is None and len(pending) == 1:
+                    timeout = self._hedge_delay_s(next(iter(pending.values())), kind)
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # First attempt is slower than usual: race a duplicate
+                    HEDGES_TOTAL.inc(outcome="fired")
+                    hedge_task = launch()
+                    continue
+                for task in done:
+                    endpoint = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        if task is hedge_task:
+                            HEDGES_TOTAL.inc(outcome="won")
+                        return task.result()
+                    last_error = error
+                    if not should_fail_over(error):
+                        raise error
+                    logger.warning("LLM endpoint %s failed (%s), failing over", endpoint.name, error)
+                    if not pending and next_idx < len(candidates):
+                        launch()
+            raise last_error  # every endpoint failed
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream(self, **kwargs) -> Any:
+        """Open a streaming completion, failing over while the stream is being opened."""
+        last_error: Optional[BaseException] = None
+        for endpoint in self._candidates():
+            try:
+                return await self._attempt(endpoint, "stream_open", {**kwargs, "stream": True})
+            except Exception as e:
+                if not should_fail_over(e):
+                    raise
+                logger.warning("LLM endpoint %s failed to open a stream (%s), failing over", endpoint.name, e)
+                last_error = e
+        raise last_error
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {ep.name: {"base_url": ep.base_url, **ep.stats.as_dict()} for ep in self.endpoints}
+
+    # ----- internals -----
+
+    def _candidates(self) -> List[LLMEndpoint]:
+        # Configured order; endpoints sitting out a cooldown go last, never away
+        healthy = [ep for ep in self.endpoints if ep.stats.healthy]
+        return healthy + [ep for ep in self.endpoints if not ep.stats.healthy]
+
+    def _hedge_delay_s(self, endpoint: LLMEndpoint, kind: str) -> Optional[float]:
+        return endpoint.stats.percentile(kind, self.hedge_percentile, self.hedge_min_samples)
+
+    async def _attempt(self, endpoint: LLMEndpoint, kind: str, kwargs: Dict[str, Any]) -> Any:
+        stats = endpoint.stats
+        stats.in_flight += 1
+        start = time.perf_counter()
+        try:
+            result = await endpoint.client.chat.completions.create(**kwargs)
+        except asyncio.CancelledError:
+            # Lost a hedge race or the caller went away: says nothing about the endpoint
+            ENDPOINT_REQUESTS_TOTAL.inc(endpoint=endpoint.name, outcome="cancelled")
+            raise
+        except Exception as e:
+            if should_fail_over(e):
+                stats.record_failure(self.failure_threshold, self.cooldown_s)
+                ENDPOINT_REQUESTS_TOTAL.inc(endpoint=endpoint.name, outcome="error")
+            else:
+                ENDPOINT_REQUESTS_TOTAL.inc(endpoint=endpoint.name, outcome="rejected")
+            raise
+        finally:
+            stats.in_flight -= 1
+        latency = time.perf_counter() - start
+        stats.record_success(kind, latency)
+        ENDPOINT_LATENCY_SECONDS.observe(latency, endpoint=endpoint.name, kind=kind)
+        ENDPOINT_REQUESTS_TOTAL.inc(endpoint=endpoint.name, outcome="ok")
+        return result
+
+
+def _parse_endpoints(raw: str) -> List[Tuple[str, str]]:
+    """"primary=https://a/v1,backup=https://b/v1" -> [("primary", "https://a/v1"), ...]"""
+    endpoints: List[Tuple[str, str]] = []
+    for part in (raw or "").split(","):
+        name, _, base_url = part.strip().partition("=")
+        if name and base_url:
+            endpoints.append((name.strip(), base_url.strip()))
+        elif part.strip():
+            logger.warning("Ignoring bad LLM_ENDPOINTS entry %r", part)
+    return endpoints
+
+
+def endpoints_from_env() -> List[LLMEndpoint]:
+    default_key = os.getenv("OPENAI_API_KEY")
+    configured = _parse_endpoints(os.getenv("LLM_ENDPOINTS", ""))
+    if not configured:
+        return [LLMEndpoint("default", os.getenv("OPENAI_API_BASE"), default_key)]
+    return [
+        LLMEndpoint(name, base_url, os.getenv(f"LLM_ENDPOINT_{name.upper()}_API_KEY", default_key))
+        for name, base_url in configured
+    ]
+
+
+LLM_TRANSPORT = LLMTransport(endpoints_from_env())
+
+REGISTRY.gauge(
+    "rag_llm_endpoint_healthy", "1 if the endpoint is taking traffic, 0 while it cools down.", ("endpoint",),
+    collect=lambda: {(ep.name,): int(ep.stats.healthy) for ep in LLM_TRANSPORT.endpoints},
+)
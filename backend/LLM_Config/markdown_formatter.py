@@ -0,0 +1,245 @@
+"""
+Deterministic local Markdown formatter for model answers.
+
+Applies the mechanical part of FORMATTER_SYSTEM_PROMPT in one pass, without an
+LLM round trip and without truncating long answers:
+
+- normalize line endings, trailing spaces and runs of blank lines
+- headings: "#Title" -> "# Title", drop trailing colons, a bold-only label
+  line ("**Costs:**") becomes a "###" heading
+- lists: "•", "·", "*", "+", "–" bullets -> "- ", "1)" -> "1."
+- tables: leading/trailing pipes, a separator row under the header, rows
+  padded to the header width, numeric columns right-aligned
+- a paragraph or line repeated back to back is removed (a stutter, not a
+  value that legitimately recurs later), doubled spaces inside prose collapsed
+- a leading filler word ("So,", "Well,") is dropped
+- one blank line between blocks; fenced code is left untouched
+
+Wording, numbers and order are never changed.
+"""
+from __future__ import annotations
+import re
+from typing import Iterator, List, Optional, Tuple
+
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+# "#Title" is a heading, "#1 reason is cost" is not: without a space a letter must follow
+_HEADING_RE = re.compile(r"^(#{1,6})(?:\s+|(?=[^\W\d_])|$)(.*?)(?:\s+#+)?\s*$")
+_BOLD_LABEL_RE = re.compile(r"^\*\*([^*]{1,80}?)\*\*:?\s*$")
+_BULLET_RE = re.compile(r"^(\s*)(?:[•·▪◦‣–]\s*|[-*+]\s+)(.*)$")
+_NUMBERED_RE = re.compile(r"^(\s*)(\d{1,3})[.)]\s+(.*)$")
+_SEPARATOR_CELL_RE = re.compile(r"^:?-{2,}:?$")
+_NUMERIC_CELL_RE = re.compile(r"^[-+(]?[$€£]?\s?[-+]?\d[\d,]*(?:\.\d+)?\s?[%)kKmMbB]?\)?$")
+_LEADING_FILLER_RE = re.compile(r"^(?:so,|well,|listen[,.]?)\s+(?=\w)", re.IGNORECASE)
+_MULTI_SPACE_RE = re.compile(r"(?<=\S) {2,}(?=\S)")
+_SPACE_BEFORE_PUNCT_RE = re.compile(r"(?<=\w) +(?=[,;:.!?](?:\s|$))")
+
+Block = Tuple[str, List[str]]
+
+
+def _is_table_row(line: str) -> bool:
+    # Pipes inside prose ("a|b|c") are not a table; a row needs an edge pipe
+    stripped = line.strip()
+    return len(stripped) > 1 and (stripped.startswith("|") or stripped.endswith("|"))
+
+
+def _split_cells(line: str) -> List[str]:
+    stripped = line.strip()
+    if stripped.startswith("|"):
+        stripped = stripped[1:]
+    if stripped.endswith("|"):
+        stripped = stripped[:-1]
+    return [cell.strip() for cell in stripped.split("|")]
+
+
+def _is_separator(cells: List[str]) -> bool:
+    return bool(cells) and all(_SEPARATOR_CELL_RE.match(c.replace(" ", "")) for c in cells if c) and any(cells)
+
+
+def _is_table_start(lines: List[str], i: int) -> bool:
+    """A table row, or a "a | b" header whose next line is a "--- | ---" separator."""
+    if _is_table_row(lines[i]):
+        return True
+    return (
+        "|" in lines[i]
+        and i + 1 < len(lines)
+        and "|" in lines[i + 1]
+        and _is_separator(_split_cells(lines[i + 1]))
+    )
+
+
+def format_table(lines: List[str]) -> List[str]:
+    rows = [_split_cells(line) for line in lines]
+    header = rows[0]
+    body = rows[1:]
+    if body and _is_separator(body[0]):
+        body = body[1:]
+    body = [r for r in body if not _is_separator(r)]
+
+    width = max(len(header), max((len(r) for r in body), default=0))
+    header = header + [""] * (width - len(header))
+    body = [r + [""] * (width - len(r)) for r in body]
+
+    numeric = [
+        bool(body) and all(_NUMERIC_CELL_RE.match(r[i]) for r in body if r[i])
+        and any(r[i] for r in body)
+        for i in range(width)
+    ]
+    col_w = [
+        max(3, len(header[i]), *(len(r[i]) for r in body))
+        for i in range(width)
+    ]
+
+    def render(cells: List[str]) -> str:
+        padded = [
+            cells[i].rjust(col_w[i]) if numeric[i] else cells[i].ljust(col_w[i])
+            for i in range(width)
+        ]
+        return "| " + " | ".join(padded) + " |"
+
+    separator = "| " + " | ".join(
+        ("-" * (col_w[i] - 1) + ":") if numeric[i] else "-" * col_w[i]
+        for i in range(width)
+    ) + " |"
+    return [render(header), separator] + [render(r) for r in body]
+
+
+def _clean_prose(line: str) -> str:
+    line = _MULTI_SPACE_RE.sub(" ", line)
+    return _SPACE_BEFORE_PUNCT_RE.sub("", line)
+
+
+def _parse_blocks(lines: List[str]) -> List[Block]:
+    blocks: List[Block] = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+
+        fence = _FENCE_RE.match(line)
+        if fence:
+            marker = fence.group(1)
+            code = [line]
+            i += 1
+            while i < len(lines):
+                code.append(lines[i])
+                i += 1
+                if lines[i - 1].strip().startswith(marker):
+                    break
+            blocks.append(("code", code))
+            continue
+
+        if not line.strip():
+            blocks.append(("blank", []))
+            i += 1
+            continue
+
+        heading = _HEADING_RE.match(line)
+        if heading and line.lstrip() == line:
+            title = heading.group(2).rstrip(":").strip()
+            if title:
+                blocks.append(("heading", [f"{heading.group(1)} {title}"]))
+            i += 1
+            continue
+
+        label = _BOLD_LABEL_RE.match(line.strip())
+        if label:
+            blocks.append(("heading", [f"### {label.group(1).rstrip(':').strip()}"]))
+            i += 1
+            continue
+
+        if _is_table_start(lines, i):
+            # Without edge pipes, rows of the table only need to contain one
+            bare = not _is_table_row(line)
+            table = []
+            while i < len(lines) and lines[i].strip() and (
+                _is_table_row(lines[i]) or (bare and "|" in lines[i])
+            ):
+                table.append(lines[i])
+                i += 1
+            if len(table) >= 2:
+                blocks.append(("table", format_table(table)))
+            else:
+                blocks.append(("text", [_clean_prose(table[0].strip())]))
+            continue
+
+        bullet = _BULLET_RE.match(line)
+        numbered = _NUMBERED_RE.match(line)
+        if bullet or numbered:
+            items = []
+            while i < len(lines) and lines[i].strip():
+                bullet = _BULLET_RE.match(lines[i])
+                numbered = _NUMBERED_RE.match(lines[i])
+                if bullet:
+                    items.append(f"{bullet.group(1)}- {_clean_prose(bullet.group(2))}")
+                elif numbered:
+                    items.append(f"{numbered.group(1)}{numbered.group(2)}. {_clean_prose(numbered.group(3))}")
+                elif lines[i].startswith((" ", "\t")):
+                    items.append(lines[i].rstrip())  # continuation of the previous item
+                else:
+                    break
+                i += 1
+            blocks.append(("list", items))
+            continue
+
+        para = []
+        while i < len(lines) and lines[i].strip():
+            nxt = lines[i]
+            if para and (
+                _FENCE_RE.match(nxt)
+                or (_HEADING_RE.match(nxt) and nxt.lstrip() == nxt)
+                or _BOLD_LABEL_RE.match(nxt.strip())
+                or _BULLET_RE.match(nxt)
+                or _NUMBERED_RE.match(nxt)
+                or _is_table_start(lines, i)
+            ):
+                break
+            cleaned = _clean_prose(nxt.strip())
+            if not para or " ".join(cleaned.split()) != " ".join(para[-1].split()):
+                para.append(cleaned)  # drop a line repeated back to back
+            i += 1
+        blocks.append(("text", para))
+    return blocks
+
+
+def iter_tables(markdown: str) -> Iterator[Tuple[Optional[str], List[str], List[List[str]]]]:
+    """
+    Yield (preceding heading or None, header cells, body rows) for every
+    Markdown table outside fenced code.
+    """
+    lines = (markdown or "").replace("\r\n", "\n").split("\n")
+    heading: Optional[str] = None
+    for kind, body in _parse_blocks([line.rstrip() for line in lines]):
+        if kind == "heading":
+            heading = body[0].lstrip("#").strip()
+        elif kind == "table":
+            rows = [_split_cells(line) for line in body]
+            yield heading, rows[0], rows[2:]
+            heading = None  # a heading titles the first table under it only
+
+
+def format_markdown(raw: str) -> str:
+    text = (raw or "").replace("\r\n", "\n").replace("\r", "\n").strip()
+    if not text:
+        return ""
+    stripped = _LEADING_FILLER_RE.sub("", text, count=1)
+    if stripped != text:
+        text = stripped[:1].upper() + stripped[1:]
+
+    lines = [line.rstrip() for line in text.split("\n")]
+    blocks = _parse_blocks(lines)
+
+    out: List[Block] = []
+    previous_paragraph: Optional[str] = None
+    for kind, body in blocks:
+        if kind == "blank":
+            continue
+        key = " ".join(" ".join(body).split()) if kind == "text" else None
+        if key is not None and key == previous_paragraph:
+            continue  # the same paragraph twice in a row
+        previous_paragraph = key
+        # Loose lists (items split by blank lines) become one tight list
+        if kind == "list" and out and out[-1][0] == "list":
+            out[-1][1].extend(body)
+            continue
+        out.append((kind, list(body)))
+
+    return "\n\n".join("\n".join(body) for _, body in out).strip()
@@ -0,0 +1,95 @@
+"""
+Typed progress events yielded by llm_pipeline_stream.
+
+Each stage (embed, retrieve, rerank, generate, format; chart runs after the
+answer, see LLM_Config.enrichment) yields a "start" event when it begins and
+an "end" event with its duration and candidate counts when it finishes. The
+stream route forwards them as SSE status events, so the per-request latency
+breakdown is measured, not guessed.
+"""
+from __future__ import annotations
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+STAGE_LABELS = {
+    "embed": "Understanding your question",
+    "retrieve": "Retrieving relevant information",
+    "rerank": "Ranking retrieved information",
+    "generate": "Generating final answer",
+    "format": "Formatting the answer",
+    "chart": "Preparing charts",
+    "suggest": "Generating follow-up questions",
+}
+
+
+@dataclass(frozen=True)
+class StageEvent:
+    stage: str
+    phase: str                      # "start" | "end"
+    at: float                       # wall clock (epoch seconds)
+    duration_ms: Optional[float] = None
+    candidates_in: Optional[int] = None
+    candidates_out: Optional[int] = None
+    detail: Dict[str, Any] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"stage": self.stage, "phase": self.phase, "at": round(self.at, 3)}
+        if self.duration_ms is not None:
+            out["duration_ms"] = self.duration_ms
+        if self.candidates_in is not None:
+            out["candidates_in"] = self.candidates_in
+        if self.candidates_out is not None:
+            out["candidates_out"] = self.candidates_out
+        if self.detail:
+            out["detail"] = self.detail
+        return out
+
+    def status_text(self) -> str:
+        label = STAGE_LABELS.get(self.stage, self.stage.capitalize())
+        if self.phase == "start":
+            return f"{label}…"
+        text = f"{label}: done in {self.duration_ms:.0f} ms"
+        if self.candidates_in is not None and self.candidates_out is not None:
+            text += f" ({self.candidates_in} → {self.candidates_out} candidates)"
+        elif self.candidates_out is not None:
+            text += f" ({self.candidates_out} candidates)"
+        return text
+
+
+class StageTimer:
+    """
+    One stage's clock:
+
+        timer = StageTimer("retrieve")
+        yield timer.start()
+        ...
+        yield timer.end(candidates_out=len(hits))
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._t0 = time.perf_counter()
+
+    def start(self) -> StageEvent:
+        self._t0 = time.perf_counter()
+        return StageEvent(self.stage, "start", time.time())
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self._t0) * 1000.0, 2)
+
+    def end(
+        self,
+        candidates_in: Optional[int] = None,
+        candidates_out: Optional[int] = None,
+        **detail: Any,
+    ) -> StageEvent:
+        return StageEvent(
+            self.stage,
+            "end",
+            time.time(),
+            duration_ms=self.elapsed_ms(),
+            candidates_in=candidates_in,
+            candidates_out=candidates_out,
+            detail=detail,
+        )
@@ -0,0 +1,182 @@
+"""
+Two-stage rerank cascade for retrieved hits.
+
+Stage 1 (cheap, local): re-score candidates by cosine similarity against the
+query using the embeddings already stored in Chroma, then pick a slice with
+MMR, dropping near-duplicate / identical chunks on the way.
+
+Stage 2: the configured reranker (cross-encoder or LLM) on that slice only.
+
+Both stages are tuned per intent (CASCADE_BY_INTENT); every stage reports its
+candidate counts and latency.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from LLM_Config.reranker import get_reranker
+
+if TYPE_CHECKING:
+    from Vector_setup.base.db_setup_management import MultiTenantChromaStoreManager
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CascadeConfig:
+    slice_k: int = 15               # candidates kept by stage 1
+    mmr_lambda: float = 0.7         # 1.0 = pure relevance, lower = more diversity
+    dedup_threshold: float = 0.97   # cosine above which a candidate is a duplicate
+    rerank: bool = True             # run stage 2
+    reranker_backend: Optional[str] = None  # None = RERANKER_BACKEND
+
+
+DEFAULT_CASCADE = CascadeConfig()
+
+CASCADE_BY_INTENT: Dict[str, CascadeConfig] = {
+    # Precise answers: relevance first
+    "LOOKUP": CascadeConfig(slice_k=15, mmr_lambda=0.9),
+    "PROCEDURE": CascadeConfig(slice_k=15, mmr_lambda=0.85),
+    # Tables / numbers: many similar rows are all useful
+    "NUMERIC_ANALYSIS": CascadeConfig(slice_k=20, mmr_lambda=0.9),
+    "EXPORT_TABLE": CascadeConfig(slice_k=20, mmr_lambda=0.95),
+    "CHART": CascadeConfig(slice_k=20, mmr_lambda=0.9),
+    # Open-ended questions: favour coverage across documents
+    "ANALYSIS": CascadeConfig(slice_k=20, mmr_lambda=0.5),
+    "IMPLICATIONS": CascadeConfig(slice_k=20, mmr_lambda=0.5),
+    "STRATEGY": CascadeConfig(slice_k=20, mmr_lambda=0.5),
+}
+
+
+def cascade_config_for(intent: str) -> CascadeConfig:
+    return CASCADE_BY_INTENT.get(intent, DEFAULT_CASCADE)
+
+
+def _normalize(rows: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(rows, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return rows / norms
+
+
+def mmr_select(
+    query_vec: List[float],
+    vectors: List[Optional[List[float]]],
+    k: int,
+    mmr_lambda: float,
+    dedup_threshold: float,
+    chunk_hashes: Optional[List[Optional[str]]] = None,
+) -> Tuple[List[int], int]:
+    """
+    Pick up to k candidate indices by maximal marginal relevance.
+    Candidates without a vector rank after all others, in retrieval order.
+    Returns (selected indices, number dropped as duplicates).
+    """
+    have = [i for i, v in enumerate(vectors) if v is not None]
+    without = [i for i, v in enumerate(vectors) if v is None]
+    chunk_hashes = chunk_hashes or [None] * len(vectors)
+
+    selected: List[int] = []
+    dropped = 0
+    if have:
+        mat = _normalize(np.asarray([vectors[i] for i in have], dtype=np.float32))
+        q = _normalize(np.asarray(query_vec, dtype=np.float32))
+        relevance = mat @ q
+        max_sim = np.full(len(have), -np.inf, dtype=np.float32)
+        alive = np.ones(len(have), dtype=bool)
+        seen_hashes = set()
+
+        while len(selected) < k and alive.any():
+            redundancy = np.where(np.isfinite(max_sim), max_sim, 0.0)
+            scores = mmr_lambda * relevance - (1.0 - mmr_lambda) * redundancy
+            scores[~alive] = -np.inf
+            pos = int(np.argmax(scores))
+            alive[pos] = False
+
+            h = chunk_hashes[have[pos]]
+            if max_sim[pos] >= dedup_threshold or (h is not None and h in seen_hashes):
+                dropped += 1
+                continue
+            selected.append(have[pos])
+            if h is not None:
+                seen_hashes.add(h)
+            max_sim = np.maximum(max_sim, mat @ mat[pos])
+
+    for i in without:
+        if len(selected) >= k:
+            break
+        selected.append(i)
+    return selected, dropped
+
+
+async def rerank_cascade(
+    store: MultiTenantChromaStoreManager,
+    tenant_id: str,
+    question: str,
+    hits: List[dict],
+    intent: str,
+    min_keep: int = 0,
+    query_cache_key: Optional[str] = None,
+) -> Tuple[List[dict], List[dict]]:
+    """
+    Reorder retrieval hits through the cascade. Returns (ranked hits, stage report).
+    A failing stage is skipped: stage 1 falls back to the first slice_k hits in
+    retrieval order, stage 2 keeps the stage 1 order.
+    """
+    config = cascade_config_for(intent)
+    slice_k = max(config.slice_k, min_keep)
+    stages: List[dict] = [{"stage": "retrieval", "candidates_out": len(hits)}]
+
+    # Stage 1: cosine + MMR + dedup on stored embeddings
+    start = time.perf_counter()
+    dropped = 0
+    try:
+        query_vecs = await store.embed_query(question, cache_key=query_cache_key, tenant_id=tenant_id)
+        if not query_vecs:
+            raise ValueError("empty query embedding")
+        vectors = await asyncio.to_thread(store.chunk_embeddings, tenant_id, hits)
+        hashes = [(h.get("metadata") or {}).get("chunk_hash") for h in hits]
+        order, dropped = mmr_select(
+            query_vecs[0], vectors, slice_k, config.mmr_lambda, config.dedup_threshold, hashes
+        )
+        stage1 = [hits[i] for i in order]
+        stage1_name = "cosine_mmr"
+    except Exception as e:
+        logger.warning(f"Rerank stage 1 failed, using retrieval order: {e}")
+        stage1 = hits[:slice_k]
+        stage1_name = "cosine_mmr:skipped"
+    stages.append({
+        "stage": stage1_name,
+        "candidates_in": len(hits),
+        "candidates_out": len(stage1),
+        "duplicates_dropped": dropped,
+        "latency_ms": round((time.perf_counter() - start) * 1000.0, 2),
+    })
+
+    if not config.rerank or len(stage1) <= 1:
+        return stage1, stages
+
+    # Stage 2: configured reranker on the slice only
+    reranker = get_reranker(config.reranker_backend)
+    start = time.perf_counter()
+    try:
+        ranked = await reranker.rerank(
+            question, [(h.get("document") or "").strip() for h in stage1], tenant_id=tenant_id,
+        )
+        stage2 = [stage1[i] for i, _score in ranked]
+        stage2_name = f"rerank:{reranker.name}"
+    except Exception as e:
+        logger.warning(f"Rerank ({reranker.name}) failed, keeping stage 1 order: {e}")
+        stage2 = stage1
+        stage2_name = f"rerank:{reranker.name}:skipped"
+    stages.append({
+        "stage": stage2_name,
+        "candidates_in": len(stage1),
+        "candidates_out": len(stage2),
+        "latency_ms": round((time.perf_counter() - start) * 1000.0, 2),
+    })
+    return stage2, stages
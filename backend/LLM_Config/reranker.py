@@ -0,0 +1,262 @@
+"""
+Pluggable rerankers for retrieved chunks.
+
+Backends (RERANKER_BACKEND):
+- cross_encoder (default): local CPU cross-encoder scoring (query, chunk) pairs
+  in batches, with an LRU score cache. Deterministic, no network round trip.
+- llm: the original gpt-4o-mini call returning a JSON index list.
+- none: keep retrieval order.
+
+Every backend returns [(index, score)] best first; higher score is better.
+Callers fall back to retrieval order if a backend raises.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import textwrap
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from LLM_Config.llm_scheduler import PRIORITY_RERANK
+from LLM_Config.system_user_prompt import RERANK_SYSTEM_PROMPT
+from Vector_setup.embeddings.embedding_cache import text_sha256
+from Vector_setup.embeddings.query_cache import fold_query_key
+
+logger = logging.getLogger(__name__)
+
+RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "cross_encoder")
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_BATCH_SIZE = 32
+RERANK_CACHE_MAX_ENTRIES = int(os.getenv("RERANK_CACHE_MAX_ENTRIES", "20000"))
+
+Ranking = List[Tuple[int, float]]
+
+
+class Reranker:
+    """Base backend: keeps retrieval order."""
+
+    name = "none"
+
+    @property
+    def is_loaded(self) -> bool:
+        return True
+
+    def load(self) -> None:
+        return None
+
+    async def rerank(self, query: str, documents: List[str], tenant_id: Optional[str] = None) -> Ranking:
+        return [(i, float(len(documents) - i)) for i in range(len(documents))]
+
+
+class RerankScoreCache:
+    """LRU of cross-encoder scores keyed by (model, folded query, sha256(chunk))."""
+
+    def __init__(self, max_entries: int = RERANK_CACHE_MAX_ENTRIES):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: List[Tuple[str, str, str]]) -> Dict[Tuple[str, str, str], float]:
+        found: Dict[Tuple[str, str, str], float] = {}
+        with self._lock:
+            for key in keys:
+                score = self._entries.get(key)
+                if score is None:
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = score
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Dict[Tuple[str, str, str], float]) -> None:
+        with self._lock:
+            for key, score in items.items():
+                self._entries[key] = score
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class CrossEncoderReranker(Reranker):
+    name = "cross_encoder"
+
+    def __init__(
+        self,
+        model_name: str = RERANKER_MODEL,
+        batch_size: int = RERANK_BATCH_SIZE,
+        cache: Optional[RerankScoreCache] = None,
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.cache = cache if cache is not None else RerankScoreCache()
+        self._model = None
+        self._load_lock = threading.Lock()
+        # One predict at a time; concurrent requests queue here instead of thrashing CPU
+        self._predict_lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    # Imported here so the module (and the cascade) loads without the model deps
+                    from sentence_transformers import CrossEncoder
+
+                    logger.info("Loading reranker model: %s", self.model_name)
+                    self._model = CrossEncoder(self.model_name, max_length=512, device="cpu")
+        return self._model
+
+    def score(self, query: str, documents: List[str]) -> List[float]:
+        """Blocking batched scoring of (query, document) pairs."""
+        if not documents:
+            return []
+        model = self.load()
+        with self._predict_lock:
+            scores = model.predict(
+                [(query, doc) for doc in documents],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+        return [float(s) for s in scores]
+
+    async def rerank(self, query: str, documents: List[str], tenant_id: Optional[str] = None) -> Ranking:
+        folded = fold_query_key(query)
+        keys = [(self.model_name, folded, text_sha256(doc or "")) for doc in documents]
+        scores = self.cache.get_many(keys)
+
+        missing = [i for i, key in enumerate(keys) if key not in scores]
+        if missing:
+            fresh = await asyncio.to_thread(
+                self.score, query, [documents[i] for i in missing]
+            )
+            new_scores = {keys[i]: s for i, s in zip(missing, fresh)}
+            self.cache.put_many(new_scores)
+            scores.update(new_scores)
+
+        ranked = [(i, scores[key]) for i, key in enumerate(keys)]
+        # Stable on ties, so equal scores keep retrieval order
+        ranked.sort(key=lambda pair: pair[1], reverse=True)
+        return ranked
+
+
+def build_rerank_messages(question: str, snippets: list[str]) -> list[dict]:
+    numbered = "\n\n".join(
+        [
+            f"[{i}] {textwrap.shorten(s, width=800, placeholder='...')}"
+            for i, s in enumerate(snippets)
+        ]
+    )
+    user_content = f"""
+User question:
+{question}
+
+Snippets to rank (0-based indices in brackets):
+{numbered}
+
+Return a JSON array of indices from most relevant to least relevant.
+""".strip()
+
+    return [
+        {"role": "system", "content": RERANK_SYSTEM_PROMPT},
+        {"role": "user", "content": user_content},
+    ]
+
+
+class LLMReranker(Reranker):
+    name = "llm"
+
+    def __init__(self, model: str = "gpt-4o-mini", llm_call: Optional[Callable[..., Awaitable[Any]]] = None):
+        self.model = model
+        self._llm_call = llm_call
+
+    async def rerank(self, query: str, documents: List[str], tenant_id: Optional[str] = None) -> Ranking:
+        call_llm = self._llm_call
+        if call_llm is None:
+            from LLM_Config.llm_setup import call_llm
+
+        resp = await call_llm(
+            tenant_id=tenant_id,
+            priority=PRIORITY_RERANK,
+            messages=build_rerank_messages(query, documents),
+            model=self.model,
+            temperature=0.0,
+            max_tokens=300,
+        )
+        raw = (resp.choices[0].message.content or "[]").strip()
+        try:
+            indices = json.loads(raw)
+        except Exception:
+            start = raw.find("[")
+            end = raw.rfind("]")
+            if start != -1 and end != -1 and end > start:
+                indices = json.loads(raw[start: end + 1])
+            else:
+                raise
+        if not isinstance(indices, list):
+            raise ValueError(f"Rerank response is not a list: {raw[:200]}")
+
+        indices = [i for i in dict.fromkeys(indices) if isinstance(i, int) and 0 <= i < len(documents)]
+        return [(i, float(len(indices) - pos)) for pos, i in enumerate(indices)]
+
+
+# -----------------------
+# Process-wide registry
+# -----------------------
+
+_BACKENDS = {
+    "none": Reranker,
+    "cross_encoder": CrossEncoderReranker,
+    "llm": LLMReranker,
+}
+_rerankers: Dict[str, Reranker] = {}
+_rerankers_lock = threading.Lock()
+
+
+def get_reranker(backend: Optional[str] = None) -> Reranker:
+    backend = backend or RERANKER_BACKEND
+    if backend not in _BACKENDS:
+        raise ValueError(f"Unknown RERANKER_BACKEND: {backend!r}")
+    reranker = _rerankers.get(backend)
+    if reranker is None:
+        with _rerankers_lock:
+            reranker = _rerankers.get(backend)
+            if reranker is None:
+                reranker = _BACKENDS[backend]()
+                _rerankers[backend] = reranker
+    return reranker
+
+
+def warmup_reranker() -> None:
+    """Load the configured reranker model off the request path."""
+    try:
+        get_reranker().load()
+    except Exception:
+        logger.exception("Reranker warmup failed")
+
+
+def reranker_status() -> dict:
+    reranker = get_reranker()
+    status = {"backend": reranker.name, "loaded": reranker.is_loaded}
+    if isinstance(reranker, CrossEncoderReranker):
+        status["model_name"] = reranker.model_name
+        status["score_cache"] = reranker.cache.stats()
+    return status
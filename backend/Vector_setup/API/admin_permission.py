@@ -3,7 +3,7 @@ from fastapi import Depends, HTTPException, status
 from Vector_setup.user.auth_jwt import get_current_user
 from Vector_setup.base.auth_models import UserOut
 from typing import Annotated
-from Vector_setup.user.roles import USER_CREATOR_ROLES, COLLECTION_MANAGE_ROLES
+from Vector_setup.user.roles import USER_CREATOR_ROLES, COLLECTION_MANAGE_ROLES, VENDOR_ROLES
 
 # Permission/Access authentication dependencies would be defined elsewhere
 def require_user_admin(user: UserOut = Depends(get_current_user)) -> UserOut:
@@ -31,4 +31,16 @@ def require_tenant_admin(
             detail="Admin role required",
         )
     return current_user
- 
\ No newline at end of file
+ 
+
+
+def require_platform_admin(
+    current_user: Annotated[UserOut, Depends(get_current_user)],
+) -> UserOut:
+    """Cross-tenant operational endpoints (e.g. /metrics): vendor / system manager only."""
+    if (current_user.role or "").lower() not in VENDOR_ROLES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Platform admin role required",
+        )
+    return current_user
@@ -7,6 +7,7 @@ import json
 from Vector_setup.user.db import DBUser, Tenant, Collection, Organization, get_db
 from Vector_setup.user.auth_jwt import ensure_tenant_active
 from Vector_setup.base.db_setup_management import MultiTenantChromaStoreManager, CollectionCreateRequest
+from Vector_setup.base.store_registry import get_shared_store
 from Vector_setup.schema.schema_signature import (
     CollectionCreateIn,
     CollectionOut,
@@ -21,10 +22,8 @@ from Vector_setup.user.auth_store import get_current_db_user
 
 from Vector_setup.API.helpers.json_load_help import safe_json_loads, safe_json_dumps
 
-vector_store = MultiTenantChromaStoreManager("./chromadb_multi_tenant")
-
 def get_store() -> MultiTenantChromaStoreManager:
-    return vector_store
+    return get_shared_store()
 
 router = APIRouter(prefix="/collections", tags=["collections"])
 
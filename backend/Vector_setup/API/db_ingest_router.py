@@ -3,13 +3,12 @@ from fastapi import APIRouter, HTTPException, Depends
 from sqlmodel import Session
 from fastapi.responses import RedirectResponse, JSONResponse, Response
 from Vector_setup.base.db_setup_management import MultiTenantChromaStoreManager
+from Vector_setup.base.store_registry import get_shared_store
 from Vector_setup.user.db import DBUser, get_db
 from Vector_setup.API.admin_permission import require_tenant_admin
 
-vector_store = MultiTenantChromaStoreManager("./chromadb_multi_tenant")
-   
 def get_store() -> MultiTenantChromaStoreManager:
-    return vector_store
+    return get_shared_store()
 
 
 
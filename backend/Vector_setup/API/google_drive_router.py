@@ -15,6 +15,7 @@ from googleapiclient.http import MediaIoBaseDownload
 from io import BytesIO
 import uuid
 from Vector_setup.base.db_setup_management import MultiTenantChromaStoreManager
+from Vector_setup.base.store_registry import get_shared_store
 from Vector_setup.services.extraction_documents_service import extract_text_from_upload
 from googleapiclient.errors import HttpError
 import requests
@@ -325,10 +326,8 @@ def list_drive_files(
     
     
  # Single shared store instance
-vector_store = MultiTenantChromaStoreManager("./chromadb_multi_tenant")
-   
 def get_store() -> MultiTenantChromaStoreManager:
-    return vector_store
+    return get_shared_store()
 
 
 class DriveIngestRequest(BaseModel):
@@ -496,7 +495,8 @@ async def ingest_drive_file(
         )
 
     # 5) Index into vector store
-    doc_id = str(uuid.uuid4())
+    # Stable per Drive file, so a re-sync only re-embeds chunks that changed
+    doc_id = f"gdrive:{req.file_id}"
     # Look up collection info
     collection_info = store.get_collection_info(tenant_id, req.collection_name) # to be implemented
     collection_display_name = collection_info.get("display_name", req.collection_name)
@@ -22,6 +22,7 @@ from Vector_setup.base.db_setup_management import (
     CompanyProvisionRequest,
     CompanyCreateRequest,
 )
+from Vector_setup.base.store_registry import get_shared_store
 from Vector_setup.user.auth_store import  get_current_db_user
 from Vector_setup.base.auth_models import UserOut
 from Vector_setup.services.extraction_documents_service import extract_text_from_upload
@@ -30,11 +31,8 @@ from Vector_setup.user.roles import COLLECTION_MANAGE_ROLES, UPLOAD_ROLES, VENDO
 router = APIRouter()
 
 # Single shared store instance
-vector_store = MultiTenantChromaStoreManager("./chromadb_multi_tenant")
-
-
 def get_store() -> MultiTenantChromaStoreManager:
-    return vector_store
+    return get_shared_store()
 
 
 # ---------- Role helpers ----------
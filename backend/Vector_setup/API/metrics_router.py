@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from Vector_setup.API.admin_permission import require_platform_admin
+from Vector_setup.base.auth_models import UserOut
+from Vector_setup.base.metrics import render_metrics
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics(current_user: UserOut = Depends(require_platform_admin)) -> PlainTextResponse:
+    """
+    Per-stage latency histograms in Prometheus text format.
+    Scrape with a platform admin's bearer token (Prometheus `authorization`).
+    """
+    return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
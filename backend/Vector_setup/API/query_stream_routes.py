@@ -2,11 +2,10 @@ from fastapi import APIRouter, Depends, Request, HTTPException
 from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select 
 from typing import Optional, AsyncGenerator, List,  Dict, Any
+from contextlib import aclosing
+import asyncio
 import json
-
-#from LLM_Config.system_user_prompt import create_suggestion_prompt
-#from LLM_Config.llm_setup import suggestion_llm_client
-
+import time
 
 from Vector_setup.user.db import get_db, Tenant, DBUser, Collection
 from Vector_setup.API.ingest_routes import get_store
@@ -16,10 +15,20 @@ from Vector_setup.user.auth_jwt import (
     TokenUser,
 )
 from Vector_setup.chat_history.chat_store import get_last_n_turns, save_chat_turn, get_last_doc_id
-from LLM_Config.llm_pipeline import llm_pipeline_stream
+from LLM_Config.llm_pipeline import llm_pipeline_stream, ReplaceAnswer, infer_intent_rule_based
+from LLM_Config.pipeline_events import StageEvent
+from LLM_Config.admission import ADMISSION
+from LLM_Config.deadline import Deadline
+from LLM_Config.enrichment import enrichment_registry, schedule_enrichments
 from Vector_setup.user.auth_jwt import ensure_tenant_active
 from Vector_setup.access.collections_acl import get_allowed_collections_for_user
 from Vector_setup.user.audit import write_audit_log
+from Vector_setup.base.metrics import (
+    ACL_SECONDS,
+    AUDIT_WRITE_SECONDS,
+    HISTORY_LOAD_SECONDS,
+    QUERY_CANCELLED_TOTAL,
+)
 
 import logging
 
@@ -28,7 +37,7 @@ logger.setLevel(logging.INFO)
 
 router = APIRouter()
 
-import json
+
 @router.get("/query/stream")
 async def query_knowledge_stream(
     request: Request,
@@ -40,18 +49,29 @@ async def query_knowledge_stream(
     store: MultiTenantChromaStoreManager = Depends(get_store),
     db: Session = Depends(get_db),
 ) -> StreamingResponse:
+    request_start = time.perf_counter()
     if not conversation_id:
         raise HTTPException(status_code=403, detail="Session has expired!")
 
     # Optional FE filter
     requested_names = [collection_name] if collection_name else None
 
+    # Rule-based and cheap; labels latency metrics and picks the deadline
+    metric_labels = {
+        "tenant": current_user.tenant_id,
+        "intent": infer_intent_rule_based(question)[0],
+    }
+    # End-to-end budget; ACL and history load below count against it
+    deadline = Deadline.for_intent(metric_labels["intent"], started_at=request_start)
+
     # --- ACL: which collections can this user query? ---
+    acl_start = time.perf_counter()
     allowed_collections = get_allowed_collections_for_user(
         db=db,
         user=current_user,         # make sure this is the same shape your ACL expects
         requested_name=requested_names,
     )
+    ACL_SECONDS.observe(time.perf_counter() - acl_start, **metric_labels)
     
 
     logger.info(
@@ -77,10 +97,12 @@ async def query_knowledge_stream(
 
     collection_names = [c.name for c in allowed_collections]
     collection_ids = [str(c.id) for c in allowed_collections]
+    organization_ids = list(dict.fromkeys(c.organization_id for c in allowed_collections))
 
     logger.info("Collection names for query: %s", collection_names)
 
     # --- conversation history + last doc ---
+    history_start = time.perf_counter()
     history_turns = get_last_n_turns(
         db=db,
         tenant_id=current_user.tenant_id,
@@ -95,131 +117,208 @@ async def query_knowledge_stream(
         user_id=current_user.email,
         conversation_id=conversation_id,
     )
+    HISTORY_LOAD_SECONDS.observe(time.perf_counter() - history_start, **metric_labels)
+
+    # --- Admission control: reject (429) or degrade before any embedding / LLM work ---
+    embed_wait_s = store.embedding_service.executor_stats().get("est_wait_ms", 0.0) / 1000.0
+    ticket = ADMISSION.admit(embed_wait_s=embed_wait_s)
+    if not ticket.decision.admitted:
+        raise HTTPException(
+            status_code=429,
+            detail="The assistant is handling a lot of requests right now. Please try again shortly.",
+            headers={"Retry-After": str(ticket.decision.retry_after_s)},
+        )
+    degrade = ticket.decision.degrade
 
     def send_status(msg: str) -> str:
         return f"event: status\ndata: {msg}\n\n"
 
-    async def event_generator() -> AsyncGenerator[str, None]:
-        full_answer: List[str] = []
-        result_holder: Dict[str, Any] = {}
+    def send_stage(event: StageEvent) -> str:
+        # Human-readable status line plus the structured timing for tooling
+        return send_status(event.status_text()) + f"event: stage\ndata: {json.dumps(event.as_dict())}\n\n"
 
-        # 1) Understand question
-        yield send_status("Analyzing your question…")
+    async def event_generator() -> AsyncGenerator[str, None]:
+        # Last stage the query reached; labels the cancel metric
+        progress: Dict[str, Any] = {"stage": "start"}
+        try:
+            full_answer: List[str] = []
+            result_holder: Dict[str, Any] = {}
 
-        # 2) Retrieval + ranking (done inside llm_pipeline_stream)
-        yield send_status("Retrieving relevant information…")
-        yield send_status("Ranking and summarizing retrieved information…")
+            # 1) Understand question
+            yield send_status("Analyzing your question…")
+            if degrade.active:
+                logger.info("Query degraded under load: %s", degrade.active)
+                yield send_status("High demand right now: preparing a faster, simpler answer…")
 
-        # 3) Generate answer (streaming tokens)
-        yield send_status("Generating final answer…")
-        
-        disconnected = False
-        try:
-            async for chunk in llm_pipeline_stream(
-                store=store,
-                tenant_id=current_user.tenant_id,
-                question=question,
-                history=history_turns,
-                top_k=top_k,
-                result_holder=result_holder,
-                last_doc_id=last_doc_id,
-                collection_names=collection_names,
-            ):
-                if await request.is_disconnected():
-                    disconnected = True
-                    break
-                if not chunk:
-                    continue
-
-                full_answer.append(chunk)
-                safe_chunk = chunk.replace("\n", "<|n|>")
-                yield f"event: token\ndata: {safe_chunk}\n\n"
-        except Exception:
-            logger.exception("Pipeline error in /api/query/stream")
-            yield send_status("An error occurred while generating the answer.")
-            yield "event: done\ndata: END\n\n"
-            return
-        if disconnected:
-            logger.info("Client disconnected during streaming response")
-            return # Skip save_chart_turn, suggestions, charts, audit log
-        
-        answer_str = "".join(full_answer)
-
-        # 4) Save conversation turn only if there is an answer
-        if answer_str:
-            yield send_status("Saving this conversation…")
-
-            primary_doc_id = result_holder.get("primary_doc_id")
-
-            save_chat_turn(
-                db=db,
-                tenant_id=current_user.tenant_id,
-                user_id=current_user.email,
-                user_message=question,
-                assistant_message=answer_str,
-                conversation_id=conversation_id,
-                primary_doc_id=primary_doc_id,
-            )
-
-            # 5) Follow-up suggestions
-            yield send_status("Generating related follow-up questions…")
-
-            suggestions_list: List[str] = []
+            # 2) Retrieval, ranking and the streamed answer; the pipeline reports
+            #    each stage as it starts and ends (StageEvent). On disconnect
+            #    StreamingResponse cancels the task running this generator
+            #    wherever it is awaiting: the open LLM stream / rerank call is
+            #    aborted and its scheduler slot released. aclosing() also shuts
+            #    the pipeline down if this generator is closed at a yield instead.
             try:
-                #suggestion_messages = create_suggestion_prompt(question, answer_str)
-                raw = [] # suggestion_llm_client.invoke(suggestion_messages)
-                raw_content = getattr(raw, "content", None) or str(raw)
-                suggestions_list = json.loads(raw_content)
-                if not isinstance(suggestions_list, list):
-                    suggestions_list = []
-                else:
-                    suggestions_list = [
-                        s for s in suggestions_list
-                        if isinstance(s, str) and s.strip()
-                    ]
+                pipeline = llm_pipeline_stream(
+                    store=store,
+                    tenant_id=current_user.tenant_id,
+                    question=question,
+                    history=history_turns,
+                    top_k=top_k,
+                    result_holder=result_holder,
+                    last_doc_id=last_doc_id,
+                    collection_names=collection_names,
+                    collection_ids=collection_ids,
+                    organization_ids=organization_ids,
+                    degrade=degrade,
+                    deadline=deadline,
+                )
+                async with aclosing(pipeline):
+                    async for chunk in pipeline:
+                        if isinstance(chunk, StageEvent):
+                            progress["stage"] = chunk.stage
+                            yield send_stage(chunk)
+                            continue
+                        if isinstance(chunk, ReplaceAnswer):
+                            # Post-processed answer supersedes the streamed tokens
+                            full_answer = [chunk.text]
+                            safe_text = chunk.text.replace("\n", "<|n|>")
+                            yield f"event: replace\ndata: {safe_text}\n\n"
+                            continue
+                        if not chunk:
+                            continue
+
+                        full_answer.append(chunk)
+                        safe_chunk = chunk.replace("\n", "<|n|>")
+                        yield f"event: token\ndata: {safe_chunk}\n\n"
             except Exception:
-                suggestions_list = []
+                logger.exception("Pipeline error in /api/query/stream")
+                yield send_status("An error occurred while generating the answer.")
+                yield "event: done\ndata: END\n\n"
+                return
+
+            progress["stage"] = "save"
+            answer_str = "".join(full_answer)
+            degraded: List[dict] = result_holder.get("degraded", [])
 
-            if suggestions_list:
-                payload = json.dumps(suggestions_list)
-                yield f"event: suggestions\ndata: {payload}\n\n"
+            # 3) Save conversation turn only if there is an answer
+            if answer_str:
+                yield send_status("Saving this conversation…")
 
-            # 6) Chart event (optional)
-            chart_spec = result_holder.get("chart_specs")
-            if chart_spec:
+                primary_doc_id = result_holder.get("primary_doc_id")
+
+                turn_id = save_chat_turn(
+                    db=db,
+                    tenant_id=current_user.tenant_id,
+                    user_id=current_user.email,
+                    user_message=question,
+                    assistant_message=answer_str,
+                    conversation_id=conversation_id,
+                    primary_doc_id=primary_doc_id,
+                )
+
+                # 4) Charts / follow-up suggestions run after `done`, keyed by turn;
+                #    the client fetches them from /query/enrichments/{turn_id}
+                # Past the deadline (or under load) only table-derived charts are built;
+                # a chart lost that way is reported on the enrichment job
+                chart_skip_reason = (
+                    "load" if degrade.skip_chart else "deadline" if deadline.expired else None
+                )
                 try:
-                    chart_payload = json.dumps({"charts": chart_spec})
-                    logger.info("CHART_DEBUG emitting chart SSE: %s", chart_payload)
-                    yield f"event: chart\ndata: {chart_payload}\n\n"
+                    job = schedule_enrichments(
+                        turn_id=str(turn_id),
+                        tenant_id=current_user.tenant_id,
+                        user_id=current_user.email,
+                        conversation_id=conversation_id,
+                        question=question,
+                        answer=answer_str,
+                        intent=result_holder.get("intent"),
+                        domain=result_holder.get("domain"),
+                        chart_skip_reason=chart_skip_reason,
+                    )
+                    if job.pending:
+                        payload = json.dumps({"turn_id": job.turn_id, "pending": sorted(job.pending)})
+                        yield f"event: enrichment\ndata: {payload}\n\n"
                 except Exception:
-                    logger.warning("Failed to serialize chart_spec for SSE")
+                    logger.warning("Failed to schedule enrichments for turn %s", turn_id, exc_info=True)
 
-        # 7) Audit log (once per request)
-        try:
-            write_audit_log(
-                db=db,
-                user=current_user,
-                action="query",
-                resource_type="collection_query",
-                resource_id=",".join(collection_ids),
-                metadata={
-                    "question": question,
-                    "top_k": top_k,
-                    "tenant_id": current_user.tenant_id,
-                    "organization_id": current_user.organization_id,
-                    "user_id": current_user.id,
-                    "user_role": current_user.role,
-                    "conversation_id": conversation_id,
-                    "collection_ids": collection_ids,
-                    "collection_names": collection_names,
-                    "client_ip": request.client.host,
-                },
-            )
-        except Exception:
-            logger.warning("Failed to write audit log for query", exc_info=True)
-
-        yield send_status("Finalizing…")
-        yield "event: done\ndata: END\n\n"
+            # 5) Audit log (once per request)
+            audit_start = time.perf_counter()
+            try:
+                write_audit_log(
+                    db=db,
+                    user=current_user,
+                    action="query",
+                    resource_type="collection_query",
+                    resource_id=",".join(collection_ids),
+                    metadata={
+                        "question": question,
+                        "top_k": top_k,
+                        "tenant_id": current_user.tenant_id,
+                        "organization_id": current_user.organization_id,
+                        "user_id": current_user.id,
+                        "user_role": current_user.role,
+                        "conversation_id": conversation_id,
+                        "collection_ids": collection_ids,
+                        "collection_names": collection_names,
+                        "client_ip": request.client.host,
+                        "degraded": degraded,
+                        "stage_ms": {
+                            st["stage"]: st.get("duration_ms")
+                            for st in result_holder.get("stages", [])
+                        },
+                    },
+                )
+            except Exception:
+                logger.warning("Failed to write audit log for query", exc_info=True)
+            AUDIT_WRITE_SECONDS.observe(time.perf_counter() - audit_start, **metric_labels)
+
+            # Which optional stages were skipped or cut short, and why
+            if degraded:
+                payload = json.dumps({"stages": degraded, "deadline": deadline.as_dict()})
+                yield f"event: degraded\ndata: {payload}\n\n"
+
+            yield send_status("Finalizing…")
+            yield "event: done\ndata: END\n\n"
+        except (asyncio.CancelledError, GeneratorExit):
+            # Client went away: no saved turn, enrichments or audit entry
+            QUERY_CANCELLED_TOTAL.inc(tenant=current_user.tenant_id, stage=progress["stage"])
+            logger.info("Query cancelled at stage=%s", progress["stage"])
+            raise
+        finally:
+            # Admitted until the stream ends, however it ends
+            ticket.release()
 
     # Only users with allowed_collections ever get here; SSE/LLM never start otherwise
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+    headers = {"X-Query-Degraded": ",".join(degrade.active)} if degrade.active else None
+    return StreamingResponse(event_generator(), media_type="text/event-stream", headers=headers)
+
+
+ENRICHMENT_MAX_WAIT_S = 25.0
+
+
+@router.get("/query/enrichments/{turn_id}")
+async def get_turn_enrichments(
+    turn_id: str,
+    wait: float = 0.0,
+    current_user: TokenUser = Depends(get_current_db_user_from_header_or_query),
+) -> Dict[str, Any]:
+    """
+    Charts / suggestions for a streamed turn. With `wait` > 0 this long-polls
+    until every enrichment is finished or the wait runs out.
+    """
+    job = enrichment_registry.get(turn_id, current_user.tenant_id, current_user.email)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No enrichments for this turn.")
+    await enrichment_registry.wait(job, timeout=min(max(wait, 0.0), ENRICHMENT_MAX_WAIT_S))
+    return job.as_dict()
+
+
+@router.delete("/query/enrichments/{turn_id}")
+async def cancel_turn_enrichments(
+    turn_id: str,
+    current_user: TokenUser = Depends(get_current_db_user_from_header_or_query),
+) -> Dict[str, Any]:
+    """Stop charts / suggestions the client no longer wants."""
+    job = enrichment_registry.get(turn_id, current_user.tenant_id, current_user.email)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No enrichments for this turn.")
+    return {"turn_id": turn_id, "cancelled": enrichment_registry.cancel(job)}
@@ -0,0 +1,92 @@
+"""
+In-memory directory of Chroma collection handles, indexed by tenant.
+
+Loaded once from the Chroma catalog when the store starts, then kept current
+by the store's create/delete paths. Lookups and per-tenant listings never touch
+the catalog; a miss falls back to get_or_create in the store and is recorded.
+
+Other workers can create or drop collections behind our back, so callers that
+detect a stale handle (query error) should `remove()` it, and `invalidate()`
+drops a tenant (or everything) to force a reload on next use.
+"""
+from __future__ import annotations
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class CollectionDirectory:
+    def __init__(self, separator: str = "__"):
+        self._sep = separator
+        self._by_tenant: Dict[str, Dict[str, Any]] = {}
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    # -----------------------
+    # Loading / invalidation
+    # -----------------------
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self, handles: Iterable[Any]) -> None:
+        """(Re)build the directory from a full catalog listing."""
+        by_tenant: Dict[str, Dict[str, Any]] = {}
+        for handle in handles:
+            name = getattr(handle, "name", "") or ""
+            if self._sep not in name:
+                continue
+            tenant_id, collection_name = name.split(self._sep, 1)
+            if tenant_id and collection_name:
+                by_tenant.setdefault(tenant_id, {})[collection_name] = handle
+        with self._lock:
+            self._by_tenant = by_tenant
+            self._loaded = True
+
+    def ensure_loaded(self, list_fn: Callable[[], Iterable[Any]]) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                self.load(list_fn())
+
+    def invalidate(self, tenant_id: Optional[str] = None) -> None:
+        """
+        Forget one tenant's handles, or everything. Either way the next
+        ensure_loaded() rescans the catalog, so listings stay complete.
+        """
+        with self._lock:
+            if tenant_id is None:
+                self._by_tenant = {}
+            else:
+                self._by_tenant.pop(tenant_id, None)
+            self._loaded = False
+
+    # -----------------------
+    # Handles
+    # -----------------------
+
+    def get(self, tenant_id: str, collection_name: str) -> Optional[Any]:
+        return self._by_tenant.get(tenant_id, {}).get(collection_name)
+
+    def put(self, tenant_id: str, collection_name: str, handle: Any) -> None:
+        with self._lock:
+            self._by_tenant.setdefault(tenant_id, {})[collection_name] = handle
+
+    def remove(self, tenant_id: str, collection_name: str) -> None:
+        with self._lock:
+            cols = self._by_tenant.get(tenant_id)
+            if cols is None:
+                return
+            cols.pop(collection_name, None)
+            if not cols:
+                self._by_tenant.pop(tenant_id, None)
+
+    def names(self, tenant_id: str) -> List[str]:
+        return list(self._by_tenant.get(tenant_id, {}).keys())
+
+    def handles(self, tenant_id: str) -> List[Any]:
+        return list(self._by_tenant.get(tenant_id, {}).values())
+
+    def tenants(self) -> List[str]:
+        return list(self._by_tenant.keys())
@@ -1,15 +1,29 @@
 
 from __future__ import annotations
 import os
+import json
+import asyncio
+import heapq
+import itertools
 import logging
+import math
+import re
+import threading
+import time
 from pathlib import Path
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any, Callable, Tuple, Iterable, Iterator, Union
 from pydantic import BaseModel, Field, validator
 import tiktoken
 import chromadb
 from chromadb import PersistentClient
 from chromadb.config import Settings
-from Vector_setup.embeddings.embedding_service import EmbeddingService
+from Vector_setup.embeddings.embedding_service import get_embedding_service
+from Vector_setup.embeddings.embedding_cache import get_embedding_cache, text_sha256
+from Vector_setup.embeddings.query_cache import query_embedding_cache
+from Vector_setup.base.collection_directory import CollectionDirectory
+from Vector_setup.base.ingest_pipeline import IngestError, maybe_await, run_pipeline
+from Vector_setup.base.lexical_index import LexicalIndexStore, reciprocal_rank_fusion
+from Vector_setup.base.metrics import CHROMA_QUERY_SECONDS
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -75,18 +89,173 @@ def _clean_metadata(meta: dict | None) -> dict:
     return cleaned
 
 
+# Storage layouts:
+# - per_collection: one Chroma collection (HNSW index) per logical collection
+# - tenant_index:   one Chroma collection per tenant; logical collection is chunk metadata
+STORAGE_MODE_PER_COLLECTION = "per_collection"
+STORAGE_MODE_TENANT_INDEX = "tenant_index"
+STORAGE_MODES = {STORAGE_MODE_PER_COLLECTION, STORAGE_MODE_TENANT_INDEX}
+
+# '.' is rejected by the collection name validators, so this never clashes with a UI name
+TENANT_INDEX_SUFFIX = "tenant.index"
+
+# organization_id stamped on tenant_index chunks of collections without an organization,
+# so the ACL scope can match them with `$in` (Chroma cannot filter on a missing key)
+NO_ORGANIZATION = "__none__"
+
+# Chunks per pipeline batch during ingest (bounds peak memory)
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+
+# Hybrid retrieval: BM25 alongside vector search, fused with RRF.
+# Each side fetches HYBRID_FETCH_K candidates before fusion cuts to top_k.
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() in ("true", "1", "yes", "y")
+HYBRID_FETCH_K = 50
+
+# Per-collection candidate budget for multi-collection fan-out
+MIN_PER_COLLECTION_K = 10
+FANOUT_OVERFETCH = 2.0
+
+
+def _per_collection_budget(top_k: int, n_collections: int) -> int:
+    """
+    Split top_k across collections with some over-fetch, so one dominant
+    collection can still fill most of the final list.
+    """
+    if n_collections <= 1:
+        return top_k
+    share = math.ceil(top_k * FANOUT_OVERFETCH / n_collections)
+    return max(1, min(top_k, max(MIN_PER_COLLECTION_K, share)))
+
+
+_LINE_RE = re.compile(r"[^\n]*\n|[^\n]+")
+
+
+def _iter_text_pieces(
+    text: Union[str, Iterable[str]],
+    target_chars: int = 4000,
+) -> Iterator[str]:
+    """
+    Re-slice text into ~target_chars pieces on line boundaries (hard-split very
+    long lines), so the chunker never encodes the whole document at once.
+    """
+    sources = [text] if isinstance(text, str) else text
+    buf: List[str] = []
+    size = 0
+    for source in sources:
+        for m in _LINE_RE.finditer(source):
+            line = m.group(0)
+            while len(line) > target_chars:
+                if buf:
+                    yield "".join(buf)
+                    buf, size = [], 0
+                yield line[:target_chars]
+                line = line[target_chars:]
+            if not line:
+                continue
+            buf.append(line)
+            size += len(line)
+            if size >= target_chars:
+                yield "".join(buf)
+                buf, size = [], 0
+    if buf:
+        yield "".join(buf)
+
+
+def _and_where(*clauses: Optional[dict]) -> Optional[dict]:
+    """
+    Combine Chroma where clauses with $and.
+    Multi-key dicts are split, since Chroma expects one operator per clause.
+    """
+    parts: List[dict] = []
+    for clause in clauses:
+        if not clause:
+            continue
+        if len(clause) == 1 or any(k.startswith("$") for k in clause):
+            parts.append(clause)
+        else:
+            parts.extend({k: v} for k, v in clause.items())
+    if not parts:
+        return None
+    if len(parts) == 1:
+        return parts[0]
+    return {"$and": parts}
+
+
+def _query_collection(
+    col,
+    query_embeddings: List[List[float]],
+    n_results: int,
+    where: Optional[dict],
+) -> List[dict]:
+    """Blocking Chroma query for one collection; hits come back sorted by distance."""
+    results = col.query(
+        query_embeddings=query_embeddings,
+        n_results=n_results,
+        include=["documents", "metadatas", "distances"],
+        where=_and_where(where) or {},
+    )
+
+    ids = results.get("ids", [[]])[0]
+    docs = results.get("documents", [[]])[0]
+    metas = results.get("metadatas", [[]])[0]
+    dists = results.get("distances", [[]])[0]
+    name = getattr(col, "name", "")
+
+    return [
+        {
+            "id": ids[i],
+            "document": docs[i],
+            "metadata": metas[i],
+            "distance": dists[i],
+            "collection": name,
+        }
+        for i in range(len(ids))
+    ]
+
+
+class LogicalCollectionView:
+    """
+    A logical collection inside a tenant index (tenant_index storage mode).
+    Exposes the subset of the Chroma collection API the routers use, scoped by metadata.
+    """
+
+    def __init__(self, index, collection_name: str):
+        self._index = index
+        self.collection_name = collection_name
+        self.name = index.name
+
+    @property
+    def scope(self) -> dict:
+        return {"collection": self.collection_name}
+
+    def count(self) -> int:
+        return len(self._index.get(where=self.scope, include=[]).get("ids", []))
+
+    def get(self, where: Optional[dict] = None, **kwargs):
+        return self._index.get(where=_and_where(self.scope, where), **kwargs)
+
+    def query(self, where: Optional[dict] = None, **kwargs):
+        return self._index.query(where=_and_where(self.scope, where), **kwargs)
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[dict] = None):
+        return self._index.delete(ids=ids, where=_and_where(self.scope, where))
+
+
 class MultiTenantChromaStoreManager:
     """
     Production ChromaDB manager with in-process embedding service.
 
     - Uses a single PersistentClient on disk.
-    - Namespaces collections as "<tenant_id>__<collection_name>".
+    - per_collection mode (default): namespaces collections as "<tenant_id>__<collection_name>".
+    - tenant_index mode: one "<tenant_id>__tenant.index" collection per tenant; the logical
+      collection lives in chunk metadata and queries are scoped with `where` filters.
     """
 
     def __init__(
         self,
         persist_dir: str | None = None,
         embedding_model_name: str = "BAAI/bge-small-en-v1.5",
+        storage_mode: str | None = None,
     ):
         # Resolve persistent directory: env > arg > default
         raw_dir = persist_dir or os.getenv(
@@ -96,8 +265,10 @@ class MultiTenantChromaStoreManager:
         self.persist_dir = Path(raw_dir).resolve()
         self.persist_dir.mkdir(parents=True, exist_ok=True)  # mkdir -p[web:394]
 
-        # Embeddings
-        self._embedding_service = EmbeddingService(model_name=embedding_model_name)
+        # Embeddings (shared per process, see embedding_service registry)
+        self._embedding_service = get_embedding_service(embedding_model_name)
+        # Persistent content-addressed cache in front of the model (None if disabled)
+        self._embedding_cache = get_embedding_cache(embedding_model_name)
 
         # Shared Chroma settings (used also by reset)
         self._settings = Settings(
@@ -117,13 +288,39 @@ class MultiTenantChromaStoreManager:
         # Cache for collection-level metadata: (tenant_id, collection_name) -> info
         self._collection_meta_cache: Dict[Tuple[str, str], dict] = {}
 
+        # Storage layout: arg > env > default
+        mode = storage_mode or os.getenv("CHROMA_STORAGE_MODE") or STORAGE_MODE_PER_COLLECTION
+        if mode not in STORAGE_MODES:
+            raise ValueError(f"Unknown CHROMA_STORAGE_MODE: {mode!r}")
+        self.storage_mode = mode
+        self._tenant_index_lock = threading.Lock()
+
+        # Collection handles by tenant; one catalog scan here, then kept current
+        # by create/delete so the query path never lists collections
+        self._directory = CollectionDirectory()
+        self._directory.load(self._client.list_collections())
+
+        # BM25 index per (tenant, logical collection); kept next to, not inside, the
+        # Chroma directory because client.reset() wipes that
+        self.hybrid_enabled = HYBRID_SEARCH_ENABLED
+        self._lexical = LexicalIndexStore(
+            os.getenv("LEXICAL_INDEX_DIR") or f"{self.persist_dir}.lexical"
+        )
+        self._lexical_checked: set = set()
+        self._lexical_lock = threading.Lock()
+
         logger.info(
-            "MultiTenantChromaStoreManager initialized at %s (model: %s)",
+            "MultiTenantChromaStoreManager initialized at %s (model: %s, storage: %s)",
             self.persist_dir,
             embedding_model_name,
+            self.storage_mode,
         )
            
 
+    @property
+    def embedding_service(self):
+        return self._embedding_service
+
     @property
     def client(self) -> PersistentClient:
         """Expose underlying Chroma client if needed."""
@@ -137,54 +334,355 @@ class MultiTenantChromaStoreManager:
         """
         logger.warning("Resetting Chroma at %s", self.persist_dir)
         self._client.reset()
+        self._directory.invalidate()
+        self._collection_meta_cache.clear()
+        self._lexical.drop_all()
+        self._lexical_checked.clear()
 
-    async def _get_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+    async def _get_embeddings_batch(
+        self,
+        texts: List[str],
+        use_cache: bool = True,
+    ) -> List[List[float]]:
         """
         Compute embeddings locally using SentenceTransformer.
-        Kept async for interface compatibility; uses sync encode under the hood.
+        Runs on the embedding executor thread (micro-batched across requests),
+        so the event loop keeps serving streams while the model encodes.
+
+        With use_cache, texts already in the on-disk embedding cache (by sha256)
+        skip the model; only misses are encoded and then written back.
         """
-        return self._embedding_service.embed_batch(texts)
+        cache = self._embedding_cache if use_cache else None
+        if cache is None or not texts:
+            return await self._embedding_service.embed_batch_async(texts)
+
+        hashes = [text_sha256(t) for t in texts]
+        try:
+            vectors_by_hash = await asyncio.to_thread(cache.get_many, hashes)
+        except Exception as e:
+            logger.warning("Embedding cache lookup failed: %s", e)
+            vectors_by_hash = {}
+
+        missing: Dict[str, str] = {}
+        for h, t in zip(hashes, texts):
+            if h not in vectors_by_hash:
+                missing.setdefault(h, t)
+
+        if missing:
+            computed = await self._embedding_service.embed_batch_async(list(missing.values()))
+            if not computed:
+                return []
+            fresh = dict(zip(missing.keys(), computed))
+            try:
+                await asyncio.to_thread(cache.put_many, fresh)
+            except Exception as e:
+                logger.warning("Embedding cache write failed: %s", e)
+            vectors_by_hash.update(fresh)
+
+        return [vectors_by_hash[h] for h in hashes]
+
+    async def embed_query(
+        self,
+        query: str,
+        cache_key: Optional[str] = None,
+        tenant_id: str = "",
+    ) -> List[List[float]]:
+        """
+        Embed a retrieval query through the in-memory query LRU (scoped by tenant).
+        cache_key should be the normalized question; case and whitespace are folded on top.
+        """
+        model_name = self._embedding_service.model_name
+        key = cache_key if cache_key is not None else query
+        cached = query_embedding_cache.get(model_name, key, tenant_id)
+        if cached is not None:
+            return [cached]
+
+        # Queries stay out of the persistent cache; it is meant for corpus chunks
+        embeddings = await self._get_embeddings_batch([query], use_cache=False)
+        if embeddings:
+            query_embedding_cache.put(model_name, key, embeddings[0], tenant_id)
+        return embeddings
+
+    def embedding_cache_stats(self) -> dict:
+        return self._embedding_cache.stats() if self._embedding_cache is not None else {}
 
     def _tenant_collection_name(self, tenant_id: str, collection_name: str) -> str:
         return f"{tenant_id}__{collection_name}"
 
-    def _chunk_text_tokens(
+    # -----------------------
+    # Collection handle directory
+    # -----------------------
+
+    def _collection_handle(self, tenant_id: str, collection_name: str):
+        """Cached Chroma handle for a physical collection; created on first use."""
+        self._directory.ensure_loaded(self._client.list_collections)
+        handle = self._directory.get(tenant_id, collection_name)
+        if handle is None:
+            handle = self._client.get_or_create_collection(
+                name=self._tenant_collection_name(tenant_id, collection_name)
+            )
+            self._directory.put(tenant_id, collection_name, handle)
+        return handle
+
+    def _tenant_collection_handles(self, tenant_id: str) -> List:
+        self._directory.ensure_loaded(self._client.list_collections)
+        return [
+            h for h in self._directory.handles(tenant_id)
+            if not getattr(h, "name", "").endswith(TENANT_INDEX_SUFFIX)
+        ]
+
+    def invalidate_collections(self, tenant_id: Optional[str] = None) -> None:
+        """Drop cached handles for a tenant (or all) so the next access reloads them."""
+        self._directory.invalidate(tenant_id)
+        if tenant_id is None:
+            self._collection_meta_cache.clear()
+        else:
+            for key in [k for k in self._collection_meta_cache if k[0] == tenant_id]:
+                self._collection_meta_cache.pop(key, None)
+
+    # -----------------------
+    # Tenant index (single-index storage mode)
+    # -----------------------
+
+    @property
+    def uses_tenant_index(self) -> bool:
+        return self.storage_mode == STORAGE_MODE_TENANT_INDEX
+
+    def _tenant_index_name(self, tenant_id: str) -> str:
+        return self._tenant_collection_name(tenant_id, TENANT_INDEX_SUFFIX)
+
+    def get_tenant_index(self, tenant_id: str):
+        # No metadata here: get_or_create would overwrite the registered logical collections
+        return self._collection_handle(tenant_id, TENANT_INDEX_SUFFIX)
+
+    def _tenant_index_collections(self, index) -> List[str]:
+        raw = (index.metadata or {}).get("logical_collections") or "[]"
+        try:
+            names = json.loads(raw)
+        except (TypeError, ValueError):
+            return []
+        return [n for n in names if isinstance(n, str)]
+
+    def _register_logical_collection(self, index, collection_name: str) -> None:
+        """Record a logical collection name on the tenant index metadata (idempotent)."""
+        with self._tenant_index_lock:
+            names = self._tenant_index_collections(index)
+            if collection_name in names:
+                return
+            names.append(collection_name)
+            index.modify(
+                metadata={
+                    "storage_mode": STORAGE_MODE_TENANT_INDEX,
+                    "logical_collections": json.dumps(sorted(names)),
+                }
+            )
+
+    def _chunk_id(self, collection_name: str, doc_id: str, idx: int) -> str:
+        # In a shared tenant index the same doc_id may exist in several logical collections
+        if self.uses_tenant_index:
+            return f"{collection_name}::{doc_id}__chunk_{idx}"
+        return f"{doc_id}__chunk_{idx}"
+
+    def _logical_scope_where(
         self,
-        text: str,
+        collection_name: Optional[str],
+        collection_names: Optional[List[str]],
+        collection_ids: Optional[List[str]],
+        organization_ids: Optional[List[Optional[str]]] = None,
+    ) -> Optional[dict]:
+        """
+        Scope filter for the tenant index. ACL-resolved collection ids win over names;
+        no scope at all means "every collection in the tenant". The organizations of
+        the allowed collections (None = no organization) are ANDed on top, so a chunk
+        carrying a wrong collection_id still cannot leak across organizations.
+        """
+        if collection_ids:
+            scope = {"collection_id": {"$in": [str(i) for i in collection_ids]}}
+        elif collection_names:
+            scope = {"collection": {"$in": list(collection_names)}}
+        elif collection_name:
+            scope = {"collection": collection_name}
+        else:
+            scope = None
+        if organization_ids:
+            orgs = sorted({str(o) if o else NO_ORGANIZATION for o in organization_ids})
+            return _and_where(scope, {"organization_id": {"$in": orgs}})
+        return scope
+
+    # -----------------------
+    # Lexical (BM25) index
+    # -----------------------
+
+    def lexical_index(self, tenant_id: str, collection_name: str):
+        return self._lexical.get(tenant_id, collection_name)
+
+    def rebuild_lexical_index(
+        self,
+        tenant_id: str,
+        collection_name: str,
+        clear: bool = True,
+        page_size: int = 500,
+    ) -> int:
+        """Re-index a collection's stored chunks into its BM25 index. Returns chunk count."""
+        source = self.get_collection(tenant_id, collection_name)
+        lexical = self._lexical.get(tenant_id, collection_name)
+        if clear:
+            lexical.clear()
+        total = 0
+        while True:
+            page = source.get(include=["documents", "metadatas"], limit=page_size, offset=total)
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            docs = page.get("documents") or [""] * len(ids)
+            metas = page.get("metadatas") or [None] * len(ids)
+            lexical.upsert(
+                (cid, (meta or {}).get("doc_id"), doc or "")
+                for cid, doc, meta in zip(ids, docs, metas)
+            )
+            total += len(ids)
+        return total
+
+    def _backfill_lexical_if_empty(self, tenant_id: str, collection_name: str) -> None:
+        """
+        Collections ingested before the BM25 index existed start empty; index them
+        once per process in the background so the first query is not blocked.
+        """
+        key = (tenant_id, collection_name)
+        with self._lexical_lock:
+            if key in self._lexical_checked:
+                return
+            self._lexical_checked.add(key)
+        if len(self._lexical.get(tenant_id, collection_name)) > 0:
+            return
+
+        def run() -> None:
+            try:
+                n = self.rebuild_lexical_index(tenant_id, collection_name, clear=False)
+                logger.info("Backfilled BM25 index for %s/%s (%d chunks)", tenant_id, collection_name, n)
+            except Exception:
+                logger.exception("BM25 backfill failed for %s/%s", tenant_id, collection_name)
+
+        threading.Thread(target=run, name=f"bm25-backfill-{tenant_id}", daemon=True).start()
+
+    def _lexical_scope_names(
+        self,
+        tenant_id: str,
+        collection_name: Optional[str],
+        collection_names: Optional[List[str]],
+    ) -> List[str]:
+        if collection_names:
+            return list(collection_names)
+        if collection_name:
+            return [collection_name]
+        if self.uses_tenant_index:
+            return self._tenant_index_collections(self.get_tenant_index(tenant_id))
+        prefix = len(tenant_id) + 2
+        return [getattr(h, "name", "")[prefix:] for h in self._tenant_collection_handles(tenant_id)]
+
+    def _lexical_search(
+        self,
+        tenant_id: str,
+        collection_names: List[str],
+        query: str,
+        k: int,
+        where: Optional[dict],
+        scope: Optional[dict],
+    ) -> List[dict]:
+        """
+        Blocking BM25 search over logical collections. Matching chunks are read back
+        from Chroma by id with the same `where` (and tenant_index ACL scope) applied,
+        so lexical hits obey exactly the filters vector hits do.
+        """
+        hits: List[dict] = []
+        for name in collection_names:
+            self._backfill_lexical_if_empty(tenant_id, name)
+            ranked = self._lexical.get(tenant_id, name).search(query, k)
+            if not ranked:
+                continue
+            scores = dict(ranked)
+            if self.uses_tenant_index:
+                target = self.get_tenant_index(tenant_id)
+                flt = _and_where(scope, where)
+            else:
+                target = self._collection_handle(tenant_id, name)
+                flt = _and_where(where)
+            got = target.get(ids=list(scores), where=flt or None, include=["documents", "metadatas"])
+            ids = got.get("ids") or []
+            docs = got.get("documents") or [None] * len(ids)
+            metas = got.get("metadatas") or [None] * len(ids)
+            full_name = self._tenant_collection_name(tenant_id, name)
+            for cid, doc, meta in zip(ids, docs, metas):
+                hits.append({
+                    "id": cid,
+                    "document": doc,
+                    "metadata": meta,
+                    "distance": None,
+                    "bm25_score": round(scores[cid], 4),
+                    "collection": full_name,
+                })
+        hits.sort(key=lambda h: h["bm25_score"], reverse=True)
+        return hits[:k]
+
+    def iter_chunks(
+        self,
+        text: Union[str, Iterable[str]],
         max_tokens: int = 512,
         overlap_tokens: int = 64,
-    ) -> List[str]:
-        text = text.strip()
-        if not text:
-            return []
+    ) -> Iterator[Tuple[str, Tuple[int, int]]]:
+        """
+        Stream overlapping token windows as (chunk_text, (start_token, end_token)).
 
-        token_ids = self._encoding.encode(text)
-        n_tokens = len(token_ids)
-        if n_tokens == 0:
-            return []
+        The text is tokenized piece by piece (a few KB of lines at a time) into a
+        rolling buffer, so memory is bounded by the window, not the document.
+        Accepts a string or any iterable of text pieces (e.g. pages).
+        """
+        if isinstance(text, str):
+            text = text.strip()
+            if not text:
+                return
+        step = max(1, max_tokens - overlap_tokens)
 
-        chunks: List[str] = []
-        start = 0
+        window: List[int] = []
+        window_start = 0
+        emitted = False
 
-        while start < n_tokens:
-            end = min(start + max_tokens, n_tokens)
-            chunk_token_ids = token_ids[start:end]
-            chunk_text = self._encoding.decode(chunk_token_ids)
-            chunks.append(chunk_text)
+        for piece in _iter_text_pieces(text):
+            window.extend(self._encoding.encode(piece))
+            # Only emit a full window when more tokens follow, like the batch chunker did
+            while len(window) > max_tokens:
+                yield (
+                    self._encoding.decode(window[:max_tokens]),
+                    (window_start, window_start + max_tokens),
+                )
+                emitted = True
+                window = window[step:]
+                window_start += step
 
-            if end == n_tokens:
-                break
-            start = max(0, end - overlap_tokens)
+        if window and (not emitted or len(window) > overlap_tokens):
+            yield (
+                self._encoding.decode(window),
+                (window_start, window_start + len(window)),
+            )
 
-        return chunks
+    def _chunk_text_tokens(
+        self,
+        text: str,
+        max_tokens: int = 512,
+        overlap_tokens: int = 64,
+    ) -> List[str]:
+        return [
+            chunk for chunk, _span in self.iter_chunks(text, max_tokens, overlap_tokens)
+        ]
 
     # -----------------------
     # Tenant / collection API
     # -----------------------
     
     def get_collection(self, tenant_id: str, collection_name: str):
-        full_name = f"{tenant_id}__{collection_name}"
-        return self._client.get_or_create_collection(name=full_name)     
+        if self.uses_tenant_index:
+            return LogicalCollectionView(self.get_tenant_index(tenant_id), collection_name)
+        return self._collection_handle(tenant_id, collection_name)
 
     def configure_tenant_and_collection(self, req: TenantCollectionConfigRequest) -> dict:
         provision_result = self.provision_company_space(
@@ -213,24 +711,29 @@ class MultiTenantChromaStoreManager:
         }
 
     def list_companies(self) -> List[dict]:
-        all_cols = self._client.list_collections()
-        tenants: Dict[str, dict] = {}
-
-        for col in all_cols:
-            name = getattr(col, "name", "") or ""
-            if "__" not in name:
-                continue
-            tenant_id, _ = name.split("__", 1)
-            if tenant_id and tenant_id not in tenants:
-                tenants[tenant_id] = {
-                    "tenant_id": tenant_id,
-                    "display_name": tenant_id,
-                }
-        return list(tenants.values())
+        self._directory.ensure_loaded(self._client.list_collections)
+        return [
+            {
+                "tenant_id": tenant_id,
+                "display_name": tenant_id,
+            }
+            for tenant_id in self._directory.tenants()
+        ]
 
     def create_collection(self, req: CollectionCreateRequest) -> dict:
-        full_name = self._tenant_collection_name(req.tenant_id, req.collection_name)
-        collection = self._client.get_or_create_collection(full_name)
+        if self.uses_tenant_index:
+            index = self.get_tenant_index(req.tenant_id)
+            self._register_logical_collection(index, req.collection_name)
+            view = LogicalCollectionView(index, req.collection_name)
+            return {
+                "status": "ok",
+                "tenant_id": req.tenant_id,
+                "collection_name": req.collection_name,
+                "internal_name": index.name,
+                "document_count": view.count(),
+            }
+
+        collection = self._collection_handle(req.tenant_id, req.collection_name)
         return {
             "status": "ok",
             "tenant_id": req.tenant_id,
@@ -243,14 +746,47 @@ class MultiTenantChromaStoreManager:
         """
         List collection *names* (UI names) for a specific tenant.
         """
-        prefix = f"{tenant_id}__"
-        all_cols = self._client.list_collections()
-        internal_names = [
-            getattr(c, "name", "")
-            for c in all_cols
-            if getattr(c, "name", "").startswith(prefix)
+        if self.uses_tenant_index:
+            self._directory.ensure_loaded(self._client.list_collections)
+            index = self._directory.get(tenant_id, TENANT_INDEX_SUFFIX)
+            return self._tenant_index_collections(index) if index is not None else []
+
+        self._directory.ensure_loaded(self._client.list_collections)
+        return [
+            name for name in self._directory.names(tenant_id)
+            if name != TENANT_INDEX_SUFFIX
         ]
-        return [name[len(prefix):] for name in internal_names]
+
+    def delete_collection(self, tenant_id: str, collection_name: str) -> dict:
+        """
+        Drop a logical collection and keep the handle directory current.
+        In tenant_index mode only that collection's chunks are deleted.
+        """
+        if self.uses_tenant_index:
+            index = self.get_tenant_index(tenant_id)
+            index.delete(where={"collection": collection_name})
+            with self._tenant_index_lock:
+                names = [n for n in self._tenant_index_collections(index) if n != collection_name]
+                index.modify(
+                    metadata={
+                        "storage_mode": STORAGE_MODE_TENANT_INDEX,
+                        "logical_collections": json.dumps(sorted(names)),
+                    }
+                )
+        else:
+            try:
+                self._client.delete_collection(self._tenant_collection_name(tenant_id, collection_name))
+            except ValueError:
+                logger.info("Collection %s/%s already absent", tenant_id, collection_name)
+            self._directory.remove(tenant_id, collection_name)
+
+        self._collection_meta_cache.pop((tenant_id, collection_name), None)
+        self._lexical.drop(tenant_id, collection_name)
+        return {
+            "status": "ok",
+            "tenant_id": tenant_id,
+            "collection_name": collection_name,
+        }
 
     def list_collections_for_tenant(self, tenant_id: str) -> List[dict]:
         """
@@ -296,52 +832,262 @@ class MultiTenantChromaStoreManager:
     # -----------------------
     # Ingest / query
     # -----------------------
+    def _existing_chunk_hashes(self, collection, doc_id: str) -> Dict[str, dict]:
+        """
+        Chunks already stored for doc_id: id -> {"hash", "metadata"}.
+        Embeddings are fetched later, only for chunks that can reuse them.
+        """
+        existing = collection.get(where={"doc_id": doc_id}, include=["metadatas"])
+        ids = existing.get("ids") or []
+        metas = existing.get("metadatas") or [None] * len(ids)
+        return {
+            cid: {"hash": (meta or {}).get("chunk_hash"), "metadata": meta or {}}
+            for cid, meta in zip(ids, metas)
+        }
+
+    def _plan_chunk_batch(
+        self,
+        batch: List[Tuple[int, str, Tuple[int, int]]],
+        collection_name: str,
+        doc_id: str,
+        doc_meta: dict,
+        existing: Dict[str, dict],
+        existing_by_hash: Dict[str, List[str]],
+        rewritten: set,
+    ) -> dict:
+        """
+        Diff one batch of (index, chunk_text, token_span) against what is stored.
+
+        `rewritten` holds the ids that earlier batches of this ingest upsert; their
+        stored vectors may already belong to new text by the time this batch embeds,
+        so they are never used as a reuse source. The batch's own ids are safe: it
+        reads before it writes. Its upserted ids are added to `rewritten`.
+        """
+        plan = {
+            "ids": [], "chunks": [], "metas": [], "hashes": [],
+            "to_write": [], "unchanged": [], "stale_meta": [],
+            "to_embed": [], "reuse": {}, "vectors": {}, "added": 0,
+        }
+        for pos, (idx, chunk, (tok_start, tok_end)) in enumerate(batch):
+            cid = self._chunk_id(collection_name, doc_id, idx)
+            chunk_hash = text_sha256(chunk)
+            meta = _clean_metadata({
+                **doc_meta,           # doc-level metadata from router
+                "doc_id": doc_id,
+                "chunk_index": idx,
+                "token_start": tok_start,
+                "token_end": tok_end,
+                "chunk_hash": chunk_hash,
+            })
+            plan["ids"].append(cid)
+            plan["chunks"].append(chunk)
+            plan["metas"].append(meta)
+            plan["hashes"].append(chunk_hash)
+
+            prev = existing.get(cid)
+            if prev is not None and prev["hash"] == chunk_hash:
+                plan["unchanged"].append(pos)
+                if prev["metadata"] != meta:
+                    plan["stale_meta"].append(pos)
+                continue
+
+            plan["to_write"].append(pos)
+            if prev is None:
+                plan["added"] += 1
+            # Same text already stored for this doc at another position: reuse its vector
+            source_id = next(
+                (sid for sid in existing_by_hash.get(chunk_hash, ()) if sid not in rewritten),
+                None,
+            )
+            if source_id is not None:
+                plan["reuse"][pos] = source_id
+            else:
+                plan["to_embed"].append(pos)
+        rewritten.update(plan["ids"][pos] for pos in plan["to_write"])
+        return plan
+
+    async def _embed_chunk_batch(self, plan: dict, collection) -> bool:
+        """Fill plan["vectors"] for the chunks that need writing. False on failure."""
+        if plan["reuse"]:
+            stored = await asyncio.to_thread(
+                collection.get,
+                ids=list(set(plan["reuse"].values())),
+                include=["embeddings"],
+            )
+            by_id = dict(zip(stored.get("ids") or [], stored.get("embeddings") or []))
+            for pos, source_id in plan["reuse"].items():
+                if source_id in by_id:
+                    plan["vectors"][pos] = list(by_id[source_id])
+                else:
+                    plan["to_embed"].append(pos)
+
+        if plan["to_embed"]:
+            try:
+                vectors = await self._get_embeddings_batch(
+                    [plan["chunks"][pos] for pos in plan["to_embed"]]
+                )
+            except Exception:
+                # Logged with its traceback by the embedding service
+                return False
+            if not vectors:
+                return False
+            plan["vectors"].update(zip(plan["to_embed"], vectors))
+        return True
+
+    def _write_chunk_batch(self, writer, plan: dict, lexical=None) -> None:
+        if plan["to_write"]:
+            writer.upsert(
+                ids=[plan["ids"][pos] for pos in plan["to_write"]],
+                documents=[plan["chunks"][pos] for pos in plan["to_write"]],
+                embeddings=[plan["vectors"][pos] for pos in plan["to_write"]],
+                metadatas=[plan["metas"][pos] for pos in plan["to_write"]],
+            )
+        # Unchanged chunks keep their vectors; refresh doc-level metadata if it moved
+        if plan["stale_meta"]:
+            writer.update(
+                ids=[plan["ids"][pos] for pos in plan["stale_meta"]],
+                metadatas=[plan["metas"][pos] for pos in plan["stale_meta"]],
+            )
+        if lexical is not None:
+            # Unchanged chunks only need indexing if they predate the BM25 index
+            missing = set(lexical.missing(plan["ids"][pos] for pos in plan["unchanged"]))
+            positions = plan["to_write"] + [
+                pos for pos in plan["unchanged"] if plan["ids"][pos] in missing
+            ]
+            lexical.upsert(
+                (plan["ids"][pos], plan["metas"][pos].get("doc_id"), plan["chunks"][pos])
+                for pos in positions
+            )
+
     async def add_document(
         self,
         tenant_id: str,
         collection_name: str,
         doc_id: str,
-        text: str,
+        text: Union[str, Iterable[str]],
         metadata: Optional[dict] = None,
+        progress: Optional[Callable[[dict], Any]] = None,
     ) -> dict:
-        chunks = self._chunk_text_tokens(text, max_tokens=512, overlap_tokens=64)
-        if not chunks:
-            return {
-                "status": "error",
-                "message": "Document has no text content after processing.",
-            }
+        """
+        Idempotent, incremental (re-)ingest of one document.
 
-        embeddings = await self._get_embeddings_batch(chunks)
-        if not embeddings:
+        Chunks stream out of iter_chunks in INGEST_BATCH_SIZE batches through a
+        chunk -> embed -> write pipeline (see ingest_pipeline), so tokenizing,
+        embedding and Chroma writes overlap and peak memory follows the batch
+        size rather than the document. Every chunk carries a sha256
+        `chunk_hash`. Chunks whose id and hash are already stored are left alone,
+        changed/new chunks are upserted (reusing a stored embedding when the same
+        text moved position), and stale tail chunks are deleted. The collection's
+        BM25 index is kept in step by the write stage.
+
+        `progress` (sync or async) is called after each written batch. The result
+        includes the ingest diff and per-stage throughput.
+        """
+        if self.uses_tenant_index:
+            index = self.get_tenant_index(tenant_id)
+            self._register_logical_collection(index, collection_name)
+            if not (metadata or {}).get("collection_id"):
+                logger.warning(
+                    "Document %s in %s/%s has no collection_id; ACL-scoped queries will not see it",
+                    doc_id, tenant_id, collection_name,
+                )
+            collection = LogicalCollectionView(index, collection_name)
+            writer = index
+        else:
+            collection = self._collection_handle(tenant_id, collection_name)
+            writer = collection
+
+        doc_meta = {
+            **(metadata or {}),
+            "tenant_id": tenant_id,
+            "collection": collection_name,
+        }
+        if self.uses_tenant_index:
+            doc_meta["organization_id"] = doc_meta.get("organization_id") or NO_ORGANIZATION
+        lexical = self._lexical.get(tenant_id, collection_name)
+        existing = self._existing_chunk_hashes(collection, doc_id)
+        existing_by_hash: Dict[str, List[str]] = {}
+        for cid, e in existing.items():
+            if e["hash"]:
+                existing_by_hash.setdefault(e["hash"], []).append(cid)
+        rewritten: set = set()
+
+        diff = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0, "embedded": 0}
+        seen_ids: set = set()
+        written = {"chunks": 0, "batches": 0}
+
+        def planned_batches() -> Iterator[dict]:
+            batch: List[Tuple[int, str, Tuple[int, int]]] = []
+            chunks = self.iter_chunks(text, max_tokens=512, overlap_tokens=64)
+            for idx, (chunk, span) in enumerate(chunks):
+                batch.append((idx, chunk, span))
+                if len(batch) >= INGEST_BATCH_SIZE:
+                    yield self._plan_chunk_batch(
+                        batch, collection_name, doc_id, doc_meta, existing, existing_by_hash, rewritten
+                    )
+                    batch = []
+            if batch:
+                yield self._plan_chunk_batch(
+                    batch, collection_name, doc_id, doc_meta, existing, existing_by_hash, rewritten
+                )
+
+        async def embed(plan: dict) -> dict:
+            if not await self._embed_chunk_batch(plan, collection):
+                raise IngestError("Failed to compute embeddings for document.")
+            return plan
+
+        async def write(plan: dict) -> dict:
+            await asyncio.to_thread(self._write_chunk_batch, writer, plan, lexical)
+            return plan
+
+        async def done(plan: dict) -> None:
+            seen_ids.update(plan["ids"])
+            diff["added"] += plan["added"]
+            diff["updated"] += len(plan["to_write"]) - plan["added"]
+            diff["unchanged"] += len(plan["unchanged"])
+            diff["embedded"] += len(plan["to_embed"])
+            written["chunks"] += len(plan["ids"])
+            written["batches"] += 1
+            if progress is not None:
+                try:
+                    await maybe_await(progress({
+                        "doc_id": doc_id,
+                        "chunks_written": written["chunks"],
+                        "batches_written": written["batches"],
+                        **diff,
+                    }))
+                except Exception:
+                    logger.exception("Ingest progress callback failed for %s", doc_id)
+
+        # Embedding batch N+1 while batch N writes is safe: a batch only reuses
+        # vectors from ids no earlier batch rewrites (see _plan_chunk_batch)
+        try:
+            pipeline = await run_pipeline(
+                planned_batches(),
+                [("embed", embed), ("write", write)],
+                size_of=lambda plan: len(plan["ids"]),
+                on_output=done,
+            )
+        except IngestError as e:
+            # Batches already written stay; a retry skips them by hash
+            return {"status": "error", "message": str(e)}
+
+        n_chunks = written["chunks"]
+        if n_chunks == 0:
             return {
                 "status": "error",
-                "message": "Failed to compute embeddings for document.",
+                "message": "Document has no text content after processing.",
             }
 
-        full_name = self._tenant_collection_name(tenant_id, collection_name)
-        collection = self._client.get_or_create_collection(full_name)
-
-        chunk_ids = [f"{doc_id}__chunk_{i}" for i in range(len(chunks))]
-        
-        chunk_metadatas = []
-        for idx, _chunk_text in enumerate(chunks):
-            base_meta = metadata or {}
-            meta = {
-                **base_meta,          # doc-level metadata from router
-                "tenant_id": tenant_id,
-                "collection": collection_name,
-                "doc_id": doc_id,
-                "chunk_index": idx,
-                "chunk_count": len(chunks),
-            }
-            chunk_metadatas.append(_clean_metadata(meta))
+        removed_ids = [cid for cid in existing if cid not in seen_ids]
+        if removed_ids:
+            writer.delete(ids=removed_ids)
+            lexical.delete(removed_ids)
+        diff["removed"] = len(removed_ids)
 
-        
-        collection.add(
-            ids=chunk_ids,
-            documents=chunks,
-            embeddings=embeddings,
-            metadatas=chunk_metadatas,
+        logger.info(
+            "Ingested %s into %s/%s: %d chunks in %.2fs %s",
+            doc_id, tenant_id, collection_name, n_chunks, pipeline["wall_s"], pipeline["stages"],
         )
 
         return {
@@ -349,7 +1095,9 @@ class MultiTenantChromaStoreManager:
             "tenant_id": tenant_id,
             "collection_name": collection_name,
             "doc_id": doc_id,
-            "chunks_indexed": len(chunks),
+            "chunks_indexed": n_chunks,
+            "diff": diff,
+            "pipeline": pipeline,
             "new_collection_count": collection.count(),
         }
 
@@ -361,77 +1109,199 @@ class MultiTenantChromaStoreManager:
         top_k: int = 100,
         where: Optional[dict] = None,
         collection_names: Optional[List[str]] = None, # NEW
+        collection_ids: Optional[List[str]] = None,
+        query_cache_key: Optional[str] = None,
+        hybrid: Optional[bool] = None,
+        organization_ids: Optional[List[Optional[str]]] = None,
     ) -> dict:
         """
-        Vector search within tenant collections.
+        Vector (+ BM25) search within tenant collections.
 
         - if collection_names provided: restrict to those UI names.
         - Single collection if collection_name provided
         - All tenant collections if None
+
+        With hybrid retrieval (HYBRID_SEARCH_ENABLED, or `hybrid`), vector and
+        lexical search run concurrently, each over HYBRID_FETCH_K candidates, and
+        are fused with reciprocal-rank fusion down to top_k. Exact tokens (invoice
+        numbers, policy codes, years) then rank well without a huge top_k.
+        """
+        use_hybrid = self.hybrid_enabled if hybrid is None else hybrid
+        if not use_hybrid:
+            return await self._vector_search(
+                tenant_id, collection_name, query, top_k, where,
+                collection_names, collection_ids, query_cache_key, organization_ids,
+            )
+
+        fetch_k = max(top_k, HYBRID_FETCH_K)
+        scope = (
+            self._logical_scope_where(
+                collection_name, collection_names, collection_ids, organization_ids
+            )
+            if self.uses_tenant_index else None
+        )
+
+        async def _lexical() -> Tuple[List[dict], float]:
+            start = time.perf_counter()
+            try:
+                names = self._lexical_scope_names(tenant_id, collection_name, collection_names)
+                lex_hits = await asyncio.to_thread(
+                    self._lexical_search, tenant_id, names, query, fetch_k, where, scope
+                )
+            except Exception as e:
+                logger.warning("Lexical search failed for tenant %s: %s", tenant_id, e)
+                lex_hits = []
+            return lex_hits, (time.perf_counter() - start) * 1000.0
+
+        vector, (lex_hits, lex_ms) = await asyncio.gather(
+            self._vector_search(
+                tenant_id, collection_name, query, fetch_k, where,
+                collection_names, collection_ids, query_cache_key, organization_ids,
+            ),
+            _lexical(),
+        )
+        vec_hits = vector.get("results", [])
+
+        return {
+            **vector,
+            "results": reciprocal_rank_fusion([vec_hits, lex_hits], top_k),
+            "retrieval": {
+                "mode": "hybrid",
+                "vector_hits": len(vec_hits),
+                "lexical_hits": len(lex_hits),
+                "lexical_latency_ms": round(lex_ms, 2),
+            },
+        }
+
+    async def _vector_search(
+        self,
+        tenant_id: str,
+        collection_name: Optional[str],
+        query: str,
+        top_k: int,
+        where: Optional[dict],
+        collection_names: Optional[List[str]],
+        collection_ids: Optional[List[str]],
+        query_cache_key: Optional[str],
+        organization_ids: Optional[List[Optional[str]]] = None,
+    ) -> dict:
         """
-        hits: list[dict] = []
+        Dense retrieval. Collections are queried concurrently off the event loop,
+        each with a reduced per-collection budget, and merged with a bounded k-way heap.
 
-        query_embeddings = await self._get_embeddings_batch([query])
+        In tenant_index mode there is a single index query; the allowed collections
+        (collection_ids from the ACL, else names) and their organization_ids are pushed
+        down as a `where` filter.
+        """
+        query_embeddings = await self.embed_query(query, cache_key=query_cache_key, tenant_id=tenant_id)
         if not query_embeddings:
             return {"query": query, "results": []}
 
+        if self.uses_tenant_index:
+            index = self.get_tenant_index(tenant_id)
+            scope = self._logical_scope_where(
+                collection_name, collection_names, collection_ids, organization_ids
+            )
+            start = time.perf_counter()
+            hits = await asyncio.to_thread(
+                _query_collection,
+                index,
+                query_embeddings,
+                top_k,
+                _and_where(scope, where),
+            )
+            elapsed = time.perf_counter() - start
+            CHROMA_QUERY_SECONDS.observe(elapsed, tenant=tenant_id, collection=index.name)
+            for h in hits:
+                logical = (h.get("metadata") or {}).get("collection", "")
+                h["collection"] = self._tenant_collection_name(tenant_id, logical)
+            return {
+                "query": query,
+                "results": hits,
+                "per_collection_k": top_k,
+                "collection_latency_ms": {index.name: round(elapsed * 1000.0, 2)},
+            }
+
         collections = []
         
         # 1 Explicit list (ACL-filtered)
         if collection_names:
             for ui_name in collection_names:
-                full_name = self._tenant_collection_name(tenant_id, ui_name)
-                collections.append(self._client.get_or_create_collection(full_name))
+                collections.append(self._collection_handle(tenant_id, ui_name))
         
         #2  Backward-compat single collection_name
         elif collection_name:
-            full_name = self._tenant_collection_name(tenant_id, collection_name)
-            collections = [self._client.get_or_create_collection(full_name)]
+            collections = [self._collection_handle(tenant_id, collection_name)]
             
         # 3 Fallback: all tenant collections    
         else:
-            prefix = f"{tenant_id}__"
-            all_cols = self._client.list_collections()
-            collections = [
-                c for c in all_cols if getattr(c, "name", "").startswith(prefix)
-            ]
+            collections = self._tenant_collection_handles(tenant_id)
             
         if not collections:
             logger.info("No collections found for tenant %s", tenant_id)
             return {"query": query, "results": []}    
 
-        for col in collections:
-            logger.debug(
-                "Querying collection %s",
-                getattr(col, "name", ""),
-            )
-            results = col.query(
-                query_embeddings=query_embeddings,
-                n_results=top_k,
-                include=["documents", "metadatas", "distances"],
-                where=where or {},
-            )
+        per_collection_k = _per_collection_budget(top_k, len(collections))
 
-            ids = results.get("ids", [[]])[0]
-            docs = results.get("documents", [[]])[0]
-            metas = results.get("metadatas", [[]])[0]
-            dists = results.get("distances", [[]])[0]
-
-            for i in range(len(ids)):
-                hits.append(
-                    {
-                        "id": ids[i],
-                        "document": docs[i],
-                        "metadata": metas[i],
-                        "distance": dists[i],
-                        "collection": getattr(col, "name", ""),
-                    }
+        async def _timed_query(col) -> Tuple[str, List[dict], float]:
+            name = getattr(col, "name", "")
+            start = time.perf_counter()
+            try:
+                col_hits = await asyncio.to_thread(
+                    _query_collection,
+                    col,
+                    query_embeddings,
+                    per_collection_k,
+                    where,
                 )
+            except Exception as e:
+                logger.warning("Query failed for collection %s: %s", name, e)
+                # Possibly dropped by another worker: reload the handle next time
+                self._directory.remove(tenant_id, name[len(tenant_id) + 2:])
+                col_hits = []
+            elapsed = time.perf_counter() - start
+            CHROMA_QUERY_SECONDS.observe(elapsed, tenant=tenant_id, collection=name)
+            return name, col_hits, elapsed * 1000.0
+
+        per_collection = await asyncio.gather(*[_timed_query(c) for c in collections])
 
-        hits.sort(key=lambda h: h["distance"])
-        hits = hits[:top_k]
+        # Each per-collection list is already sorted by distance -> bounded k-way merge
+        merged = heapq.merge(
+            *[col_hits for _, col_hits, _ in per_collection],
+            key=lambda h: h["distance"],
+        )
+        hits = list(itertools.islice(merged, top_k))
+
+        latency_ms = {name: round(ms, 2) for name, _, ms in per_collection}
+        logger.debug("query_policies per-collection latency (ms): %s", latency_ms)
+
+        return {
+            "query": query,
+            "results": hits,
+            "per_collection_k": per_collection_k,
+            "collection_latency_ms": latency_ms,
+        }
+
+    def chunk_embeddings(self, tenant_id: str, hits: List[dict]) -> List[Optional[List[float]]]:
+        """
+        Stored vectors for retrieved hits (same order), read back from Chroma by id.
+        Lets rerank stages score candidates without re-embedding them.
+        """
+        groups: Dict[str, List[str]] = {}
+        for h in hits:
+            groups.setdefault(h.get("collection", ""), []).append(h["id"])
 
-        return {"query": query, "results": hits}
+        vectors: Dict[Tuple[str, str], List[float]] = {}
+        prefix = len(tenant_id) + 2
+        for full_name, ids in groups.items():
+            if self.uses_tenant_index:
+                handle = self.get_tenant_index(tenant_id)
+            else:
+                handle = self._collection_handle(tenant_id, full_name[prefix:])
+            got = handle.get(ids=ids, include=["embeddings"])
+            for cid, emb in zip(got.get("ids") or [], got.get("embeddings") or []):
+                vectors[(full_name, cid)] = list(emb)
+        return [vectors.get((h.get("collection", ""), h["id"])) for h in hits]
 
     async def summarize_capabilities(self, tenant_id: str) -> dict:
         """
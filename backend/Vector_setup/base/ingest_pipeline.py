@@ -0,0 +1,114 @@
+"""
+Staged producer/consumer pipeline for document ingest.
+
+    chunk (thread) --queue--> embed --queue--> write (thread)
+
+Each stage runs as its own task and hands batches downstream through bounded
+asyncio queues, so embedding batch N overlaps with writing batch N-1 and with
+tokenizing batch N+1, while at most `queue_depth` batches wait between any two
+stages. Wall-clock time tends towards the slowest stage instead of the sum.
+"""
+from __future__ import annotations
+import asyncio
+import inspect
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+INGEST_QUEUE_DEPTH = 2
+
+_DONE = object()
+
+Stage = Tuple[str, Callable[[Any], Awaitable[Any]]]
+
+
+class IngestError(RuntimeError):
+    """Raised by a stage to abort the pipeline with a user-facing message."""
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.batches = 0
+        self.chunks = 0
+        self.busy_s = 0.0
+
+    def record(self, chunks: int, elapsed_s: float) -> None:
+        self.batches += 1
+        self.chunks += chunks
+        self.busy_s += elapsed_s
+
+    def as_dict(self) -> dict:
+        return {
+            "batches": self.batches,
+            "chunks": self.chunks,
+            "busy_s": round(self.busy_s, 4),
+            "chunks_per_s": round(self.chunks / self.busy_s, 1) if self.busy_s > 0 else None,
+        }
+
+
+async def maybe_await(result: Any) -> None:
+    if inspect.isawaitable(result):
+        await result
+
+
+async def run_pipeline(
+    source: Iterator[Any],
+    stages: List[Stage],
+    size_of: Callable[[Any], int] = len,
+    on_output: Optional[Callable[[Any], Any]] = None,
+    source_name: str = "chunk",
+    queue_depth: int = INGEST_QUEUE_DEPTH,
+) -> Dict[str, Any]:
+    """
+    Drive `source` (a blocking iterator, pulled from a worker thread) through
+    `stages` in order. `on_output` sees every item leaving the last stage and
+    may be sync or async. The first stage error cancels the whole pipeline and
+    is re-raised. Returns per-stage stats plus total wall time.
+    """
+    stats = {source_name: StageStats(source_name)}
+    for name, _ in stages:
+        stats[name] = StageStats(name)
+    queues = [asyncio.Queue(maxsize=max(1, queue_depth)) for _ in stages]
+
+    async def produce() -> None:
+        while True:
+            start = time.perf_counter()
+            item = await asyncio.to_thread(next, source, _DONE)
+            if item is _DONE:
+                break
+            stats[source_name].record(size_of(item), time.perf_counter() - start)
+            await queues[0].put(item)
+        await queues[0].put(_DONE)
+
+    async def consume(i: int, name: str, fn: Callable[[Any], Awaitable[Any]]) -> None:
+        inbox = queues[i]
+        outbox = queues[i + 1] if i + 1 < len(queues) else None
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                break
+            start = time.perf_counter()
+            out = await fn(item)
+            stats[name].record(size_of(item), time.perf_counter() - start)
+            if outbox is not None:
+                await outbox.put(out)
+            elif on_output is not None:
+                await maybe_await(on_output(out))
+        if outbox is not None:
+            await outbox.put(_DONE)
+
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(produce())]
+    tasks += [asyncio.create_task(consume(i, name, fn)) for i, (name, fn) in enumerate(stages)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    return {
+        "stages": {name: s.as_dict() for name, s in stats.items()},
+        "wall_s": round(time.perf_counter() - started, 4),
+    }
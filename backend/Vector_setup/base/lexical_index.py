@@ -0,0 +1,264 @@
+"""
+BM25 inverted index per tenant collection, stored in SQLite.
+
+Dense retrieval is weak on exact tokens (invoice numbers, policy codes, month
+names, years), so query_policies also runs a lexical search and fuses the two
+rankings with reciprocal-rank fusion.
+
+One file per (tenant, collection) under the index root:
+
+- chunks    chunk id -> integer key, doc_id, token length
+- postings  (term, chunk key) -> term frequency (WITHOUT ROWID, no text copies)
+
+add_document keeps it current chunk by chunk; documents and metadata are
+fetched back from Chroma by id at query time, so the index holds no text.
+"""
+from __future__ import annotations
+import heapq
+import logging
+import math
+import re
+import shutil
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+
+# Compound tokens ("inv-2023-0042", "hr/pol.7") are indexed whole and by part
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_/.][a-z0-9]+)*")
+_PART_RE = re.compile(r"[-_/.]")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or our "
+    "that the their this to was we were what when where which who why will with "
+    "you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    tokens: List[str] = []
+    for match in _TOKEN_RE.finditer((text or "").lower()):
+        tok = match.group(0)
+        parts = _PART_RE.split(tok)
+        if len(parts) > 1:
+            tokens.append(tok)
+        for part in parts:
+            if part and part not in _STOPWORDS and (len(part) > 1 or part.isdigit()):
+                tokens.append(part)
+    return tokens
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[List[dict]],
+    top_k: int,
+    k: int = RRF_K,
+) -> List[dict]:
+    """
+    Fuse ranked hit lists (best first) by sum of 1 / (k + rank). Hits are keyed
+    by (collection, id); fields from every list are merged into one dict.
+    """
+    scores: Dict[Tuple[str, str], float] = {}
+    merged: Dict[Tuple[str, str], dict] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            key = (hit.get("collection", ""), hit["id"])
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            if key in merged:
+                for field, value in hit.items():
+                    if merged[key].get(field) is None:
+                        merged[key][field] = value
+            else:
+                merged[key] = dict(hit)
+
+    best = heapq.nlargest(top_k, scores.items(), key=lambda kv: kv[1])
+    out = []
+    for key, score in best:
+        hit = merged[key]
+        hit["rrf_score"] = round(score, 6)
+        out.append(hit)
+    return out
+
+
+class BM25Index:
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " id INTEGER PRIMARY KEY, chunk_id TEXT UNIQUE NOT NULL,"
+            " doc_id TEXT, length INTEGER NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            " term TEXT NOT NULL, chunk INTEGER NOT NULL, tf INTEGER NOT NULL,"
+            " PRIMARY KEY (term, chunk)) WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings(chunk)")
+        self._db.commit()
+        self._corpus: Optional[Tuple[int, float]] = None  # (n_chunks, avg_len)
+
+    # -----------------------
+    # Writes
+    # -----------------------
+
+    def _delete_keys(self, keys: List[int]) -> None:
+        self._db.executemany("DELETE FROM postings WHERE chunk = ?", [(k,) for k in keys])
+        self._db.executemany("DELETE FROM chunks WHERE id = ?", [(k,) for k in keys])
+
+    def _keys_for(self, chunk_ids: List[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        for i in range(0, len(chunk_ids), 500):
+            part = chunk_ids[i: i + 500]
+            marks = ",".join("?" * len(part))
+            for cid, key in self._db.execute(
+                f"SELECT chunk_id, id FROM chunks WHERE chunk_id IN ({marks})", part
+            ):
+                found[cid] = key
+        return found
+
+    def upsert(self, items: Iterable[Tuple[str, Optional[str], str]]) -> None:
+        """items: (chunk_id, doc_id, text). Replaces any previous postings."""
+        items = list(items)
+        if not items:
+            return
+        with self._lock, self._db:
+            stale = self._keys_for([cid for cid, _, _ in items])
+            if stale:
+                self._delete_keys(list(stale.values()))
+            for chunk_id, doc_id, text in items:
+                counts = Counter(tokenize(text))
+                cur = self._db.execute(
+                    "INSERT INTO chunks (chunk_id, doc_id, length) VALUES (?, ?, ?)",
+                    (chunk_id, doc_id, sum(counts.values())),
+                )
+                key = cur.lastrowid
+                self._db.executemany(
+                    "INSERT INTO postings (term, chunk, tf) VALUES (?, ?, ?)",
+                    [(term, key, tf) for term, tf in counts.items()],
+                )
+            self._corpus = None
+
+    def delete(self, chunk_ids: Iterable[str]) -> None:
+        chunk_ids = list(chunk_ids)
+        if not chunk_ids:
+            return
+        with self._lock, self._db:
+            keys = self._keys_for(chunk_ids)
+            if keys:
+                self._delete_keys(list(keys.values()))
+            self._corpus = None
+
+    def missing(self, chunk_ids: Iterable[str]) -> List[str]:
+        chunk_ids = list(chunk_ids)
+        with self._lock:
+            present = self._keys_for(chunk_ids)
+        return [cid for cid in chunk_ids if cid not in present]
+
+    def clear(self) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM postings")
+            self._db.execute("DELETE FROM chunks")
+            self._corpus = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    # -----------------------
+    # Search
+    # -----------------------
+
+    def _corpus_stats(self) -> Tuple[int, float]:
+        if self._corpus is None:
+            n, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks").fetchone()
+            self._corpus = (n, (total / n) if n else 0.0)
+        return self._corpus
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._corpus_stats()[0]
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top-k (chunk_id, bm25 score), best first."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or k <= 0:
+            return []
+        with self._lock:
+            n, avg_len = self._corpus_stats()
+            if n == 0:
+                return []
+            scores: Dict[int, float] = {}
+            for term in terms:
+                rows = self._db.execute(
+                    "SELECT p.chunk, p.tf, c.length FROM postings p"
+                    " JOIN chunks c ON c.id = p.chunk WHERE p.term = ?",
+                    (term,),
+                ).fetchall()
+                if not rows:
+                    continue
+                idf = math.log(1.0 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+                for key, tf, length in rows:
+                    norm = tf + BM25_K1 * (1.0 - BM25_B + BM25_B * length / (avg_len or 1.0))
+                    scores[key] = scores.get(key, 0.0) + idf * tf * (BM25_K1 + 1.0) / norm
+
+            best = heapq.nlargest(k, scores.items(), key=lambda kv: kv[1])
+            if not best:
+                return []
+            marks = ",".join("?" * len(best))
+            ids = dict(self._db.execute(
+                f"SELECT id, chunk_id FROM chunks WHERE id IN ({marks})", [key for key, _ in best]
+            ))
+        return [(ids[key], score) for key, score in best if key in ids]
+
+
+class LexicalIndexStore:
+    """Opens and caches one BM25Index per (tenant, collection) under `root`."""
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root).resolve()
+        self._indexes: Dict[Tuple[str, str], BM25Index] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _safe(name: str) -> str:
+        return re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+
+    def _path(self, tenant_id: str, collection_name: str) -> Path:
+        return self.root / self._safe(tenant_id) / f"{self._safe(collection_name)}.bm25.sqlite"
+
+    def get(self, tenant_id: str, collection_name: str) -> BM25Index:
+        key = (tenant_id, collection_name)
+        index = self._indexes.get(key)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(key)
+                if index is None:
+                    index = BM25Index(self._path(tenant_id, collection_name))
+                    self._indexes[key] = index
+        return index
+
+    def drop(self, tenant_id: str, collection_name: str) -> None:
+        with self._lock:
+            index = self._indexes.pop((tenant_id, collection_name), None)
+            if index is not None:
+                index.close()
+            path = self._path(tenant_id, collection_name)
+            for suffix in ("", "-wal", "-shm"):
+                Path(f"{path}{suffix}").unlink(missing_ok=True)
+
+    def drop_all(self) -> None:
+        with self._lock:
+            for index in self._indexes.values():
+                index.close()
+            self._indexes.clear()
+            shutil.rmtree(self.root, ignore_errors=True)
@@ -0,0 +1,272 @@
+"""
+In-process latency histograms, counters and gauges, exposed in Prometheus text format on
+GET /api/metrics (platform admins only, see Vector_setup.API.metrics_router).
+
+Query-path stages are labeled by tenant and intent so heavy tenants' p95 can
+be broken down per stage; Chroma queries are labeled by tenant and collection.
+Histograms are cumulative for the life of the process (one series per worker,
+as with any Prometheus client) and safe to observe from worker threads.
+"""
+from __future__ import annotations
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+# Seconds; spans cached embeddings (~ms) up to long generations
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0,
+)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_le(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> (per-bucket counts incl. +Inf, sum, count)
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, seconds: float, **labels: Optional[str]) -> None:
+        if seconds is None or seconds < 0:
+            return
+        key = tuple(str(labels.get(name) or "unknown") for name in self.labelnames)
+        idx = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][idx] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def observe_ms(self, ms: Optional[float], **labels: Optional[str]) -> None:
+        if ms is not None:
+            self.observe(ms / 1000.0, **labels)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            snapshot = sorted(
+                (key, list(series[0]), series[1], series[2])
+                for key, series in self._series.items()
+            )
+        for key, counts, total, count in snapshot:
+            base = [f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key)]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = ",".join(base + [f'le="{_format_le(bound)}"'])
+                lines.append(f"{self.name}_bucket{{{labels}}} {cumulative}")
+            suffix = "{" + ",".join(base) + "}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    """Monotonic count per label set."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Optional[str]) -> None:
+        key = tuple(str(labels.get(name) or "unknown") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Optional[str]) -> float:
+        key = tuple(str(labels.get(name) or "unknown") for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            labels = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key))
+            suffix = "{" + labels + "}" if labels else ""
+            lines.append(f"{self.name}{suffix} {value}")
+        return lines
+
+
+class Gauge:
+    """
+    Point-in-time values. Either set() explicitly or pass `collect`, called at
+    render time and returning {label values tuple: value}.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        collect: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: Optional[str]) -> None:
+        key = tuple(str(labels.get(name) or "unknown") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+        ]
+        with self._lock:
+            values = dict(self._values)
+        if self.collect is not None:
+            values.update(self.collect())
+        for key, value in sorted(values.items()):
+            labels = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key))
+            suffix = "{" + labels + "}" if labels else ""
+            lines.append(f"{self.name}{suffix} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Union[Histogram, Counter, Gauge]] = {}
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        if name in self._metrics:
+            return self._metrics[name]
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics[name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        if name in self._metrics:
+            return self._metrics[name]
+        metric = Counter(name, documentation, labelnames)
+        self._metrics[name] = metric
+        return metric
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        collect: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None,
+    ) -> Gauge:
+        if name in self._metrics:
+            return self._metrics[name]
+        metric = Gauge(name, documentation, labelnames, collect)
+        self._metrics[name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+_QUERY_LABELS = ("tenant", "intent")
+
+QUERY_EMBEDDING_SECONDS = REGISTRY.histogram(
+    "rag_query_embedding_seconds", "Query embedding latency.", _QUERY_LABELS)
+RETRIEVAL_SECONDS = REGISTRY.histogram(
+    "rag_retrieval_seconds", "Vector (+ lexical) retrieval latency, all collections.", _QUERY_LABELS)
+CHROMA_QUERY_SECONDS = REGISTRY.histogram(
+    "rag_chroma_query_seconds", "Chroma query latency per collection.", ("tenant", "collection"))
+RERANK_SECONDS = REGISTRY.histogram(
+    "rag_rerank_seconds", "Rerank cascade latency.", _QUERY_LABELS)
+GENERATION_TTFT_SECONDS = REGISTRY.histogram(
+    "rag_generation_ttft_seconds", "Main answer time to first token.", _QUERY_LABELS)
+GENERATION_SECONDS = REGISTRY.histogram(
+    "rag_generation_seconds", "Main answer generation latency (full stream).", _QUERY_LABELS)
+FORMAT_SECONDS = REGISTRY.histogram(
+    "rag_format_seconds", "Answer formatting latency.", _QUERY_LABELS)
+CHART_SPEC_SECONDS = REGISTRY.histogram(
+    "rag_chart_spec_seconds", "Chart spec generation latency.", _QUERY_LABELS)
+HISTORY_LOAD_SECONDS = REGISTRY.histogram(
+    "rag_history_load_seconds", "Chat history / last doc DB load latency.", _QUERY_LABELS)
+ACL_SECONDS = REGISTRY.histogram(
+    "rag_acl_evaluation_seconds", "Collection ACL evaluation latency.", _QUERY_LABELS)
+AUDIT_WRITE_SECONDS = REGISTRY.histogram(
+    "rag_audit_write_seconds", "Audit log write latency.", _QUERY_LABELS)
+LLM_QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "rag_llm_queue_wait_seconds", "Time an LLM call waited for a scheduler slot.", ("tenant", "priority"))
+QUERY_DEGRADED_TOTAL = REGISTRY.counter(
+    "rag_query_degraded_total", "Optional stages cut short or skipped, by reason (deadline / load).",
+    ("tenant", "stage", "reason"))
+QUERY_CANCELLED_TOTAL = REGISTRY.counter(
+    "rag_query_cancelled_total", "Queries / enrichments abandoned by the client, by stage reached.",
+    ("tenant", "stage"))
+
+# Pipeline / enrichment stage name (LLM_Config.pipeline_events) -> histogram
+_STAGE_HISTOGRAMS = {
+    "embed": QUERY_EMBEDDING_SECONDS,
+    "retrieve": RETRIEVAL_SECONDS,
+    "rerank": RERANK_SECONDS,
+    "generate": GENERATION_SECONDS,
+    "format": FORMAT_SECONDS,
+    "chart": CHART_SPEC_SECONDS,
+}
+
+
+def observe_stage(tenant: str, intent: Optional[str], stage: dict) -> None:
+    """Record a finished stage event (StageEvent.as_dict()) in its histogram."""
+    histogram = _STAGE_HISTOGRAMS.get(stage.get("stage", ""))
+    if histogram is None:
+        return
+    histogram.observe_ms(stage.get("duration_ms"), tenant=tenant, intent=intent)
+    if stage.get("stage") == "generate":
+        ttft_ms = (stage.get("detail") or {}).get("ttft_ms")
+        GENERATION_TTFT_SECONDS.observe_ms(ttft_ms, tenant=tenant, intent=intent)
+
+
+def observe_degraded(tenant: str, degraded: List[dict], stage: str, reason: str, **detail) -> None:
+    """Append a degraded stage to the request's report and count it."""
+    degraded.append({"stage": stage, "reason": reason, **detail})
+    QUERY_DEGRADED_TOTAL.inc(tenant=tenant, stage=stage, reason=reason)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,96 @@
+"""
+Process-wide registry of vector stores.
+
+Every router resolves its `get_store()` dependency through here, so a
+uvicorn worker opens one PersistentClient per persist dir and loads each
+embedding model once, instead of once per router module.
+"""
+from __future__ import annotations
+import os
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from Vector_setup.base.db_setup_management import MultiTenantChromaStoreManager
+from Vector_setup.embeddings.embedding_service import (
+    embedding_models_status,
+    embedding_executor_stats,
+)
+from Vector_setup.embeddings.embedding_cache import embedding_cache_stats
+from Vector_setup.embeddings.query_cache import query_embedding_cache
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DEFAULT_PERSIST_DIR = "./chromadb_multi_tenant"
+DEFAULT_EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL_NAME", "BAAI/bge-small-en-v1.5")
+
+_stores: Dict[Tuple[str, str], MultiTenantChromaStoreManager] = {}
+_stores_lock = threading.Lock()
+
+
+def _resolve_persist_dir(persist_dir: Optional[str]) -> str:
+    raw_dir = persist_dir or os.getenv("CHROMA_PATH", DEFAULT_PERSIST_DIR)
+    return str(Path(raw_dir).resolve())
+
+
+def get_store_manager(
+    persist_dir: Optional[str] = None,
+    embedding_model_name: Optional[str] = None,
+) -> MultiTenantChromaStoreManager:
+    """
+    Return the shared store for (persist_dir, model_name), creating it on first use.
+    """
+    model_name = embedding_model_name or DEFAULT_EMBEDDING_MODEL
+    key = (_resolve_persist_dir(persist_dir), model_name)
+
+    store = _stores.get(key)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(key)
+            if store is None:
+                store = MultiTenantChromaStoreManager(
+                    persist_dir=key[0],
+                    embedding_model_name=model_name,
+                )
+                _stores[key] = store
+    return store
+
+
+def get_shared_store() -> MultiTenantChromaStoreManager:
+    """FastAPI dependency: the default store for this process."""
+    return get_store_manager()
+
+
+def warmup_default_store() -> None:
+    """
+    Create the default store and load its embedding model.
+    Meant to run off the request path (startup thread) so the first query does not pay for it.
+    """
+    try:
+        store = get_store_manager()
+        store.embedding_service.load()
+        logger.info("Embedding model ready: %s", store.embedding_service.model_name)
+    except Exception:
+        logger.exception("Store warmup failed")
+
+
+def readiness() -> dict:
+    """
+    Readiness hook: ready once at least one store exists and all its models are loaded.
+    """
+    models = embedding_models_status()
+    stores = [
+        {"persist_dir": persist_dir, "model_name": model_name}
+        for (persist_dir, model_name) in _stores.keys()
+    ]
+    ready = bool(stores) and bool(models) and all(models.values())
+    return {
+        "ready": ready,
+        "stores": stores,
+        "models": models,
+        "executors": embedding_executor_stats(),
+        "embedding_cache": embedding_cache_stats(),
+        "query_cache": query_embedding_cache.stats(),
+    }
@@ -0,0 +1,221 @@
+"""
+Move per-collection Chroma data into the single-index-per-tenant layout.
+
+    python -m Vector_setup.base.tenant_index_migration --tenant acme
+    python -m Vector_setup.base.tenant_index_migration --all-tenants --delete-source
+
+Embeddings are copied as stored (no re-embedding). Chunk ids become
+"<collection>::<old id>", matching what add_document writes in tenant_index mode,
+so re-running the migration is idempotent (upsert); the BM25 index is rebuilt
+with the new ids. Missing collection_id / organization_id metadata is backfilled
+from the SQL Collection table, because tenant_index queries are scoped by
+collection_id and organization_id; collections without an organization get
+NO_ORGANIZATION.
+
+Indexes migrated before chunks carried organization_id can be stamped in place:
+
+    python -m Vector_setup.base.tenant_index_migration --all-tenants --backfill-organization-ids
+"""
+from __future__ import annotations
+import argparse
+import logging
+from typing import Dict, List, Optional
+
+from Vector_setup.base.db_setup_management import (
+    MultiTenantChromaStoreManager,
+    NO_ORGANIZATION,
+    TENANT_INDEX_SUFFIX,
+    _clean_metadata,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def _tenant_source_collections(store: MultiTenantChromaStoreManager, tenant_id: str) -> List:
+    prefix = f"{tenant_id}__"
+    return [
+        c for c in store.client.list_collections()
+        if getattr(c, "name", "").startswith(prefix)
+        and not getattr(c, "name", "").endswith(TENANT_INDEX_SUFFIX)
+    ]
+
+
+def migrate_tenant_to_index(
+    store: MultiTenantChromaStoreManager,
+    tenant_id: str,
+    collection_lookup: Optional[Dict[str, dict]] = None,
+    delete_source: bool = False,
+    page_size: int = 500,
+) -> dict:
+    """
+    Copy every "<tenant_id>__<name>" collection into "<tenant_id>__tenant.index".
+
+    collection_lookup: logical name -> {"collection_id": ..., "organization_id": ...}
+    """
+    collection_lookup = collection_lookup or {}
+    index = store.get_tenant_index(tenant_id)
+    prefix = f"{tenant_id}__"
+    report: Dict[str, int] = {}
+
+    for source in _tenant_source_collections(store, tenant_id):
+        logical_name = source.name[len(prefix):]
+        acl_meta = collection_lookup.get(logical_name, {})
+        # Chunk ids change, so the BM25 index is rebuilt alongside the copy
+        lexical = store.lexical_index(tenant_id, logical_name)
+        lexical.clear()
+        copied = 0
+        offset = 0
+
+        while True:
+            page = source.get(
+                include=["documents", "metadatas", "embeddings"],
+                limit=page_size,
+                offset=offset,
+            )
+            ids = page.get("ids") or []
+            if not ids:
+                break
+
+            metadatas = []
+            for meta in page.get("metadatas") or [{}] * len(ids):
+                merged = {
+                    **{k: v for k, v in acl_meta.items() if v is not None},
+                    **(meta or {}),
+                    "tenant_id": tenant_id,
+                    "collection": logical_name,
+                }
+                merged["organization_id"] = merged.get("organization_id") or NO_ORGANIZATION
+                metadatas.append(_clean_metadata(merged))
+
+            new_ids = [f"{logical_name}::{i}" for i in ids]
+            documents = page.get("documents") or [""] * len(ids)
+            index.upsert(
+                ids=new_ids,
+                documents=documents,
+                embeddings=[list(e) for e in page.get("embeddings")],
+                metadatas=metadatas,
+            )
+            lexical.upsert(
+                (cid, meta.get("doc_id"), doc or "")
+                for cid, meta, doc in zip(new_ids, metadatas, documents)
+            )
+            copied += len(ids)
+            offset += len(ids)
+
+        store._register_logical_collection(index, logical_name)
+        report[logical_name] = copied
+        logger.info("Migrated %s -> %s (%d chunks)", source.name, index.name, copied)
+
+        if delete_source:
+            store.client.delete_collection(source.name)
+            logger.info("Deleted source collection %s", source.name)
+
+    if delete_source:
+        store.invalidate_collections(tenant_id)
+
+    return {
+        "tenant_id": tenant_id,
+        "index": index.name,
+        "collections": report,
+        "chunks": sum(report.values()),
+        "deleted_source": delete_source,
+    }
+
+
+def backfill_organization_ids(
+    store: MultiTenantChromaStoreManager,
+    tenant_id: str,
+    collection_lookup: Optional[Dict[str, dict]] = None,
+    page_size: int = 500,
+) -> dict:
+    """
+    Stamp organization_id on tenant index chunks that lack it, from collection_lookup
+    (by logical collection), else NO_ORGANIZATION. Embeddings are left alone.
+    """
+    collection_lookup = collection_lookup or {}
+    index = store.get_tenant_index(tenant_id)
+    updated = 0
+    offset = 0
+
+    while True:
+        page = index.get(include=["metadatas"], limit=page_size, offset=offset)
+        ids = page.get("ids") or []
+        if not ids:
+            break
+        stale_ids, stale_metas = [], []
+        for cid, meta in zip(ids, page.get("metadatas") or [{}] * len(ids)):
+            meta = meta or {}
+            if meta.get("organization_id"):
+                continue
+            acl_meta = collection_lookup.get(meta.get("collection"), {})
+            stale_ids.append(cid)
+            stale_metas.append({
+                **meta,
+                "organization_id": acl_meta.get("organization_id") or NO_ORGANIZATION,
+            })
+        if stale_ids:
+            index.update(ids=stale_ids, metadatas=stale_metas)
+            updated += len(stale_ids)
+        offset += len(ids)
+
+    logger.info("Backfilled organization_id on %d chunks in %s", updated, index.name)
+    return {"tenant_id": tenant_id, "index": index.name, "updated": updated}
+
+
+def _sql_collection_lookup(tenant_id: str) -> Dict[str, dict]:
+    from sqlmodel import Session, select
+    from Vector_setup.user.db import engine, Collection
+
+    with Session(engine) as session:
+        rows = session.exec(select(Collection).where(Collection.tenant_id == tenant_id)).all()
+    return {
+        c.name: {"collection_id": str(c.id), "organization_id": c.organization_id}
+        for c in rows
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--tenant", action="append", help="tenant id (repeatable)")
+    target.add_argument("--all-tenants", action="store_true")
+    parser.add_argument("--persist-dir", default=None)
+    parser.add_argument("--delete-source", action="store_true")
+    parser.add_argument(
+        "--backfill-organization-ids",
+        action="store_true",
+        help="only stamp organization_id on chunks already in the tenant index",
+    )
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    store = MultiTenantChromaStoreManager(persist_dir=args.persist_dir)
+
+    if args.all_tenants:
+        tenants = sorted({t["tenant_id"] for t in store.list_companies()})
+    else:
+        tenants = args.tenant
+
+    for tenant_id in tenants:
+        if args.backfill_organization_ids:
+            print(backfill_organization_ids(
+                store,
+                tenant_id,
+                collection_lookup=_sql_collection_lookup(tenant_id),
+                page_size=args.page_size,
+            ))
+            continue
+        result = migrate_tenant_to_index(
+            store,
+            tenant_id,
+            collection_lookup=_sql_collection_lookup(tenant_id),
+            delete_source=args.delete_source,
+            page_size=args.page_size,
+        )
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,10 +12,11 @@ def save_chat_turn(
     assistant_message: str,
     conversation_id: Optional[str] = None,
     primary_doc_id: Optional[str] = None,
-) -> None:
+) -> Optional[int]:
     """
     Save a sinlge logical turn as two ChatMessage rows
     One 'user' and one 'assistant'. both tagged with the same doc_id.
+    Returns the assistant row id, which identifies the turn.
     """
     msgs = [
         ChatMessage(
@@ -39,6 +40,8 @@ def save_chat_turn(
     for m in msgs:
         db.add(m)
     db.commit() 
+    db.refresh(msgs[1])
+    return msgs[1].id
     
 def get_last_n_turns(
     db: Session,
@@ -0,0 +1,294 @@
+# embedding_cache.py
+"""
+Persistent, content-addressed embedding cache.
+
+Keyed by (model_name, sha256(chunk_text)). One directory per model holds:
+
+- vectors.f16   memory-mapped float16 matrix, one row ("slot") per cached text
+- tags.u64      memory-mapped uint64 per slot: the first 8 bytes of the sha256
+                stored in it (0 while the slot is being written)
+- index.sqlite  sha256 -> slot, with a last_used timestamp for LRU eviction
+
+When all slots are taken, the least recently used ~5% are evicted in one go
+and their slots reused. Re-indexing identical text (a second collection, a
+Drive re-sync, a rebuild) then costs a disk read instead of a model call.
+"""
+from __future__ import annotations
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "true").lower() in ("true", "1", "yes", "y")
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", "./data/embedding_cache")
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "200000"))
+EVICT_FRACTION = 0.05
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _slot_tag(text_hash: str) -> int:
+    return int(text_hash[:16], 16) or 1
+
+
+class EmbeddingCache:
+    """
+    Safe to share between uvicorn workers. Slot allocation and eviction happen
+    inside a SQLite write transaction (BEGIN IMMEDIATE), so two processes never
+    hand out the same slot. A reader may still hold a hash -> slot mapping that
+    another process has since evicted and reused, so every slot carries a tag:
+    writers clear it, write the vector, then set it; readers only accept a
+    vector whose tag matched the hash before and after the copy.
+    """
+
+    def __init__(self, root: str | Path, model_name: str, max_entries: int = EMBED_CACHE_MAX_ENTRIES):
+        self.model_name = model_name
+        self.max_entries = max(1, max_entries)
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.dir = Path(root).resolve() / safe_name
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            str(self.dir / "index.sqlite"),
+            check_same_thread=False,
+            isolation_level=None,  # explicit transactions below
+            timeout=30,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " hash TEXT PRIMARY KEY, slot INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS free_slots (slot INTEGER PRIMARY KEY)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        self._dim: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+        self._tags: Optional[np.memmap] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        dim = self._meta("dim")
+        if dim is not None:
+            self._open_vectors(int(dim))
+
+    # -----------------------
+    # Storage
+    # -----------------------
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value) -> None:
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _open_vectors(self, dim: int) -> None:
+        path = self.dir / "vectors.f16"
+        tags_path = self.dir / "tags.u64"
+        size = self.max_entries * dim * 2
+        tags_size = self.max_entries * 8
+        if (
+            not path.exists() or path.stat().st_size != size
+            or not tags_path.exists() or tags_path.stat().st_size != tags_size
+        ):
+            if path.exists():
+                logger.warning("Embedding cache at %s changed shape; clearing it", self.dir)
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("DELETE FROM free_slots")
+            self._set_meta("next_slot", 0)
+            self._set_meta("dim", dim)
+            for p, n in ((path, size), (tags_path, tags_size)):
+                with open(p, "wb") as f:
+                    f.truncate(n)  # sparse file, pages fill in as slots are used
+            self._db.execute("COMMIT")
+        self._vectors = np.memmap(path, dtype=np.float16, mode="r+", shape=(self.max_entries, dim))
+        self._tags = np.memmap(tags_path, dtype=np.uint64, mode="r+", shape=(self.max_entries,))
+        self._dim = dim
+
+    def _allocate(self, n: int) -> List[int]:
+        """Must run inside a write transaction."""
+        slots: List[int] = []
+        while len(slots) < n:
+            need = n - len(slots)
+            free = [r[0] for r in self._db.execute("SELECT slot FROM free_slots LIMIT ?", (need,))]
+            if free:
+                self._db.executemany("DELETE FROM free_slots WHERE slot = ?", [(x,) for x in free])
+                slots.extend(free)
+                continue
+
+            next_slot = int(self._meta("next_slot") or 0)
+            if next_slot < self.max_entries:
+                take = min(need, self.max_entries - next_slot)
+                slots.extend(range(next_slot, next_slot + take))
+                self._set_meta("next_slot", next_slot + take)
+                continue
+
+            self._evict(max(need, int(self.max_entries * EVICT_FRACTION)))
+        return slots
+
+    def _evict(self, n: int) -> None:
+        rows = self._db.execute(
+            "SELECT hash, slot FROM entries ORDER BY last_used ASC LIMIT ?", (max(1, n),)
+        ).fetchall()
+        self._db.executemany("DELETE FROM entries WHERE hash = ?", [(h,) for h, _ in rows])
+        self._db.executemany("INSERT OR IGNORE INTO free_slots (slot) VALUES (?)", [(slot,) for _, slot in rows])
+        self.evictions += len(rows)
+
+    def _lookup_slots(self, hashes: List[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        for i in range(0, len(hashes), 500):
+            part = hashes[i: i + 500]
+            marks = ",".join("?" * len(part))
+            for h, slot in self._db.execute(
+                f"SELECT hash, slot FROM entries WHERE hash IN ({marks})", part
+            ):
+                found[h] = slot
+        return found
+
+    def _read_slot(self, slot: int, text_hash: str) -> Optional[List[float]]:
+        """The slot's vector if it still holds `text_hash`, else None."""
+        tag = _slot_tag(text_hash)
+        if int(self._tags[slot]) != tag:
+            return None
+        vector = np.array(self._vectors[slot], dtype=np.float32)
+        if int(self._tags[slot]) != tag:
+            return None  # rewritten while we copied it
+        return vector.tolist()
+
+    def _write_slot(self, slot: int, text_hash: str, vector: List[float]) -> None:
+        self._tags[slot] = 0
+        self._vectors[slot] = np.asarray(vector, dtype=np.float16)
+        self._tags[slot] = _slot_tag(text_hash)
+
+    # -----------------------
+    # Public API
+    # -----------------------
+
+    def get_many(self, hashes: Iterable[str]) -> Dict[str, List[float]]:
+        hashes = list(dict.fromkeys(hashes))
+        if not hashes:
+            return {}
+        with self._lock:
+            if self._vectors is None:
+                self.misses += len(hashes)
+                return {}
+
+            # Lookup and copy in one read snapshot; the slot tags catch a slot
+            # another process evicted and reused meanwhile
+            self._db.execute("BEGIN")
+            try:
+                vectors: Dict[str, List[float]] = {}
+                for h, slot in self._lookup_slots(hashes).items():
+                    vector = self._read_slot(slot, h)
+                    if vector is not None:
+                        vectors[h] = vector
+            finally:
+                self._db.execute("COMMIT")
+
+            if vectors:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE entries SET last_used = ? WHERE hash = ?",
+                    [(now, h) for h in vectors],
+                )
+
+            self.hits += len(vectors)
+            self.misses += len(hashes) - len(vectors)
+            return vectors
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+        with self._lock:
+            if self._vectors is None:
+                self._open_vectors(len(next(iter(items.values()))))
+
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                known = self._lookup_slots(list(items))
+                # Indexed but holding another vector (e.g. after a rolled-back put)
+                for h, slot in known.items():
+                    if int(self._tags[slot]) != _slot_tag(h) and len(items[h]) == self._dim:
+                        self._write_slot(slot, h, items[h])
+                fresh = [
+                    (h, v) for h, v in items.items()
+                    if h not in known and len(v) == self._dim
+                ][: self.max_entries]
+                if fresh:
+                    slots = self._allocate(len(fresh))
+                    # Slots are written before COMMIT; a rollback leaves them tagged
+                    # with a hash no committed entry points to, so nobody reads them
+                    for (h, vec), slot in zip(fresh, slots):
+                        self._write_slot(slot, h, vec)
+                    now = time.time()
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO entries (hash, slot, last_used) VALUES (?, ?, ?)",
+                        [(h, slot, now) for (h, _), slot in zip(fresh, slots)],
+                    )
+                self._vectors.flush()
+                self._tags.flush()
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {
+            "model_name": self.model_name,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+# -----------------------
+# Process-wide cache registry
+# -----------------------
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model_name: str) -> Optional[EmbeddingCache]:
+    """Shared cache for `model_name`, or None when disabled or unavailable."""
+    if not EMBED_CACHE_ENABLED:
+        return None
+    cache = _caches.get(model_name)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(model_name)
+            if cache is None:
+                try:
+                    cache = EmbeddingCache(EMBED_CACHE_DIR, model_name)
+                except Exception:
+                    logger.exception("Embedding cache unavailable; continuing without it")
+                    return None
+                _caches[model_name] = cache
+    return cache
+
+
+def embedding_cache_stats() -> Dict[str, dict]:
+    return {name: cache.stats() for name, cache in _caches.items()}
@@ -0,0 +1,242 @@
+# embedding_executor.py
+"""
+Off-event-loop embedding executor.
+
+Concurrent `embed` calls from many requests are queued to a dedicated worker
+thread, which drains the queue into micro-batches (bounded by max_batch_size
+texts or max_wait_ms, whichever comes first) and runs one model.encode per batch.
+The asyncio loop only awaits a future, so SSE streams keep flowing while the
+model works. If a batch fails, its requests are re-encoded one by one, so a bad
+input only fails the caller that sent it.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "64"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+
+
+@dataclass
+class _EmbedJob:
+    texts: List[str]
+    future: asyncio.Future
+    loop: asyncio.AbstractEventLoop
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+def _resolve(future: asyncio.Future, result=None, error: Optional[BaseException] = None) -> None:
+    # Runs on the job's event loop; the caller may have been cancelled meanwhile
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+def _post(job: _EmbedJob, result=None, error: Optional[BaseException] = None) -> None:
+    try:
+        job.loop.call_soon_threadsafe(_resolve, job.future, result, error)
+    except RuntimeError:
+        # Caller's loop is already closed; nobody is waiting for this result
+        pass
+
+
+class EmbeddingBatcher:
+    """
+    Gathers embed requests into dynamic micro-batches on a worker thread.
+
+    `encode_fn` is the blocking model call (list[str] -> list[list[float]]).
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], List[List[float]]],
+        max_batch_size: int = EMBED_MAX_BATCH_SIZE,
+        max_wait_ms: float = EMBED_MAX_WAIT_MS,
+        name: str = "embedding-executor",
+    ):
+        self._encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000.0
+        self._name = name
+
+        self._queue: "queue.Queue[Optional[_EmbedJob]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        # Metrics (pending_texts is shared with callers; the rest is worker-only)
+        self._pending_texts = 0
+        self._pending_lock = threading.Lock()
+        self._batches = 0
+        self._texts = 0
+        self._jobs = 0
+        self._last_batch_size = 0
+        self._max_batch_seen = 0
+        self._total_wait_s = 0.0
+        self._total_encode_s = 0.0
+
+    # -----------------------
+    # Lifecycle
+    # -----------------------
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+
+    def shutdown(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+    # -----------------------
+    # Public API
+    # -----------------------
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        self._ensure_started()
+
+        loop = asyncio.get_running_loop()
+        job = _EmbedJob(texts=list(texts), future=loop.create_future(), loop=loop)
+        with self._pending_lock:
+            self._pending_texts += len(job.texts)
+        self._queue.put(job)
+        return await job.future
+
+    def estimated_wait_s(self) -> float:
+        """Expected wait for a new request: queued micro-batches x average encode time."""
+        pending = self._pending_texts
+        if pending <= 0 or not self._batches:
+            return 0.0
+        batches_ahead = -(-pending // self.max_batch_size)
+        return batches_ahead * (self._total_encode_s / self._batches) + self.max_wait_s
+
+    def stats(self) -> dict:
+        batches = self._batches or 1
+        jobs = self._jobs or 1
+        return {
+            "queue_depth": self._queue.qsize(),
+            "pending_texts": self._pending_texts,
+            "batches": self._batches,
+            "texts": self._texts,
+            "last_batch_size": self._last_batch_size,
+            "max_batch_size_seen": self._max_batch_seen,
+            "avg_batch_size": round(self._texts / batches, 2),
+            "avg_queue_wait_ms": round(1000.0 * self._total_wait_s / jobs, 2),
+            "avg_encode_ms": round(1000.0 * self._total_encode_s / batches, 2),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_s * 1000.0,
+            "est_wait_ms": round(1000.0 * self.estimated_wait_s(), 2),
+        }
+
+    # -----------------------
+    # Worker
+    # -----------------------
+
+    def _collect(self, first: _EmbedJob) -> tuple[List[_EmbedJob], bool]:
+        """Drain the queue into one micro-batch. Returns (jobs, stop_requested)."""
+        jobs = [first]
+        n_texts = len(first.texts)
+        deadline = time.monotonic() + self.max_wait_s
+
+        while n_texts < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                nxt = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if nxt is None:
+                return jobs, True
+            jobs.append(nxt)
+            n_texts += len(nxt.texts)
+
+        return jobs, False
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            jobs, stop = self._collect(first)
+            self._process(jobs)
+            if stop:
+                return
+
+    def _process(self, jobs: List[_EmbedJob]) -> None:
+        now = time.monotonic()
+        with self._pending_lock:
+            self._pending_texts -= sum(len(j.texts) for j in jobs)
+
+        # Requests cancelled while queued do not cost model time
+        live = [j for j in jobs if not j.future.cancelled()]
+        if not live:
+            return
+
+        batch: List[str] = []
+        for j in live:
+            batch.extend(j.texts)
+            self._total_wait_s += now - j.enqueued_at
+        self._jobs += len(live)
+
+        start = time.monotonic()
+        try:
+            vectors = self._encode(batch)
+        except BaseException as e:
+            if len(live) > 1 and isinstance(e, Exception):
+                # One bad request must not fail the others it was batched with
+                logger.warning(
+                    "Embedding batch of %d texts failed, retrying its %d requests one by one: %s",
+                    len(batch), len(live), e,
+                )
+                for j in live:
+                    self._process_alone(j)
+            else:
+                for j in live:
+                    _post(j, None, e)
+            return
+        finally:
+            self._total_encode_s += time.monotonic() - start
+
+        self._batches += 1
+        self._texts += len(batch)
+        self._last_batch_size = len(batch)
+        self._max_batch_seen = max(self._max_batch_seen, len(batch))
+
+        offset = 0
+        for j in live:
+            part = vectors[offset: offset + len(j.texts)]
+            offset += len(j.texts)
+            _post(j, part)
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        vectors = self._encode_fn(texts)
+        if len(vectors) != len(texts):
+            raise RuntimeError(
+                f"Embedding count mismatch: got {len(vectors)} for {len(texts)} texts"
+            )
+        return vectors
+
+    def _process_alone(self, job: _EmbedJob) -> None:
+        try:
+            vectors = self._encode(job.texts)
+        except BaseException as e:
+            _post(job, None, e)
+            return
+        self._batches += 1
+        self._texts += len(job.texts)
+        _post(job, vectors)
@@ -1,20 +1,40 @@
 # embedding_service.py
-from typing import List
+from typing import Dict, List, Optional
 from sentence_transformers import SentenceTransformer
 import logging
+import threading
+
+from Vector_setup.embeddings.embedding_executor import EmbeddingBatcher
 
 logger = logging.getLogger(__name__)
 
 class EmbeddingService:
     def __init__(self, model_name):
         self.model_name = model_name
-        logger.info("Loading embedding model: %s", self.model_name)
-        self._model = SentenceTransformer(self.model_name)
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._executor: Optional[EmbeddingBatcher] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self) -> SentenceTransformer:
+        """
+        Load the SentenceTransformer model once (thread-safe).
+        Called lazily on first embed, or eagerly from a startup warmup.
+        """
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    logger.info("Loading embedding model: %s", self.model_name)
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
 
     def embed_batch(self, texts: List[str]) -> List[List[float]]:
         if not texts:
             return []
-        embeddings = self._model.encode(
+        embeddings = self.load().encode(
             texts,
             batch_size=32,
             show_progress_bar=False,
@@ -30,3 +50,64 @@ class EmbeddingService:
             return []
 
         return embeddings
+
+    @property
+    def executor(self) -> EmbeddingBatcher:
+        if self._executor is None:
+            with self._load_lock:
+                if self._executor is None:
+                    self._executor = EmbeddingBatcher(
+                        encode_fn=self.embed_batch,
+                        name=f"embedding-executor:{self.model_name}",
+                    )
+        return self._executor
+
+    async def embed_batch_async(self, texts: List[str]) -> List[List[float]]:
+        """
+        Same contract as embed_batch, but runs on the micro-batching executor thread
+        so the event loop is never blocked by model.encode. Encoder errors are
+        raised to the caller; requests batched alongside a failing one still succeed.
+        """
+        if not texts:
+            return []
+        try:
+            return await self.executor.embed(texts)
+        except Exception:
+            logger.warning("Async embedding of %d texts failed", len(texts), exc_info=True)
+            raise
+
+    def executor_stats(self) -> dict:
+        return self._executor.stats() if self._executor is not None else {}
+
+
+# -----------------------
+# Process-wide model registry
+# -----------------------
+
+_services: Dict[str, EmbeddingService] = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(model_name: str) -> EmbeddingService:
+    """
+    Return the single EmbeddingService for `model_name` in this process.
+    The model weights are loaded once, however many stores share it.
+    """
+    service = _services.get(model_name)
+    if service is None:
+        with _services_lock:
+            service = _services.get(model_name)
+            if service is None:
+                service = EmbeddingService(model_name=model_name)
+                _services[model_name] = service
+    return service
+
+
+def embedding_models_status() -> Dict[str, bool]:
+    """model_name -> loaded? for every registered model."""
+    return {name: svc.is_loaded for name, svc in _services.items()}
+
+
+def embedding_executor_stats() -> Dict[str, dict]:
+    """model_name -> executor queue/batch metrics."""
+    return {name: svc.executor_stats() for name, svc in _services.items()}
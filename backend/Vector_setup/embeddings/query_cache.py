@@ -0,0 +1,81 @@
+# query_cache.py
+"""
+Bounded in-memory LRU for query embeddings.
+
+Keyed by (model_name, tenant_id, folded query). Callers normalize the question first
+(e.g. normalize_query in the LLM pipeline); fold_query_key then folds case and
+whitespace so "What is the  leave policy" and "what is the leave policy" share
+one entry. Tenants never share entries, so a hit cannot reveal that another
+tenant asked the same question. Entries expire after a TTL so a model swap or
+re-deploy never serves stale vectors for long.
+"""
+from __future__ import annotations
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "5000"))
+QUERY_CACHE_TTL_S = float(os.getenv("QUERY_CACHE_TTL_S", "3600"))
+
+
+def fold_query_key(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_entries: int = QUERY_CACHE_MAX_ENTRIES, ttl_s: float = QUERY_CACHE_TTL_S):
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def get(self, model_name: str, query: str, tenant_id: str = "") -> Optional[List[float]]:
+        key = (model_name, tenant_id, fold_query_key(query))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, vector = entry
+            if self.ttl_s > 0 and now - stored_at > self.ttl_s:
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, model_name: str, query: str, vector: List[float], tenant_id: str = "") -> None:
+        key = (model_name, tenant_id, fold_query_key(query))
+        with self._lock:
+            self._entries[key] = (time.monotonic(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Process-wide instance
+query_embedding_cache = QueryEmbeddingCache()
@@ -0,0 +1,128 @@
+"""
+Benchmark: per_collection vs tenant_index storage modes.
+
+Builds one tenant with many small collections filled with random vectors,
+then measures query_policies latency across all of them and the peak RSS
+of the process. Each mode runs in its own subprocess so RSS is comparable.
+
+    python -m Vector_setup.test.bench_storage_modes --collections 50 --chunks 40
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from Vector_setup.base.db_setup_management import (
+    MultiTenantChromaStoreManager,
+    CollectionCreateRequest,
+)
+
+DIM = 384  # bge-small-en-v1.5
+TENANT = "bench"
+
+
+def _vec(rng: random.Random) -> list:
+    return [rng.uniform(-1.0, 1.0) for _ in range(DIM)]
+
+
+def _build(store: MultiTenantChromaStoreManager, n_collections: int, n_chunks: int) -> list:
+    rng = random.Random(42)
+    names = [f"col{i}" for i in range(n_collections)]
+    for c_idx, name in enumerate(names):
+        store.create_collection(CollectionCreateRequest(tenant_id=TENANT, collection_name=name))
+        target = store.get_collection(TENANT, name)
+        writer = getattr(target, "_index", target)
+        writer.add(
+            ids=[store._chunk_id(name, f"doc{c_idx}", i) for i in range(n_chunks)],
+            documents=[f"{name} chunk {i}" for i in range(n_chunks)],
+            embeddings=[_vec(rng) for _ in range(n_chunks)],
+            metadatas=[
+                {"tenant_id": TENANT, "collection": name, "collection_id": name, "chunk_index": i}
+                for i in range(n_chunks)
+            ],
+        )
+    return names
+
+
+def run_mode(mode: str, n_collections: int, n_chunks: int, n_queries: int, top_k: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        store = MultiTenantChromaStoreManager(persist_dir=tmp, storage_mode=mode)
+        rng = random.Random(7)
+
+        async def fake_embed(texts):
+            return [_vec(rng) for _ in texts]
+
+        # Benchmark storage, not the model
+        store._get_embeddings_batch = fake_embed
+
+        t0 = time.perf_counter()
+        names = _build(store, n_collections, n_chunks)
+        build_s = time.perf_counter() - t0
+
+        async def bench() -> list:
+            latencies = []
+            for _ in range(n_queries):
+                start = time.perf_counter()
+                await store.query_policies(
+                    tenant_id=TENANT,
+                    collection_name=None,
+                    collection_names=names,
+                    collection_ids=names,
+                    query="q",
+                    top_k=top_k,
+                )
+                latencies.append((time.perf_counter() - start) * 1000.0)
+            return latencies
+
+        latencies = asyncio.run(bench())
+        latencies.sort()
+
+    return {
+        "mode": mode,
+        "collections": n_collections,
+        "chunks_per_collection": n_chunks,
+        "build_s": round(build_s, 2),
+        "query_p50_ms": round(statistics.median(latencies), 2),
+        "query_p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--collections", type=int, default=50)
+    parser.add_argument("--chunks", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=100)
+    parser.add_argument("--mode", default=None, help="internal: run a single mode")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.collections, args.chunks, args.queries, args.top_k)))
+        return
+
+    for mode in ("per_collection", "tenant_index"):
+        out = subprocess.run(
+            [
+                sys.executable, "-m", "Vector_setup.test.bench_storage_modes",
+                "--mode", mode,
+                "--collections", str(args.collections),
+                "--chunks", str(args.chunks),
+                "--queries", str(args.queries),
+                "--top-k", str(args.top_k),
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        print(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import asyncio
+
+from LLM_Config.admission import AdmissionController
+from LLM_Config.llm_scheduler import LLMScheduler, PRIORITY_INTERACTIVE
+from LLM_Config.llm_streams import StreamTracker
+
+
+async def _controller(in_flight, queued=0, hold_s=4.0):
+    """A controller over a capacity-2 scheduler with `in_flight` slots taken and `queued` waiters."""
+    scheduler = LLMScheduler(capacity=2, tenant_cap=2)
+    scheduler.avg_hold_s = hold_s
+    for _ in range(in_flight):
+        await scheduler.acquire("t", PRIORITY_INTERACTIVE)
+    for _ in range(queued):
+        asyncio.create_task(scheduler.acquire("t", PRIORITY_INTERACTIVE))
+    await asyncio.sleep(0)
+    return AdmissionController(scheduler, StreamTracker(), reject_wait_s=8.0, degrade=True, enabled=True)
+
+
+def test_idle_admits_and_load_degrades_stepwise():
+    async def scenario():
+        idle = (await _controller(in_flight=0)).decide()
+        assert idle.admitted and not idle.degrade.active
+
+        # Full, one waiter: one round of hold time -> 4s = 50% of the threshold
+        busy = (await _controller(in_flight=2, queued=1)).decide()
+        assert busy.admitted and busy.est_wait_s == 4.0
+        assert busy.degrade.active == ["skip_chart", "skip_formatter"]
+
+        # Embedding backlog adds to the LLM estimate
+        heavier = (await _controller(in_flight=2, queued=1)).decide(embed_wait_s=2.5)
+        assert heavier.degrade.skip_rerank
+
+    asyncio.run(scenario())
+
+
+def test_rejects_past_threshold_and_tickets_release_once():
+    async def scenario():
+        # Three waiters over two busy slots: two rounds of hold time -> 8s
+        controller = await _controller(in_flight=2, queued=3)
+        ticket = controller.admit()
+        assert not ticket.decision.admitted
+        assert ticket.decision.retry_after_s == 8
+        assert controller.active == 0
+
+        ok = await _controller(in_flight=0)
+        ticket = ok.admit()
+        assert ok.active == 1
+        ticket.release()
+        ticket.release()
+        assert ok.active == 0
+
+    asyncio.run(scenario())
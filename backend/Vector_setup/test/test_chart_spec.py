@@ -0,0 +1,54 @@
+from LLM_Config.chart_spec import build_chart_specs, parse_number
+
+REQUIRED_KEYS = {"chart_type", "title", "x_field", "x_label", "y_fields", "y_label", "data"}
+
+
+def test_time_table_becomes_line_chart_with_percent_split_out():
+    answer = (
+        "Revenue grew in Q1.\n\n"
+        "## Monthly results 2022\n\n"
+        "| Date | Revenue | Margin | Net Profit |\n"
+        "|---|---|---|---|\n"
+        "| 2022-01-01 | 95,795 | -16% | (15,735) |\n"
+        "| 2022-03-01 | 134,886 | 14.2% | 19,103 |\n"
+        "| **Total** | 230,681 | 1% | 3,368 |\n"
+    )
+
+    money, percent = build_chart_specs(answer)
+
+    assert REQUIRED_KEYS <= money.keys() and REQUIRED_KEYS <= percent.keys()
+    assert money["chart_type"] == "line"
+    assert money["title"] == "Monthly results 2022"
+    assert money["y_fields"] == ["revenue", "net_profit"]
+    assert money["data"] == [
+        {"date": "2022-01-01", "revenue": 95795, "net_profit": -15735},
+        {"date": "2022-03-01", "revenue": 134886, "net_profit": 19103},
+    ]
+    assert percent["y_fields"] == ["margin"]
+
+
+def test_category_table_becomes_bar_chart_and_prose_gives_nothing():
+    answer = "| Department | Headcount |\n|---|---|\n| HR | 12 |\n| Finance | 30 |"
+
+    (spec,) = build_chart_specs(answer)
+
+    assert spec["chart_type"] == "bar"
+    assert spec["x_field"] == "department"
+    assert spec["title"] == "Headcount by Department"
+    assert build_chart_specs("No numbers here, just a sentence.") == []
+    assert [parse_number(v) for v in ["$1.2M", "12%", "n/a"]] == [1200000.0, 12, None]
+
+
+def test_colliding_column_names_get_unique_fields():
+    answer = (
+        "| Region | Revenue ($) | Revenue (₦) | region |\n"
+        "|---|---|---|---|\n"
+        "| North | 120 | 190,000 | 3 |\n"
+        "| South | 80 | 125,000 | 4 |\n"
+    )
+
+    (spec,) = build_chart_specs(answer)
+
+    assert spec["x_field"] == "region"
+    assert spec["y_fields"] == ["revenue", "revenue_2", "region_2"]
+    assert spec["data"][0] == {"region": "North", "revenue": 120, "revenue_2": 190000, "region_2": 3}
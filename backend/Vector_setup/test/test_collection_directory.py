@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+from Vector_setup.base.collection_directory import CollectionDirectory
+
+
+def _handles(*names):
+    return [SimpleNamespace(name=n) for n in names]
+
+
+def test_load_indexes_handles_by_tenant():
+    directory = CollectionDirectory()
+    directory.load(_handles("acme__hr", "acme__finance", "globex__hr", "orphan"))
+
+    assert sorted(directory.names("acme")) == ["finance", "hr"]
+    assert directory.get("globex", "hr").name == "globex__hr"
+    assert directory.get("acme", "missing") is None
+    assert sorted(directory.tenants()) == ["acme", "globex"]
+
+
+def test_invalidate_forces_a_rescan_on_next_use():
+    catalog = _handles("acme__hr")
+    scans = []
+
+    def list_fn():
+        scans.append(1)
+        return list(catalog)
+
+    directory = CollectionDirectory()
+    directory.ensure_loaded(list_fn)
+    directory.ensure_loaded(list_fn)
+    assert len(scans) == 1
+
+    # Another worker created a collection behind our back
+    catalog += _handles("acme__ops", "globex__hr")
+    directory.invalidate("acme")
+    assert directory.names("acme") == [] and not directory.loaded
+
+    directory.ensure_loaded(list_fn)
+    assert len(scans) == 2
+    assert sorted(directory.names("acme")) == ["hr", "ops"]
+    assert directory.names("globex") == ["hr"]
+
+
+def test_put_and_remove_keep_listings_current():
+    directory = CollectionDirectory()
+    directory.load([])
+    directory.put("acme", "hr", SimpleNamespace(name="acme__hr"))
+    assert directory.names("acme") == ["hr"]
+
+    directory.remove("acme", "hr")
+    assert directory.names("acme") == [] and directory.tenants() == []
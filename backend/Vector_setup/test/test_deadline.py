@@ -0,0 +1,34 @@
+import time
+
+from LLM_Config.deadline import MIN_ANSWER_TOKENS, Deadline, _parse_intent_deadlines
+from LLM_Config.llm_streams import StreamTracker
+
+
+def test_rerank_is_skipped_once_retrieval_has_eaten_the_budget():
+    fresh = Deadline(10.0)
+    assert fresh.rerank_budget_s() == 10.0 * 0.15
+
+    # 5.9s gone: barely more than generation's reserve (40%) is left
+    late = Deadline(10.0, started_at=time.perf_counter() - 5.9)
+    assert late.rerank_budget_s() is None
+    assert not late.expired
+    assert Deadline(10.0, started_at=time.perf_counter() - 11).expired
+
+
+def test_max_tokens_follows_recent_decode_rate():
+    tracker = StreamTracker()
+    deadline = Deadline(10.0)
+    # No stream stats yet: the limit stands
+    assert deadline.max_tokens(4096, tracker=tracker) == 4096
+
+    tracker.ewma_ttft_s, tracker.ewma_tokens_per_s = 1.0, 100.0
+    capped = deadline.max_tokens(4096, tracker=tracker)
+    assert 800 <= capped <= 900  # ~9s of decode at 100 tokens/s
+    late = Deadline(10.0, started_at=time.perf_counter() - 9.9)
+    assert late.max_tokens(4096, tracker=tracker) == MIN_ANSWER_TOKENS
+    # The floor never lifts a smaller limit, and a fast decode leaves the limit alone
+    assert late.max_tokens(100, tracker=tracker) == 100
+    tracker.ewma_tokens_per_s = 10000.0
+    assert deadline.max_tokens(4096, tracker=tracker) == 4096
+
+    assert _parse_intent_deadlines("lookup:12, bad, EXPORT_TABLE:x") == {"LOOKUP": 12.0}
@@ -0,0 +1,60 @@
+from Vector_setup.embeddings.embedding_cache import EmbeddingCache, text_sha256
+
+
+def _vec(x: float, dim: int = 4) -> list:
+    return [x] * dim
+
+
+def test_hits_misses_and_stats(tmp_path):
+    cache = EmbeddingCache(tmp_path, "model/a", max_entries=8)
+    a, b = text_sha256("a"), text_sha256("b")
+
+    assert cache.get_many([a]) == {}
+    cache.put_many({a: _vec(0.5)})
+
+    assert cache.get_many([a, b]) == {a: _vec(0.5)}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+
+
+def test_lru_eviction_reuses_slots(tmp_path):
+    cache = EmbeddingCache(tmp_path, "m", max_entries=3)
+    hashes = [text_sha256(str(i)) for i in range(4)]
+    for i, h in enumerate(hashes[:3]):
+        cache.put_many({h: _vec(float(i))})
+    cache.get_many([hashes[0]])  # 1 is now the least recently used
+
+    cache.put_many({hashes[3]: _vec(3.0)})
+
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["entries"] == 3
+    assert cache.get_many(hashes) == {
+        hashes[0]: _vec(0.0), hashes[2]: _vec(2.0), hashes[3]: _vec(3.0),
+    }
+
+
+def test_slot_reused_by_another_worker_is_a_miss(tmp_path):
+    reader = EmbeddingCache(tmp_path, "m", max_entries=1)
+    writer = EmbeddingCache(tmp_path, "m", max_entries=1)
+    old, new = text_sha256("old"), text_sha256("new")
+    reader.put_many({old: _vec(1.0)})
+    stale = reader._lookup_slots([old])
+
+    # Another worker evicts `old` and writes `new` into the same slot
+    writer.put_many({new: _vec(2.0)})
+    reader._lookup_slots = lambda hashes: stale  # mapping read before the eviction
+
+    assert reader.get_many([old]) == {}
+    assert writer.get_many([new]) == {new: _vec(2.0)}
+
+
+def test_vectors_of_another_dimension_are_not_stored(tmp_path):
+    cache = EmbeddingCache(tmp_path, "m", max_entries=4)
+    a, b = text_sha256("a"), text_sha256("b")
+    cache.put_many({a: _vec(1.0, dim=4)})
+
+    cache.put_many({b: _vec(1.0, dim=3)})
+
+    assert cache.get_many([b]) == {}
+    # A reopened cache keeps the original dimension and entries
+    assert EmbeddingCache(tmp_path, "m", max_entries=4).get_many([a]) == {a: _vec(1.0)}
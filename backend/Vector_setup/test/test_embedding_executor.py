@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+from Vector_setup.embeddings.embedding_executor import EmbeddingBatcher
+
+
+def _fake_encoder(calls: list):
+    def encode(texts):
+        calls.append(len(texts))
+        time.sleep(0.01)
+        return [[float(len(t))] for t in texts]
+    return encode
+
+
+def test_concurrent_calls_are_micro_batched_and_split_back():
+    calls: list = []
+    batcher = EmbeddingBatcher(_fake_encoder(calls), max_batch_size=16, max_wait_ms=5)
+
+    async def run():
+        return await asyncio.gather(
+            *[batcher.embed(["x" * i, "y"]) for i in range(20)]
+        )
+
+    results = asyncio.run(run())
+
+    for i, vectors in enumerate(results):
+        assert vectors == [[float(i)], [1.0]]
+    assert sum(calls) == 40
+    assert len(calls) < 20
+    stats = batcher.stats()
+    assert stats["texts"] == 40
+    assert stats["queue_depth"] == 0
+    assert stats["max_batch_size_seen"] <= 16 + 1
+    batcher.shutdown()
+
+
+def test_encoder_failure_propagates_to_callers():
+    def broken(texts):
+        raise ValueError("boom")
+
+    batcher = EmbeddingBatcher(broken, max_batch_size=4, max_wait_ms=1)
+
+    async def run():
+        try:
+            await batcher.embed(["a"])
+        except ValueError as e:
+            return str(e)
+        return None
+
+    assert asyncio.run(run()) == "boom"
+    batcher.shutdown()
+
+
+def test_failing_request_does_not_fail_its_batch_mates():
+    def encode(texts):
+        if "bad" in texts:
+            raise ValueError("bad input")
+        return [[float(len(t))] for t in texts]
+
+    batcher = EmbeddingBatcher(encode, max_batch_size=16, max_wait_ms=20)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.embed(["a"]), batcher.embed(["bad"]), batcher.embed(["ccc"]),
+            return_exceptions=True,
+        )
+
+    ok_a, failed, ok_c = asyncio.run(run())
+
+    assert ok_a == [[1.0]] and ok_c == [[3.0]]
+    assert isinstance(failed, ValueError)
+    batcher.shutdown()
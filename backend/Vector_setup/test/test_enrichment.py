@@ -0,0 +1,58 @@
+import asyncio
+
+from LLM_Config.enrichment import EnrichmentRegistry, generate_chart_specs
+
+
+def test_enrichments_run_in_background_and_are_scoped_to_their_owner():
+    async def scenario():
+        registry = EnrichmentRegistry(ttl_s=60, max_entries=10)
+        release = asyncio.Event()
+
+        async def charts():
+            await release.wait()
+            return [{"chart_type": "bar"}]
+
+        async def suggestions():
+            raise RuntimeError("upstream down")
+
+        job = registry.schedule("42", "t1", "a@x.io", "c1", {"charts": charts, "suggestions": suggestions})
+        assert job.as_dict()["status"] == "pending"
+
+        assert registry.get("42", "t1", "someone-else@x.io") is None
+        assert registry.get("42", "t2", "a@x.io") is None
+
+        pending = await registry.wait(registry.get("42", "t1", "a@x.io"), timeout=0.05)
+        assert pending.as_dict()["pending"] == ["charts"]
+
+        release.set()
+        done = (await registry.wait(job, timeout=1)).as_dict()
+        assert done["status"] == "done"
+        assert done["charts"] == [{"chart_type": "bar"}]
+        assert done["suggestions"] == [] and done["errors"] == {"suggestions": "failed"}
+
+    asyncio.run(scenario())
+
+
+def test_registry_evicts_oldest_over_capacity():
+    async def scenario():
+        registry = EnrichmentRegistry(ttl_s=60, max_entries=2)
+        for turn in ["1", "2", "3"]:
+            registry.schedule(turn, "t1", "u", None, {})
+        assert registry.get("1", "t1", "u") is None
+        assert registry.get("3", "t1", "u").as_dict()["status"] == "done"
+
+    asyncio.run(scenario())
+
+
+def test_skipped_llm_chart_is_degraded_only_without_a_table_chart():
+    table_answer = "| Region | Sales |\n|---|---|\n| North | 120 |\n| South | 80 |\n"
+
+    async def scenario():
+        degraded: list = []
+        specs = await generate_chart_specs("sales by region", table_answer, "t1", "load", degraded)
+        assert specs and degraded == []
+
+        specs = await generate_chart_specs("sales by region", "North sold more.", "t1", "deadline", degraded)
+        assert specs == [] and degraded == [{"stage": "chart", "reason": "deadline"}]
+
+    asyncio.run(scenario())
@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import time
+
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("sentence_transformers")
+
+from Vector_setup.base import db_setup_management
+from Vector_setup.base.db_setup_management import MultiTenantChromaStoreManager
+
+
+def _vector(text: str) -> list:
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [b / 255.0 for b in digest[:8]]
+
+
+class FakeEmbeddingService:
+    model_name = "fake"
+
+    def __init__(self):
+        self.embedded: list = []
+
+    async def embed_batch_async(self, texts):
+        self.embedded.extend(texts)
+        return [_vector(t) for t in texts]
+
+
+def _paragraph_chunks(text, max_tokens=512, overlap_tokens=64):
+    # One chunk per paragraph, so a leading insert shifts every chunk by one index
+    offset = 0
+    for para in text.split("\n\n"):
+        yield para, (offset, offset + len(para))
+        offset += len(para)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv("LEXICAL_INDEX_DIR", str(tmp_path / "lexical"))
+    monkeypatch.setattr(db_setup_management, "get_embedding_cache", lambda model_name: None)
+    store = MultiTenantChromaStoreManager(persist_dir=str(tmp_path / "chroma"))
+    store._embedding_service = FakeEmbeddingService()
+    return store
+
+
+def _stored(store, tenant_id, collection_name):
+    got = store.get_collection(tenant_id, collection_name).get(
+        include=["documents", "embeddings", "metadatas"]
+    )
+    return {
+        meta["chunk_index"]: (doc, list(emb))
+        for doc, emb, meta in zip(got["documents"], got["embeddings"], got["metadatas"])
+    }
+
+
+def _ingest(store, text, **kwargs):
+    return asyncio.run(store.add_document("t1", "docs", "doc-1", text, **kwargs))
+
+
+def _delay(coro_fn, seconds):
+    async def delayed(*args, **kwargs):
+        await asyncio.sleep(seconds)
+        return await coro_fn(*args, **kwargs)
+    return delayed
+
+
+def test_reingest_shifted_multi_batch_document_keeps_vectors_aligned(store, monkeypatch):
+    monkeypatch.setattr(db_setup_management, "INGEST_BATCH_SIZE", 2)
+    monkeypatch.setattr(store, "iter_chunks", _paragraph_chunks)
+    # Slow embeds let each earlier batch's write land first
+    monkeypatch.setattr(store, "_embed_chunk_batch", _delay(store._embed_chunk_batch, 0.05))
+    paragraphs = [f"paragraph {i}" for i in range(7)]
+
+    assert _ingest(store, "\n\n".join(paragraphs))["status"] == "ok"
+    # New section at the start: every old chunk id now holds its predecessor's text
+    result = _ingest(store, "\n\n".join(["new section"] + paragraphs))
+
+    assert result["status"] == "ok"
+    stored = _stored(store, "t1", "docs")
+    assert [stored[i][0] for i in range(8)] == ["new section"] + paragraphs
+    for doc, emb in stored.values():
+        assert emb == pytest.approx(_vector(doc))
+
+
+def test_reingest_reuses_vectors_from_ids_not_yet_rewritten(store, monkeypatch):
+    monkeypatch.setattr(db_setup_management, "INGEST_BATCH_SIZE", 2)
+    monkeypatch.setattr(store, "iter_chunks", _paragraph_chunks)
+    paragraphs = [f"paragraph {i}" for i in range(7)]
+    _ingest(store, "\n\n".join(paragraphs))
+
+    # Dropping the first section moves each text to an id this ingest has not written yet
+    result = _ingest(store, "\n\n".join(paragraphs[1:]))
+
+    assert result["diff"] == {"added": 0, "updated": 6, "unchanged": 0, "removed": 1, "embedded": 0}
+    stored = _stored(store, "t1", "docs")
+    assert [stored[i][0] for i in range(6)] == paragraphs[1:]
+    for doc, emb in stored.values():
+        assert emb == pytest.approx(_vector(doc))
+
+
+def test_pipelined_reingest_with_slow_writes_keeps_vectors_aligned(store, monkeypatch):
+    monkeypatch.setattr(db_setup_management, "INGEST_BATCH_SIZE", 2)
+    monkeypatch.setattr(store, "iter_chunks", _paragraph_chunks)
+    paragraphs = [f"paragraph {i}" for i in range(9)]
+    _ingest(store, "\n\n".join(paragraphs))
+    write = store._write_chunk_batch
+
+    def slow_write(*args, **kwargs):
+        time.sleep(0.05)
+        return write(*args, **kwargs)
+
+    # Later batches embed while earlier ones are still writing
+    monkeypatch.setattr(store, "_write_chunk_batch", slow_write)
+    result = _ingest(store, "\n\n".join(["new section", "another"] + paragraphs[3:] + paragraphs[:3]))
+
+    assert result["status"] == "ok"
+    for doc, emb in _stored(store, "t1", "docs").values():
+        assert emb == pytest.approx(_vector(doc))
+
+
+def test_add_document_writes_in_batches(store, monkeypatch):
+    monkeypatch.setattr(db_setup_management, "INGEST_BATCH_SIZE", 3)
+    monkeypatch.setattr(store, "iter_chunks", _paragraph_chunks)
+    updates: list = []
+
+    result = _ingest(store, "\n\n".join(f"paragraph {i}" for i in range(7)), progress=updates.append)
+
+    assert result["chunks_indexed"] == 7
+    assert [u["chunks_written"] for u in updates] == [3, 6, 7]
+    assert result["pipeline"]["stages"]["write"]["batches"] == 3
+    # Nothing changed: the second run embeds and rewrites nothing
+    again = _ingest(store, "\n\n".join(f"paragraph {i}" for i in range(7)))
+    assert again["diff"]["unchanged"] == 7
+    assert again["diff"]["embedded"] == 0
+
+
+def test_iter_chunks_spans_overlap_and_cover_the_text(store):
+    text = "\n".join(f"word{i}" for i in range(2000))
+    tokens = store._encoding.encode(text)
+
+    chunks = list(store.iter_chunks(text, max_tokens=100, overlap_tokens=20))
+
+    spans = [span for _chunk, span in chunks]
+    assert spans[0][0] == 0
+    assert spans[-1][1] == len(tokens)
+    for (start, end), (next_start, _next_end) in zip(spans, spans[1:]):
+        assert end - start == 100
+        assert next_start == start + 80
+    for chunk, (start, end) in chunks:
+        assert chunk == store._encoding.decode(tokens[start:end])
+
+
+def test_iter_chunks_accepts_pieces_and_skips_empty_text(store):
+    lines = [f"line {i} of the document\n" for i in range(500)] + ["last line"]
+
+    assert list(store.iter_chunks("".join(lines), 64, 8)) == list(store.iter_chunks(iter(lines), 64, 8))
+    assert list(store.iter_chunks("   \n ")) == []
+    assert list(store.iter_chunks("short text")) == [("short text", (0, len(store._encoding.encode("short text"))))]
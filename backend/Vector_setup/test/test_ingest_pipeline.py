@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pytest
+
+from Vector_setup.base.ingest_pipeline import IngestError, run_pipeline
+
+
+def _batches(n: int, delay: float):
+    for i in range(n):
+        time.sleep(delay)
+        yield [i] * 4
+
+
+def test_stages_overlap_and_preserve_order():
+    seen: list = []
+
+    async def embed(batch):
+        await asyncio.sleep(0.05)
+        return batch
+
+    async def write(batch):
+        await asyncio.to_thread(time.sleep, 0.05)
+        return batch
+
+    async def run():
+        return await run_pipeline(
+            _batches(6, 0.05),
+            [("embed", embed), ("write", write)],
+            on_output=lambda b: seen.append(b[0]),
+        )
+
+    result = asyncio.run(run())
+
+    assert seen == list(range(6))
+    stages = result["stages"]
+    assert [stages[s]["chunks"] for s in ("chunk", "embed", "write")] == [24, 24, 24]
+    # Sequential would be 6 * 3 * 50ms = 0.9s; pipelined is ~ (6 + 2) * 50ms
+    assert result["wall_s"] < 0.7
+
+
+def test_stage_error_aborts_pipeline():
+    async def embed(batch):
+        if batch[0] == 2:
+            raise IngestError("embedding failed")
+        return batch
+
+    written: list = []
+
+    async def write(batch):
+        written.append(batch[0])
+        return batch
+
+    async def run():
+        await run_pipeline(_batches(50, 0), [("embed", embed), ("write", write)])
+
+    with pytest.raises(IngestError):
+        asyncio.run(run())
+    assert 2 not in written
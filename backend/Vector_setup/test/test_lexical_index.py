@@ -0,0 +1,37 @@
+from Vector_setup.base.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def test_compound_codes_are_indexed_whole_and_by_part():
+    assert tokenize("Invoice INV-2023-0042 for the HR/pol.7 audit") == [
+        "invoice", "inv-2023-0042", "inv", "2023", "0042", "hr/pol.7", "hr", "pol", "7", "audit",
+    ]
+
+
+def test_bm25_ranks_exact_tokens_and_tracks_updates(tmp_path):
+    index = BM25Index(tmp_path / "c.bm25.sqlite")
+    index.upsert([
+        ("a", "d1", "Invoice INV-2023-0042 was paid in March 2023"),
+        ("b", "d1", "Travel policy: economy class for flights under six hours"),
+        ("c", "d2", "Invoices are approved by finance within March"),
+    ])
+
+    assert [cid for cid, _ in index.search("INV-2023-0042", 5)] == ["a"]
+    assert [cid for cid, _ in index.search("march 2023 invoice", 5)][0] == "a"
+
+    index.upsert([("a", "d1", "Superseded")])
+    index.delete(["c"])
+    assert index.search("invoice", 5) == []
+    assert len(index) == 2
+    assert index.missing(["a", "c"]) == ["c"]
+
+
+def test_rrf_rewards_hits_found_by_both_retrievers():
+    vector = [{"id": "x", "collection": "t__c", "distance": 0.1},
+              {"id": "y", "collection": "t__c", "distance": 0.2}]
+    lexical = [{"id": "y", "collection": "t__c", "distance": None, "bm25_score": 4.0},
+               {"id": "z", "collection": "t__c", "distance": None, "bm25_score": 1.0}]
+
+    fused = reciprocal_rank_fusion([vector, lexical], top_k=3)
+
+    assert [h["id"] for h in fused] == ["y", "x", "z"]
+    assert fused[0]["distance"] == 0.2 and fused[0]["bm25_score"] == 4.0
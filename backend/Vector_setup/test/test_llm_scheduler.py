@@ -0,0 +1,63 @@
+import asyncio
+
+from LLM_Config.llm_scheduler import LLMScheduler, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+
+
+async def _run(scheduler, calls):
+    """Start calls in order while the scheduler is full; return the grant order."""
+    order = []
+    gate = asyncio.Event()
+
+    async def one(label, tenant, priority):
+        async with scheduler.slot(tenant, priority):
+            order.append(label)
+            await gate.wait()
+
+    blocker = asyncio.create_task(one("blocker", "x", PRIORITY_INTERACTIVE))
+    await asyncio.sleep(0)
+    tasks = [asyncio.create_task(one(*c)) for c in calls]
+    await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(blocker, *tasks)
+    return order[1:]
+
+
+def test_busy_tenant_does_not_starve_others_and_caps_apply():
+    async def scenario():
+        scheduler = LLMScheduler(capacity=1, tenant_cap=1)
+        calls = [(f"a{i}", "bulk", PRIORITY_INTERACTIVE) for i in range(4)]
+        calls += [("b0", "small", PRIORITY_INTERACTIVE)]
+        order = await _run(scheduler, calls)
+        # b0 arrived last but is served right after the bulk tenant's first call
+        assert order.index("b0") <= 1
+        assert scheduler.snapshot()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_interactive_goes_ahead_of_background_without_starving_it():
+    async def scenario():
+        scheduler = LLMScheduler(capacity=1, tenant_cap=1)
+        calls = [(f"bg{i}", "t", PRIORITY_BACKGROUND) for i in range(2)]
+        calls += [(f"ia{i}", "t", PRIORITY_INTERACTIVE) for i in range(12)]
+        order = await _run(scheduler, calls)
+        assert order[0] == "bg0"        # tags start equal; FIFO on ties
+        assert order.index("bg1") < len(order) - 1
+        assert order.index("ia0") < order.index("bg1")
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_no_slot_behind():
+    async def scenario():
+        scheduler = LLMScheduler(capacity=1, tenant_cap=1)
+        await scheduler.acquire("t", PRIORITY_INTERACTIVE)
+        waiter = asyncio.create_task(scheduler.acquire("t", PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        scheduler.release("t", PRIORITY_INTERACTIVE)
+        assert scheduler.snapshot()["in_flight"] == 0
+        assert scheduler.snapshot()["queued"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,135 @@
+import asyncio
+import gc
+import logging
+from types import SimpleNamespace
+
+from LLM_Config.llm_scheduler import LLMScheduler, PRIORITY_BACKGROUND
+from LLM_Config.llm_streams import STREAM_TOKENS_TOTAL, StreamTracker, TrackedStream, open_tracked_stream
+
+
+class FakeUpstream:
+    def __init__(self, tokens):
+        self.tokens = list(tokens)
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.tokens or self.closed:
+            raise StopAsyncIteration
+        await asyncio.sleep(0)
+        text = self.tokens.pop(0)
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+    async def close(self):
+        self.closed = True
+
+
+def test_slot_is_held_for_the_whole_stream_and_freed_on_early_close():
+    async def scenario():
+        scheduler = LLMScheduler(capacity=1, tenant_cap=1)
+        tracker = StreamTracker()
+        first_upstream = FakeUpstream(["a", "b", "c"])
+
+        async def create_first():
+            return first_upstream
+
+        async def read_second():
+            async with open_tracked_stream(lambda: asyncio.sleep(0, FakeUpstream(["x"])), "t2",
+                                           scheduler=scheduler, tracker=tracker) as other:
+                return [c.choices[0].delta.content async for c in other]
+
+        async with open_tracked_stream(create_first, "t1", scheduler=scheduler, tracker=tracker) as stream:
+            second = asyncio.create_task(read_second())
+            async for chunk in stream:
+                await asyncio.sleep(0)
+                # Still reading the first stream: the second cannot start
+                assert not second.done()
+                break  # consumer stops early (e.g. client disconnected)
+
+        assert first_upstream.closed
+        assert await asyncio.wait_for(second, 1) == ["x"]
+
+        snap = tracker.snapshot()
+        assert snap["in_flight"] == 0 and snap["completed"] == 2
+        assert snap["ewma_ttft_s"] is not None
+        assert scheduler.snapshot()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_failed_stream_open_returns_the_slot():
+    async def scenario():
+        scheduler = LLMScheduler(capacity=1, tenant_cap=1)
+
+        async def boom():
+            raise RuntimeError("upstream 500")
+
+        try:
+            async with open_tracked_stream(boom, "t1", scheduler=scheduler, tracker=StreamTracker()):
+                pass
+        except RuntimeError:
+            pass
+        assert scheduler.snapshot()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+class StalledUpstream(FakeUpstream):
+    """Sends one token, then stalls as a slow provider would."""
+
+    async def __anext__(self):
+        if self.tokens:
+            return await super().__anext__()
+        await asyncio.Event().wait()
+
+
+def test_cancelled_consumer_aborts_upstream_and_counts_wasted_tokens():
+    async def scenario():
+        scheduler = LLMScheduler(capacity=1, tenant_cap=1)
+        upstream = StalledUpstream(["a"])
+        before = STREAM_TOKENS_TOTAL.value(priority=PRIORITY_BACKGROUND, outcome="cancelled")
+
+        async def consume():
+            async with open_tracked_stream(
+                lambda: asyncio.sleep(0, upstream), "t1", PRIORITY_BACKGROUND,
+                scheduler=scheduler, tracker=StreamTracker(),
+            ) as stream:
+                async for _chunk in stream:
+                    pass
+
+        task = asyncio.create_task(consume())
+        for _ in range(5):
+            await asyncio.sleep(0)
+        task.cancel()  # client disconnected while waiting for the next token
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+        assert upstream.closed
+        assert scheduler.snapshot()["in_flight"] == 0
+        after = STREAM_TOKENS_TOTAL.value(priority=PRIORITY_BACKGROUND, outcome="cancelled")
+        assert after - before == 1
+
+    asyncio.run(scenario())
+
+
+def test_unclosed_stream_is_only_reported_by_the_finalizer(caplog):
+    async def scenario():
+        scheduler = LLMScheduler(capacity=1, tenant_cap=1)
+        tenant, priority = await scheduler.acquire("t1", PRIORITY_BACKGROUND)
+        tracker = StreamTracker()
+        stream = TrackedStream(FakeUpstream(["a"]), tracker.start(tenant, priority), scheduler, tracker)
+
+        with caplog.at_level(logging.ERROR, logger="LLM_Config.llm_streams"):
+            del stream
+            gc.collect()
+
+        assert "garbage-collected without being closed" in caplog.text
+        # The slot is not handed back from the finalizer
+        assert scheduler.snapshot()["in_flight"] == 1
+        assert tracker.in_flight() == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,124 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from LLM_Config.llm_stub import StubConfig, create_stub_app
+from LLM_Config.llm_transport import LLMEndpoint, LLMTransport
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FakeClient:
+    """Stands in for AsyncOpenAI: `chat.completions.create` with scripted latency / errors."""
+
+    def __init__(self, name, delay_s=0.0, error=None):
+        self.name, self.delay_s, self.error = name, delay_s, error
+        self.calls = 0
+        self.cancelled = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay_s)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.name
+
+
+def _transport(*clients, **kw):
+    endpoints = [LLMEndpoint(c.name, None, None, client=c) for c in clients]
+    kw.setdefault("hedge_min_samples", 3)
+    return LLMTransport(endpoints, **kw)
+
+
+def test_fails_over_on_5xx_but_not_on_4xx_and_opens_circuit():
+    async def scenario():
+        primary, backup = FakeClient("primary", error=StatusError(503)), FakeClient("backup")
+        transport = _transport(primary, backup, failure_threshold=2, cooldown_s=60)
+        assert await transport.create(model="m") == "backup"
+        assert await transport.create(model="m") == "backup"
+        # Two consecutive failures: primary now sits out and is tried last
+        assert not transport.endpoints[0].stats.healthy
+        assert await transport.create(model="m") == "backup"
+        assert primary.calls == 2
+
+        bad_request = _transport(FakeClient("primary", error=StatusError(400)), FakeClient("backup"))
+        with pytest.raises(StatusError):
+            await bad_request.create(model="m")
+        assert bad_request.endpoints[1].client.calls == 0
+
+    asyncio.run(scenario())
+
+
+def test_slow_call_is_hedged_and_the_loser_cancelled():
+    async def scenario():
+        primary, backup = FakeClient("primary", delay_s=0.001), FakeClient("backup", delay_s=0.001)
+        transport = _transport(primary, backup)
+        for _ in range(3):  # latency history for the percentile
+            await transport.create(kind="rerank", model="m")
+
+        primary.delay_s = 1.0  # primary stalls
+        assert await transport.create(kind="rerank", model="m") == "backup"
+        await asyncio.sleep(0)  # the loser is cancelled, not awaited
+        assert primary.cancelled == 1
+
+        # Hedging off: wait for the slow endpoint
+        primary.delay_s = 0.05
+        transport.hedge_enabled = False
+        assert await transport.create(kind="rerank", model="m") == "primary"
+
+    asyncio.run(scenario())
+
+
+def test_stub_speaks_the_chat_completions_wire_format():
+    async def scenario():
+        config = StubConfig(reply="hello there")
+        app = create_stub_app(config)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://stub") as http:
+            plain = (await http.post("/v1/chat/completions", json={"model": "m", "messages": []})).json()
+            assert plain["choices"][0]["message"]["content"] == "hello there"
+
+            streamed = await http.post("/v1/chat/completions", json={"model": "m", "messages": [], "stream": True})
+            events = [line for line in streamed.text.splitlines() if line.startswith("data: ")]
+            assert events[-1] == "data: [DONE]"
+
+            config.fail_rate = 1.0
+            failed = await http.post("/v1/chat/completions", json={"model": "m", "messages": []})
+            assert failed.status_code == 503
+        assert config.requests == 3
+
+    asyncio.run(scenario())
+
+
+def test_transport_fails_over_from_stub_with_the_real_client():
+    openai = pytest.importorskip("openai")
+
+    async def scenario():
+        def client_for(config):
+            http = httpx.AsyncClient(transport=httpx.ASGITransport(app=create_stub_app(config)))
+            return openai.AsyncOpenAI(base_url="http://stub/v1", api_key="test", http_client=http, max_retries=0)
+
+        down, up = StubConfig(fail_rate=1.0), StubConfig(reply="from backup")
+        transport = LLMTransport([
+            LLMEndpoint("down", None, None, client=client_for(down)),
+            LLMEndpoint("up", None, None, client=client_for(up)),
+        ])
+        resp = await transport.create(model="m", messages=[{"role": "user", "content": "hi"}])
+        assert resp.choices[0].message.content == "from backup"
+
+        stream = await transport.stream(model="m", messages=[{"role": "user", "content": "hi"}])
+        text = "".join([c.choices[0].delta.content or "" async for c in stream])
+        assert text == "from backup"
+        assert down.requests == 2
+
+    asyncio.run(scenario())
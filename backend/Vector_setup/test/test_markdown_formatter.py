@@ -0,0 +1,84 @@
+from LLM_Config.markdown_formatter import format_markdown
+
+
+def test_headings_lists_and_spacing_are_normalized():
+    raw = (
+        "So, the leave policy allows 20 days  per year .\n"
+        "**Key points:**\n"
+        "• Annual leave accrues monthly\n"
+        "• Carry over up to 5 days\n"
+        "##Eligibility:\n"
+        "Employees after probation.\n"
+        "Employees after probation.\n"
+        "1) Submit request\n"
+        "\n"
+        "2) Manager approves\n"
+    )
+
+    assert format_markdown(raw) == (
+        "The leave policy allows 20 days per year.\n"
+        "\n"
+        "### Key points\n"
+        "\n"
+        "- Annual leave accrues monthly\n"
+        "- Carry over up to 5 days\n"
+        "\n"
+        "## Eligibility\n"
+        "\n"
+        "Employees after probation.\n"
+        "\n"
+        "1. Submit request\n"
+        "2. Manager approves"
+    )
+
+
+def test_tables_get_separator_padding_and_numeric_alignment():
+    raw = (
+        "| Date | Revenue | Net Profit\n"
+        "| 2022-01-01 | 95,795 | -15,735 |\n"
+        "| 2022-03-01 | 134,886 |\n"
+    )
+
+    assert format_markdown(raw).splitlines() == [
+        "| Date       | Revenue | Net Profit |",
+        "| ---------- | ------: | ---------: |",
+        "| 2022-01-01 |  95,795 |    -15,735 |",
+        "| 2022-03-01 | 134,886 |            |",
+    ]
+
+
+def test_heading_keeps_a_trailing_hash_that_belongs_to_the_title():
+    assert format_markdown("## Using C#") == "## Using C#"
+    assert format_markdown("## Closing hashes ##") == "## Closing hashes"
+
+
+def test_hash_before_a_digit_is_prose_not_a_heading():
+    assert format_markdown("#1 reason is cost.") == "#1 reason is cost."
+    assert format_markdown("#Summary") == "# Summary"
+
+
+def test_only_back_to_back_duplicate_paragraphs_are_dropped():
+    raw = "Vendor A:\n\nN/A\n\nVendor B:\n\nN/A\n\nN/A"
+
+    assert format_markdown(raw) == "Vendor A:\n\nN/A\n\nVendor B:\n\nN/A"
+
+
+def test_pipes_in_prose_are_not_a_table():
+    raw = "Paths are a|b|c here\nand x|y|z there"
+    assert format_markdown(raw) == raw
+
+
+def test_table_without_edge_pipes_needs_a_separator_row():
+    raw = "Item | Qty\n--- | ---\nPens | 12\nInk | 3"
+
+    assert format_markdown(raw).splitlines() == [
+        "| Item | Qty |",
+        "| ---- | --: |",
+        "| Pens |  12 |",
+        "| Ink  |   3 |",
+    ]
+
+
+def test_code_and_emphasis_are_left_alone():
+    raw = "*Note* this is italic\n\n```\nx  |  y | z\n```"
+    assert format_markdown(raw) == raw
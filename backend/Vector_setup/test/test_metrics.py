@@ -0,0 +1,26 @@
+from Vector_setup.base.metrics import MetricsRegistry, observe_stage, GENERATION_TTFT_SECONDS
+
+
+def test_histogram_renders_prometheus_text_with_cumulative_buckets():
+    registry = MetricsRegistry()
+    hist = registry.histogram("rag_rerank_seconds", "Rerank.", ("tenant", "intent"), buckets=(0.1, 1.0))
+    hist.observe(0.05, tenant="acme", intent="LOOKUP")
+    hist.observe(0.5, tenant="acme", intent="LOOKUP")
+    hist.observe_ms(3000, tenant='a"b', intent=None)
+
+    lines = registry.render().splitlines()
+
+    assert lines[:2] == ["# HELP rag_rerank_seconds Rerank.", "# TYPE rag_rerank_seconds histogram"]
+    assert 'rag_rerank_seconds_bucket{tenant="acme",intent="LOOKUP",le="0.1"} 1' in lines
+    assert 'rag_rerank_seconds_bucket{tenant="acme",intent="LOOKUP",le="1.0"} 2' in lines
+    assert 'rag_rerank_seconds_bucket{tenant="acme",intent="LOOKUP",le="+Inf"} 2' in lines
+    assert 'rag_rerank_seconds_count{tenant="acme",intent="LOOKUP"} 2' in lines
+    assert 'rag_rerank_seconds_bucket{tenant="a\\"b",intent="unknown",le="+Inf"} 1' in lines
+
+
+def test_generate_stage_also_records_time_to_first_token():
+    GENERATION_TTFT_SECONDS.clear()
+    observe_stage("acme", "ANALYSIS", {"stage": "generate", "duration_ms": 4200.0, "detail": {"ttft_ms": 350.0}})
+
+    rendered = "\n".join(GENERATION_TTFT_SECONDS.render())
+    assert 'rag_generation_ttft_seconds_sum{tenant="acme",intent="ANALYSIS"} 0.35' in rendered
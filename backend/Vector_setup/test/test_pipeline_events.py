@@ -0,0 +1,15 @@
+from LLM_Config.pipeline_events import StageTimer
+
+
+def test_stage_timer_reports_duration_counts_and_status_text():
+    timer = StageTimer("rerank")
+    start = timer.start()
+    end = timer.end(candidates_in=40, candidates_out=5, mode="cascade")
+
+    assert (start.stage, start.phase) == ("rerank", "start")
+    assert start.status_text() == "Ranking retrieved information…"
+    assert end.phase == "end" and end.duration_ms >= 0 and end.at >= start.at
+    assert end.as_dict()["candidates_in"] == 40
+    assert end.as_dict()["detail"] == {"mode": "cascade"}
+    assert end.status_text().endswith("(40 → 5 candidates)")
+    assert "detail" not in StageTimer("embed").end().as_dict()
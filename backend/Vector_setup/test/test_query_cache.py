@@ -0,0 +1,37 @@
+from Vector_setup.embeddings import query_cache
+from Vector_setup.embeddings.query_cache import QueryEmbeddingCache
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, "monotonic", lambda: now[0])
+    cache = QueryEmbeddingCache(max_entries=10, ttl_s=60)
+    cache.put("m", "What is the  Leave policy", [1.0], "t1")
+
+    now[0] += 59
+    assert cache.get("m", "what is the leave policy", "t1") == [1.0]
+    now[0] += 2
+    assert cache.get("m", "what is the leave policy", "t1") is None
+    assert cache.stats()["expired"] == 1 and cache.stats()["entries"] == 0
+
+
+def test_lru_bound_keeps_recently_used_entries():
+    cache = QueryEmbeddingCache(max_entries=2, ttl_s=0)
+    cache.put("m", "a", [1.0])
+    cache.put("m", "b", [2.0])
+    cache.get("m", "a")
+
+    cache.put("m", "c", [3.0])
+
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") == [1.0] and cache.get("m", "c") == [3.0]
+    assert cache.stats()["entries"] == 2
+
+
+def test_keys_are_scoped_by_model_and_tenant():
+    cache = QueryEmbeddingCache(max_entries=10, ttl_s=0)
+    cache.put("model-a", "q", [1.0], "t1")
+
+    assert cache.get("model-b", "q", "t1") is None
+    assert cache.get("model-a", "q", "t2") is None
+    assert cache.get("model-a", "q", "t1") == [1.0]
@@ -0,0 +1,26 @@
+from LLM_Config.rerank_cascade import cascade_config_for, mmr_select
+
+
+def test_mmr_drops_duplicates_and_keeps_unembedded_hits_last():
+    query = [1.0, 0.0, 0.0]
+    vectors = [
+        [1.0, 0.0, 0.0],
+        [1.0, 0.0, 0.001],   # near-duplicate of 0
+        [0.9, 0.4, 0.0],
+        [0.8, 0.0, 0.6],
+        None,                # no stored vector
+        [0.1, 1.0, 0.0],
+    ]
+
+    order, dropped = mmr_select(query, vectors, k=6, mmr_lambda=1.0, dedup_threshold=0.97,
+                                chunk_hashes=["a", "b", "a", "c", None, "d"])
+
+    # 1 is a near-duplicate of 0, 2 repeats 0's text
+    assert order == [0, 3, 5, 4]
+    assert dropped == 2
+
+
+def test_cascade_is_configured_per_intent():
+    assert cascade_config_for("EXPORT_TABLE").slice_k == 20
+    assert cascade_config_for("ANALYSIS").mmr_lambda < cascade_config_for("LOOKUP").mmr_lambda
+    assert cascade_config_for("GENERAL") == cascade_config_for("UNKNOWN")
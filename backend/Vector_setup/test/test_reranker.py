@@ -0,0 +1,87 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from LLM_Config import rerank_cascade as cascade_module
+from LLM_Config.reranker import (
+    CrossEncoderReranker,
+    LLMReranker,
+    Reranker,
+    RerankScoreCache,
+    get_reranker,
+)
+
+
+class FakeModel:
+    """Scores a (query, doc) pair by the doc's length; records predict calls."""
+
+    def __init__(self):
+        self.calls: list = []
+
+    def predict(self, pairs, batch_size, show_progress_bar):
+        self.calls.append((len(pairs), batch_size))
+        return [float(len(doc)) for _query, doc in pairs]
+
+
+def _cross_encoder(batch_size=2):
+    reranker = CrossEncoderReranker(model_name="fake", batch_size=batch_size, cache=RerankScoreCache(10))
+    reranker._model = FakeModel()
+    return reranker
+
+
+def test_backends_are_pluggable_and_none_keeps_retrieval_order():
+    assert isinstance(get_reranker("none"), Reranker)
+    assert get_reranker("none") is get_reranker("none")
+    with pytest.raises(ValueError):
+        get_reranker("bogus")
+
+    ranked = asyncio.run(get_reranker("none").rerank("q", ["a", "b", "c"]))
+    assert [i for i, _ in ranked] == [0, 1, 2]
+
+
+def test_cross_encoder_scores_in_batches_and_caches_scores():
+    reranker = _cross_encoder(batch_size=2)
+
+    ranked = asyncio.run(reranker.rerank("Q", ["bb", "a", "cccc"]))
+
+    assert [i for i, _ in ranked] == [2, 0, 1]
+    assert reranker._model.calls == [(3, 2)]
+
+    # Same query (case/whitespace folded): only the new document is scored
+    asyncio.run(reranker.rerank(" q ", ["cccc", "a", "ddd"]))
+    assert reranker._model.calls[-1] == (1, 2)
+    assert reranker.cache.stats()["hits"] == 2
+
+
+def test_llm_backend_parses_indices_from_a_chatty_reply():
+    async def call_llm(**kwargs):
+        content = 'Ranking: [2, 0, 2, 7]'
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    ranked = asyncio.run(LLMReranker(llm_call=call_llm).rerank("q", ["a", "b", "c"]))
+
+    assert [i for i, _ in ranked] == [2, 0]
+
+
+class FakeStore:
+    async def embed_query(self, question, cache_key=None, tenant_id=""):
+        return [[1.0, 0.0]]
+
+    def chunk_embeddings(self, tenant_id, hits):
+        return [[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]]
+
+
+def test_cascade_keeps_stage_one_order_when_the_reranker_fails(monkeypatch):
+    async def garbage(**kwargs):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="no idea"))])
+
+    hits = [{"id": str(i), "document": f"doc {i}", "metadata": {}} for i in range(3)]
+    monkeypatch.setattr(cascade_module, "get_reranker", lambda backend: Reranker())
+    stage1, _ = asyncio.run(cascade_module.rerank_cascade(FakeStore(), "t1", "q", hits, "LOOKUP"))
+
+    monkeypatch.setattr(cascade_module, "get_reranker", lambda backend: LLMReranker(llm_call=garbage))
+    ranked, stages = asyncio.run(cascade_module.rerank_cascade(FakeStore(), "t1", "q", hits, "LOOKUP"))
+
+    assert [h["id"] for h in ranked] == [h["id"] for h in stage1] == ["0", "2", "1"]
+    assert stages[-1]["stage"] == "rerank:llm:skipped"
@@ -0,0 +1,44 @@
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("sentence_transformers")
+
+from Vector_setup.base import store_registry
+
+
+class FakeStore:
+    def __init__(self, persist_dir, embedding_model_name):
+        self.persist_dir = persist_dir
+        self.embedding_model_name = embedding_model_name
+
+
+@pytest.fixture(autouse=True)
+def fake_stores(monkeypatch):
+    monkeypatch.setattr(store_registry, "MultiTenantChromaStoreManager", FakeStore)
+    monkeypatch.setattr(store_registry, "_stores", {})
+
+
+def test_one_store_per_persist_dir_and_model(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    shared = store_registry.get_store_manager("data/chroma", "model-a")
+
+    assert store_registry.get_store_manager(str(tmp_path / "data" / "chroma"), "model-a") is shared
+    assert store_registry.get_store_manager("data/chroma", "model-b") is not shared
+    assert store_registry.get_store_manager("other", "model-a") is not shared
+    assert shared.persist_dir == str(tmp_path / "data" / "chroma")
+
+
+def test_readiness_waits_for_a_store_and_loaded_models(tmp_path, monkeypatch):
+    models = {"model-a": False}
+    monkeypatch.setattr(store_registry, "embedding_models_status", lambda: dict(models))
+
+    assert store_registry.readiness()["ready"] is False  # no store yet
+
+    store_registry.get_store_manager(str(tmp_path), "model-a")
+    assert store_registry.readiness()["ready"] is False  # model still loading
+
+    models["model-a"] = True
+    report = store_registry.readiness()
+    assert report["ready"] is True
+    assert report["stores"] == [{"persist_dir": str(tmp_path.resolve()), "model_name": "model-a"}]
@@ -0,0 +1,66 @@
+import asyncio
+import hashlib
+
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("sentence_transformers")
+
+from Vector_setup.base import db_setup_management
+from Vector_setup.base.db_setup_management import NO_ORGANIZATION, MultiTenantChromaStoreManager
+from Vector_setup.base.tenant_index_migration import backfill_organization_ids
+
+
+class FakeEmbeddingService:
+    model_name = "fake"
+
+    async def embed_batch_async(self, texts):
+        return [[b / 255.0 for b in hashlib.sha256(t.encode("utf-8")).digest()[:8]] for t in texts]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv("LEXICAL_INDEX_DIR", str(tmp_path / "lexical"))
+    monkeypatch.setattr(db_setup_management, "get_embedding_cache", lambda model_name: None)
+    store = MultiTenantChromaStoreManager(persist_dir=str(tmp_path / "chroma"), storage_mode="tenant_index")
+    store._embedding_service = FakeEmbeddingService()
+    return store
+
+
+def _scoped_collections(store, collection_ids, organization_ids):
+    where = store._logical_scope_where(None, None, collection_ids, organization_ids)
+    got = store.get_tenant_index("t1").get(where=where, include=["metadatas"])
+    return sorted({m["collection"] for m in got["metadatas"]})
+
+
+def test_scope_filters_on_collection_and_organization(store):
+    asyncio.run(store.add_document("t1", "hr", "d1", "hr handbook",
+                                   metadata={"collection_id": "1", "organization_id": "org-a"}))
+    asyncio.run(store.add_document("t1", "ops", "d2", "ops runbook",
+                                   metadata={"collection_id": "2", "organization_id": None}))
+
+    assert _scoped_collections(store, ["1", "2"], ["org-a", None]) == ["hr", "ops"]
+    assert _scoped_collections(store, ["1", "2"], ["org-a"]) == ["hr"]
+    assert _scoped_collections(store, ["1", "2"], ["org-b"]) == []
+    assert _scoped_collections(store, ["2"], None) == ["ops"]
+
+
+def test_backfill_stamps_missing_organization_ids(store):
+    index = store.get_tenant_index("t1")
+    index.upsert(
+        ids=["hr::a", "ops::b", "fin::c"],
+        documents=["a", "b", "c"],
+        embeddings=[[0.1] * 8, [0.2] * 8, [0.3] * 8],
+        metadatas=[
+            {"collection": "hr", "collection_id": "1"},
+            {"collection": "ops", "collection_id": "2"},
+            {"collection": "fin", "collection_id": "3", "organization_id": "org-c"},
+        ],
+    )
+
+    result = backfill_organization_ids(store, "t1", {"hr": {"organization_id": "org-a"}})
+
+    assert result["updated"] == 2
+    got = index.get(ids=["hr::a", "ops::b", "fin::c"], include=["metadatas"])
+    orgs = {cid: m["organization_id"] for cid, m in zip(got["ids"], got["metadatas"])}
+    assert orgs == {"hr::a": "org-a", "ops::b": NO_ORGANIZATION, "fin::c": "org-c"}
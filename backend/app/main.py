@@ -1,5 +1,7 @@
 import os
+import threading
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlmodel import Session, select, SQLModel
 from sqlalchemy import text
@@ -14,11 +16,15 @@ from Vector_setup.API.google_drive_router import router as google_drive_router
 from Vector_setup.API.contact_router import router as contact_router
 from Vector_setup.API.organizations_router import router as organization_router
 from Vector_setup.API.collections_router import router as collection_router
+from Vector_setup.API.metrics_router import router as metrics_router
 
 
 from Vector_setup.user.db import init_db, DBUser, engine
 from Vector_setup.user.password import get_password_hash
-from Vector_setup.base.db_setup_management import MultiTenantChromaStoreManager
+from Vector_setup.base.store_registry import get_store_manager, warmup_default_store, readiness
+from LLM_Config.reranker import warmup_reranker, reranker_status
+from LLM_Config.llm_streams import llm_load
+from LLM_Config.llm_transport import LLM_TRANSPORT
 
 
 
@@ -57,6 +63,7 @@ app.include_router(google_drive_router, prefix="/api", tags=["google_drive_conne
 app.include_router(contact_router, prefix="/api", tags=["contact"])
 app.include_router(collection_router, prefix="/api", tags=["collection"])
 app.include_router(organization_router, prefix="/api", tags=["organization"])
+app.include_router(metrics_router, prefix="/api", tags=["metrics"])
 
 
 
@@ -67,8 +74,8 @@ VENDOR_TENANT_ID = os.getenv("VENDOR_TENANT_ID", "vendor-root")
 
 os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
 
-# --- Chroma manager (single instance) ---
-chroma_manager = MultiTenantChromaStoreManager()
+# --- Chroma manager (process-wide, shared with every router) ---
+chroma_manager = get_store_manager()
 
 # --- Optional hard reset (dev only) ---
 
@@ -182,3 +189,26 @@ def ensure_chat_messages_schema() -> None:
         if "doc_id" not in cols:
             conn.execute(text("ALTER TABLE chat_messages ADD COLUMN doc_id TEXT;"))
             conn.commit()
+
+
+# --- Embedding / reranker model warmup + health ---
+@app.on_event("startup")
+def warmup_embedding_model() -> None:
+    # Load the models off the startup path; /health/ready reports when they are done
+    threading.Thread(target=warmup_default_store, name="embedding-warmup", daemon=True).start()
+    threading.Thread(target=warmup_reranker, name="reranker-warmup", daemon=True).start()
+
+
+@app.get("/health")
+def health() -> dict:
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+def health_ready():
+    state = readiness()
+    state["reranker"] = reranker_status()
+    state["llm"] = llm_load()  # informational; saturation does not flip readiness
+    state["llm"]["endpoints"] = LLM_TRANSPORT.snapshot()
+    state["ready"] = state["ready"] and state["reranker"]["loaded"]
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
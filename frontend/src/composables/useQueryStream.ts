@@ -13,36 +13,118 @@ export type ChartSpec = {
   data: Array<Record<string, number | string>>
 }
 
-const TYPE_SPEED_MS = 12
+// Finished pipeline stage as reported by `event: stage`
+export type StageTiming = {
+  stage: string
+  phase: 'start' | 'end'
+  at: number
+  duration_ms?: number
+  candidates_in?: number
+  candidates_out?: number
+  detail?: Record<string, unknown>
+}
+
+// Optional stage skipped or cut short, from `event: degraded`
+export type DegradedStage = {
+  stage: string
+  reason: 'deadline' | 'load'
+  [key: string]: unknown
+}
 
 export function useQueryStream() {
   const answer = ref('')
   const statuses = ref<string[]>([])
   const status = ref('')
   const suggestions = ref<string[]>([])
+  const stages = ref<StageTiming[]>([])
+  const degraded = ref<DegradedStage[]>([])
   const isStreaming = ref(false)
   const abortController = ref<AbortController | null>(null)
 
   // Exposed to the page; watcher there attaches it to the last assistant message
   const chartSpec = ref<ChartSpec[] | null>(null)
 
-  const startTyping = (text: string, speed = TYPE_SPEED_MS) => {
-    answer.value = ''
-    if (!text) return
+const activeCollection = ref<string | null>(null);
+
+  // Charts / suggestions arrive after `done` from /query/enrichments/{turn_id}
+  let enrichmentController: AbortController | null = null
+  let enrichmentCancelUrl: string | null = null
 
-    let i = 0
+  const applySuggestions = (parsed: unknown) => {
+    if (Array.isArray(parsed)) {
+      suggestions.value = parsed
+    } else if (parsed && Array.isArray((parsed as any).suggestions)) {
+      suggestions.value = (parsed as any).suggestions
+    } else {
+      suggestions.value = []
+    }
+  }
 
-    const tick = () => {
-      if (i >= text.length) return
-      answer.value += text[i]
-      i += 1
-      setTimeout(tick, speed)
+  const applyCharts = (
+    parsed: { charts: ChartSpec[] } | { chart: ChartSpec } | ChartSpec[] | ChartSpec | null
+  ) => {
+    let charts: ChartSpec[] = []
+
+    if (Array.isArray(parsed)) {
+      charts = parsed
+    } else if (parsed && 'charts' in parsed && Array.isArray((parsed as any).charts)) {
+      charts = (parsed as any).charts
+    } else if (parsed && 'chart' in parsed) {
+      charts = [(parsed as any).chart]
+    } else if (parsed && typeof parsed === 'object') {
+      charts = [parsed as ChartSpec]
     }
 
-    tick()
+    chartSpec.value = charts.length ? charts : null
   }
 
-const activeCollection = ref<string | null>(null);
+  const pollEnrichments = async (turnId: string, base: string, token: string | null) => {
+    const controller = new AbortController()
+    enrichmentController = controller
+    const params = new URLSearchParams({ wait: '20' })
+    if (token) params.set('token', token)
+    const url = `${base}/query/enrichments/${encodeURIComponent(turnId)}?${params.toString()}`
+    enrichmentCancelUrl = token
+      ? `${base}/query/enrichments/${encodeURIComponent(turnId)}?token=${encodeURIComponent(token)}`
+      : `${base}/query/enrichments/${encodeURIComponent(turnId)}`
+
+    try {
+      // Long-poll: each request returns as soon as everything is ready, or after `wait`
+      for (let attempt = 0; attempt < 4; attempt++) {
+        const response = await fetch(url, { method: 'GET', signal: controller.signal })
+        if (!response.ok) return
+
+        const result = await response.json()
+        if (Array.isArray(result?.charts) && result.charts.length) {
+          applyCharts({ charts: result.charts })
+        }
+        if (Array.isArray(result?.suggestions) && result.suggestions.length) {
+          applySuggestions(result.suggestions)
+        }
+        if (result?.status === 'done') return
+      }
+    } catch (e) {
+      if (!controller.signal.aborted) {
+        console.error('Failed to fetch enrichments', e)
+      }
+    } finally {
+      if (enrichmentController === controller) {
+        enrichmentController = null
+        enrichmentCancelUrl = null
+      }
+    }
+  }
+
+  // Stop polling and tell the server to drop chart / suggestion calls nobody will see
+  const cancelEnrichments = () => {
+    if (!enrichmentController) return
+    enrichmentController.abort()
+    enrichmentController = null
+    if (enrichmentCancelUrl) {
+      void fetch(enrichmentCancelUrl, { method: 'DELETE', keepalive: true }).catch(() => {})
+      enrichmentCancelUrl = null
+    }
+  }
 
 const startStream = async (payload: {
   question: string
@@ -53,11 +135,16 @@ const startStream = async (payload: {
   // Reset per-run state
   answer.value = ''
   suggestions.value = []
+  stages.value = []
+  degraded.value = []
   statuses.value = []
   status.value = ''
   chartSpec.value = null
   isStreaming.value = true
 
+  // A new question supersedes enrichments still loading for the previous one
+  cancelEnrichments()
+
   const params = new URLSearchParams({
     question: payload.question,
     conversation_id: payload.conversation_id,
@@ -82,8 +169,9 @@ const startStream = async (payload: {
   const controller = new AbortController()
   abortController.value = controller
 
+  const base = import.meta.env.VITE_API_BASE_URL || '/api'
+
   try {
-    const base = import.meta.env.VITE_API_BASE_URL || '/api'
     const url = `${base}/query/stream?${params.toString()}`
 
     const response = await fetch(url, {
@@ -119,6 +207,21 @@ const startStream = async (payload: {
         return
     }
 
+    if (response.status === 429) {
+      // Server is shedding load; it says how long to wait before retrying
+      const retryAfter = Number(response.headers.get('Retry-After') || '0')
+      let message = 'The assistant is busy right now. Please try again shortly.'
+      if (retryAfter > 0) {
+        message = `The assistant is busy right now. Please try again in ${retryAfter} seconds.`
+      }
+      streamError.value = message
+      status.value = message
+      statuses.value.push(message)
+      isStreaming.value = false
+      abortController.value = null
+      return
+    }
+
     if (!response.ok || !response.body) {
       status.value = `Error: stream failed with status ${response.status}`
       statuses.value.push(status.value)
@@ -131,6 +234,7 @@ const startStream = async (payload: {
     const decoder = new TextDecoder('utf-8')
     let buffer = ''
     let fullAnswer = ''
+    let enrichmentTurnId: string | null = null
 
     while (true) {
       const { value, done } = await reader.read()
@@ -152,7 +256,10 @@ const startStream = async (payload: {
             eventType = line.slice('event:'.length).trim()
           } else if (line.startsWith('data:')) {
             if (data) data += '\n'
-            data += line.slice('data:'.length).trim()
+            // Per SSE, drop only the single space after "data:"; tokens keep their own spaces
+            let value = line.slice('data:'.length)
+            if (value.startsWith(' ')) value = value.slice(1)
+            data += value
           }
         }
 
@@ -160,49 +267,49 @@ const startStream = async (payload: {
           const msg = data || ''
           status.value = msg
           if (msg) statuses.value.push(msg)
+        } else if (eventType === 'stage') {
+          try {
+            const parsed = JSON.parse(data || '{}') as StageTiming
+            if (parsed?.phase === 'end') stages.value.push(parsed)
+          } catch (e) {
+            console.error('Failed to parse stage payload', e, data)
+          }
+        } else if (eventType === 'degraded') {
+          try {
+            const parsed = JSON.parse(data || '{}')
+            degraded.value = Array.isArray(parsed?.stages) ? parsed.stages : []
+          } catch (e) {
+            console.error('Failed to parse degraded payload', e, data)
+          }
         } else if (eventType === 'token') {
           const delta = (data || '').replace(/<\|n\|>/g, '\n')
           fullAnswer += delta
+          answer.value = fullAnswer
+        } else if (eventType === 'replace') {
+          // Final post-processed answer replaces what was streamed so far
+          fullAnswer = (data || '').replace(/<\|n\|>/g, '\n')
+          answer.value = fullAnswer
         } else if (eventType === 'suggestions') {
           try {
-            const parsed = JSON.parse(data || '[]')
-            if (Array.isArray(parsed)) {
-              suggestions.value = parsed
-            } else if (parsed && Array.isArray((parsed as any).suggestions)) {
-              suggestions.value = (parsed as any).suggestions
-            } else {
-              suggestions.value = []
-            }
+            applySuggestions(JSON.parse(data || '[]'))
           } catch (e) {
             console.error('Failed to parse suggestions payload', e, data)
             suggestions.value = []
           }
         } else if (eventType === 'chart') {
           try {
-            const parsed = JSON.parse(data || '{}') as
-              | { charts: ChartSpec[] }
-              | { chart: ChartSpec }
-              | ChartSpec[]
-              | ChartSpec
-              | null
-
-            let charts: ChartSpec[] = []
-
-            if (Array.isArray(parsed)) {
-              charts = parsed
-            } else if (parsed && 'charts' in parsed && Array.isArray((parsed as any).charts)) {
-              charts = (parsed as any).charts
-            } else if (parsed && 'chart' in parsed) {
-              charts = [(parsed as any).chart]
-            } else if (parsed && typeof parsed === 'object') {
-              charts = [parsed as ChartSpec]
-            }
-
-            chartSpec.value = charts.length ? charts : null
+            applyCharts(JSON.parse(data || '{}'))
           } catch (e) {
             console.error('Failed to parse chart payload', e, data)
             chartSpec.value = null
           }
+        } else if (eventType === 'enrichment') {
+          try {
+            const parsed = JSON.parse(data || '{}')
+            enrichmentTurnId = parsed?.turn_id ? String(parsed.turn_id) : null
+          } catch (e) {
+            console.error('Failed to parse enrichment payload', e, data)
+          }
         } else if (eventType === 'done') {
           status.value = 'Completed'
           statuses.value.push('Completed')
@@ -211,7 +318,11 @@ const startStream = async (payload: {
           controller.abort()
           abortController.value = null
 
-          startTyping(fullAnswer)
+          answer.value = fullAnswer
+
+          if (enrichmentTurnId) {
+            void pollEnrichments(enrichmentTurnId, base, token)
+          }
           return
         }
       }
@@ -221,7 +332,7 @@ const startStream = async (payload: {
     abortController.value = null
 
     if (fullAnswer) {
-      startTyping(fullAnswer)
+      answer.value = fullAnswer
     }
   } catch (err) {
     if (controller.signal.aborted) {
@@ -238,6 +349,7 @@ const startStream = async (payload: {
 
 
   const stopStream = () => {
+    cancelEnrichments()
     if (abortController.value) {
       abortController.value.abort()
       abortController.value = null
@@ -253,6 +365,8 @@ const startStream = async (payload: {
     statuses,
     isStreaming,
     suggestions,
+    stages,
+    degraded,
     chartSpec,
     startStream,
     stopStream,